@@ -2,10 +2,20 @@
 亮言~NotebookLM 自動化 Skill
 Flask Web GUI 主程式
 """
-from flask import Flask, render_template, send_from_directory
+import time
+from flask import Flask, Response, g, render_template, request, send_from_directory
 from flask_cors import CORS
 from config import config
 from routes import api_bp
+from routes.streaming import stream_limiter
+from services.task_manager import task_manager
+from services.notebooklm_service import notebooklm_service
+from services.generation_pipeline import generation_pipeline
+from services.metrics import metrics
+from services.tracing import tracer
+
+_request_seconds = metrics.histogram(
+    "http_request_seconds", "HTTP 請求處理時間（串流回應只計到開始傳送）", ("route", "method", "status"))
 
 def create_app(config_name='default'):
     """建立 Flask 應用程式"""
@@ -18,6 +28,66 @@ def create_app(config_name='default'):
     # 註冊 API Blueprint
     app.register_blueprint(api_bp)
 
+    # 接續上次未完成的生成任務（generation_pipeline 匯入時已註冊 generation.resume）
+    task_manager.recover_unfinished("generation.resume")
+
+    # 認證過期時暫停取出新任務（排隊中的任務保留），重新登入後恢復
+    def on_auth_change(expired):
+        if expired:
+            task_manager.pause("認證已過期，請重新登入")
+        else:
+            task_manager.resume()
+
+    notebooklm_service.auth_monitor.add_listener(on_auth_change)
+    notebooklm_service.auth_monitor.start()
+
+    # ===== 請求耗時指標與追蹤 =====
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        # 接續呼叫端的 W3C traceparent，沒有時開始新的追蹤
+        parent = tracer.parse_traceparent(request.headers.get('traceparent'))
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.trace_span = tracer.start_span(f"{request.method} {route}", parent=parent,
+                                         new_trace=parent is None, path=request.path)
+        g.trace_token = tracer.activate(g.trace_span)
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            # 以路由規則為標籤（不含實際 ID），未匹配的路徑歸為 unmatched
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            _request_seconds.observe(time.perf_counter() - started, route, request.method, response.status_code)
+        span = g.get('trace_span')
+        if span is not None:
+            span.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                span.fail(f"HTTP {response.status_code}")
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def finish_trace(error=None):
+        span = g.pop('trace_span', None)
+        token = g.pop('trace_token', None)
+        if span is None:
+            return
+        if error is not None:
+            span.fail(error)
+        tracer.finish(span)
+        try:
+            tracer.deactivate(token)
+        except ValueError:
+            # 串流回應在不同的 context 中結束
+            tracer.activate(None)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Prometheus 文字格式指標"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
     # ===== 頁面路由 =====
 
     @app.route('/')
@@ -48,6 +118,14 @@ def create_app(config_name='default'):
     return app
 
 
+def shutdown_services(timeout: float = 30.0) -> dict:
+    """關閉背景服務：結束 SSE 串流，等待任務佇列中執行中的任務結束，再關閉常駐客戶端"""
+    stream_limiter.drain()
+    remaining = task_manager.shutdown(timeout)
+    notebooklm_service.client_pool.close()
+    return remaining
+
+
 if __name__ == '__main__':
     app = create_app('development')
     print("\n" + "=" * 50)
@@ -0,0 +1,295 @@
+"""API 負載基準測試
+
+以模擬的 notebooklm CLI（fake_notebooklm.py）取代上游，對 Flask API 以指定並行度
+送出請求，量測各情境的吞吐量、延遲百分位數與資源使用，結果寫入 JSON 檔以便比較版本。
+
+情境：
+    execute   POST /api/execute（自然語言指令，輪流使用 COMMANDS）
+    tasks     GET  /api/tasks
+    generate  POST /api/notebooks/<id>/generate/quiz（另量測任務完成時間）
+    ask       POST /api/notebooks/<id>/ask（預設略過答案快取）
+
+    python benchmarks/api_load_bench.py --concurrency 8 --requests 200 --output bench.json
+    python benchmarks/api_load_bench.py --url http://localhost:5000 --scenarios tasks,ask
+
+預設在行程內以 Werkzeug 多執行緒伺服器啟動應用程式並改用 CLI 後端、放寬上游限流
+（--keep-limits 保留設定值）；指定 --url 時改測已啟動的服務，資源使用只含測試端。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("execute", "tasks", "generate", "ask")
+
+COMMANDS = [
+    "列出我所有的筆記本",
+    "列出來源",
+    "查看目前狀態",
+    "列出工件",
+]
+
+
+def install_fake_cli(workdir: str, fake_config: str = None) -> None:
+    """在 PATH 最前面放入指向 fake_notebooklm.py 的 notebooklm 指令"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_notebooklm.py")
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    if os.name == "nt":
+        with open(os.path.join(bin_dir, "notebooklm.cmd"), "w") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(bin_dir, "notebooklm")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FAKE_NOTEBOOKLM_STATE"] = os.path.join(workdir, "state.json")
+    if fake_config:
+        os.environ["FAKE_NOTEBOOKLM_CONFIG"] = os.path.abspath(fake_config)
+
+
+def start_local_server(keep_limits: bool) -> tuple:
+    """在背景執行緒啟動應用程式，回傳 (base_url, server)"""
+    from werkzeug.serving import make_server
+    from services.config_manager import config_manager
+
+    # 只改記憶體中的設定，不寫回 config.json
+    config_manager.load()["notebooklm_backend"] = "cli"
+    from app import create_app
+    from services.notebooklm_service import notebooklm_service
+
+    if not keep_limits:
+        for limiter in notebooklm_service.guard.limiters.values():
+            limiter.rate = 1e6
+            limiter.burst = 10 ** 6
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, create_app("production"), threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def request_json(base_url: str, method: str, path: str, body: dict = None, timeout: float = 300) -> tuple:
+    """送出請求，回傳 (狀態碼, JSON 內容或 None)"""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"null")
+        except ValueError:
+            return e.code, None
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """線性內插的百分位數"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def build_request(scenario: str, index: int, notebook_id: str, use_cache: bool) -> tuple:
+    if scenario == "execute":
+        return "POST", "/api/execute", {"command": COMMANDS[index % len(COMMANDS)], "notebook_id": notebook_id}
+    if scenario == "tasks":
+        return "GET", "/api/tasks?limit=50", None
+    if scenario == "generate":
+        return "POST", f"/api/notebooks/{notebook_id}/generate/quiz", {}
+    return "POST", f"/api/notebooks/{notebook_id}/ask", {
+        "question": f"第 {index} 個問題：重點是什麼？", "no_cache": not use_cache}
+
+
+def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int,
+                 notebook_id: str, use_cache: bool) -> dict:
+    """以 concurrency 個執行緒送出 requests 個請求"""
+    latencies, statuses, task_ids = [], {}, []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index: int):
+        nonlocal errors
+        method, path, body = build_request(scenario, index, notebook_id, use_cache)
+        start = time.perf_counter()
+        try:
+            status, payload = request_json(base_url, method, path, body)
+        except Exception:
+            status, payload = "exception", None
+        elapsed = time.perf_counter() - start
+        failed = status != 200 or not isinstance(payload, dict) or payload.get("success") is False
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            errors += failed
+            if isinstance(payload, dict) and payload.get("task_id"):
+                task_ids.append((payload["task_id"], time.time()))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "errors": errors,
+        "status_codes": statuses,
+        "latency": summarize(latencies),
+    }
+    if task_ids:
+        result["tasks"] = wait_tasks(base_url, task_ids)
+    return result
+
+
+def wait_tasks(base_url: str, task_ids: list, timeout: float = 600) -> dict:
+    """輪詢任務直到結束，回傳完成時間統計（由建立到結束）"""
+    pending = dict(task_ids)
+    durations, statuses = [], {}
+    deadline = time.time() + timeout
+    while pending and time.time() < deadline:
+        for task_id, created in list(pending.items()):
+            status, payload = request_json(base_url, "GET", f"/api/tasks/{task_id}")
+            task = (payload or {}).get("task") or {}
+            if task.get("status") in ("completed", "failed", "cancelled"):
+                durations.append(time.time() - created)
+                statuses[task["status"]] = statuses.get(task["status"], 0) + 1
+                del pending[task_id]
+        if pending:
+            time.sleep(0.5)
+    return {"statuses": statuses, "unfinished": len(pending), "completion": summarize(durations)}
+
+
+def resource_snapshot() -> dict:
+    """目前行程的 CPU 時間（含已結束的子行程，即模擬 CLI）、最大 RSS 與執行緒數"""
+    times = os.times()
+    snapshot = {"cpu_user_s": times.user, "cpu_system_s": times.system,
+                "cpu_children_s": times.children_user + times.children_system,
+                "threads": threading.active_count()}
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB、macOS 以 bytes 回報
+        snapshot["max_rss_mb"] = round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return snapshot
+
+
+def resource_delta(before: dict, after: dict) -> dict:
+    delta = {
+        "cpu_user_s": round(after["cpu_user_s"] - before["cpu_user_s"], 3),
+        "cpu_system_s": round(after["cpu_system_s"] - before["cpu_system_s"], 3),
+        "cpu_children_s": round(after["cpu_children_s"] - before["cpu_children_s"], 3),
+        "threads": after["threads"],
+    }
+    if "max_rss_mb" in after:
+        delta["max_rss_mb"] = after["max_rss_mb"]
+    return delta
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗號分隔的情境")
+    parser.add_argument("--requests", type=int, default=100, help="每個情境的請求數")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--url", help="測試已啟動的服務（不啟動模擬 CLI）")
+    parser.add_argument("--fake-config", help="模擬 CLI 的延遲 / 失敗設定 JSON")
+    parser.add_argument("--notebook", default="bench-notebook")
+    parser.add_argument("--use-cache", action="store_true", help="ask 情境使用答案快取")
+    parser.add_argument("--keep-limits", action="store_true", help="保留上游限流設定")
+    parser.add_argument("--label", default="", help="結果標籤（例如版本名稱）")
+    parser.add_argument("--output", default="", help="結果 JSON 檔")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的情境：{', '.join(unknown)}")
+
+    server = None
+    workdir = tempfile.mkdtemp(prefix="notebooklm-bench-")
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        install_fake_cli(workdir, args.fake_config)
+        base_url, server = start_local_server(args.keep_limits)
+
+    results = {
+        "label": args.label,
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mode": "remote" if args.url else "in-process",
+        "fake_config": args.fake_config,
+        "scenarios": {},
+    }
+    try:
+        for scenario in scenarios:
+            before = resource_snapshot()
+            result = run_scenario(base_url, scenario, args.requests, args.concurrency,
+                                  args.notebook, args.use_cache)
+            result["resources"] = resource_delta(before, resource_snapshot())
+            results["scenarios"][scenario] = result
+            latency = result["latency"]
+            print(f"{scenario:9s} {result['throughput_rps']:8.1f} req/s  p50 {latency['p50_ms']:8.1f} ms  "
+                  f"p95 {latency['p95_ms']:8.1f} ms  p99 {latency['p99_ms']:8.1f} ms  errors {result['errors']}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"結果已寫入 {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
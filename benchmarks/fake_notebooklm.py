@@ -0,0 +1,278 @@
+"""模擬的 notebooklm CLI（供基準測試，不連線上游）
+
+實作 NotebookLMService 使用的子指令：list、create、delete、rename、use、status、
+auth check、source list/add/add-research/delete、ask、generate <類型>、
+artifact list/wait、download。狀態保存在 FAKE_NOTEBOOKLM_STATE 指定的 JSON 檔
+（預設為暫存目錄下的 fake_notebooklm_state.json），多個行程同時執行時以檔案鎖保護。
+
+行為由 FAKE_NOTEBOOKLM_CONFIG 指定的 JSON 檔設定，未指定的欄位使用 DEFAULT_CONFIG：
+
+    {
+      "latency": {"default": {"dist": "lognormal", "median_ms": 150, "sigma": 0.5},
+                  "ask": {"dist": "uniform", "min_ms": 800, "max_ms": 2500}},
+      "failure_rate": {"default": 0.0, "generate": 0.05},
+      "failures": {"429 Too Many Requests": 1, "503 Service Unavailable": 1},
+      "render_seconds": {"default": 5, "audio": 30},
+      "research": {"fast": {"sources": 5, "seconds": 3}, "deep": {"sources": 15, "seconds": 20}}
+    }
+
+延遲分布支援 fixed（ms）、uniform（min_ms/max_ms）、normal（mean_ms/stddev_ms）、
+lognormal（median_ms/sigma）。失敗以 failures 的權重抽出 stderr 訊息並以結束碼 1 結束。
+source add-research 依 research 設定在指定秒數內逐一加入來源（每加入一個即寫回狀態）。
+
+    python benchmarks/fake_notebooklm.py list --json
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_CONFIG = {
+    "latency": {
+        "default": {"dist": "lognormal", "median_ms": 150, "sigma": 0.5},
+        "ask": {"dist": "lognormal", "median_ms": 1500, "sigma": 0.4},
+        "generate": {"dist": "lognormal", "median_ms": 600, "sigma": 0.3},
+        "download": {"dist": "lognormal", "median_ms": 400, "sigma": 0.3},
+    },
+    "failure_rate": {"default": 0.0},
+    "failures": {"503 Service Unavailable": 1, "429 Too Many Requests": 1},
+    "render_seconds": {"default": 5, "audio": 20, "video": 40},
+    "research": {"fast": {"sources": 5, "seconds": 3}, "deep": {"sources": 15, "seconds": 20}},
+}
+
+_DOWNLOAD_CONTENT = b"fake-notebooklm-artifact\n" * 64
+
+
+def load_config() -> dict:
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    path = os.environ.get("FAKE_NOTEBOOKLM_CONFIG")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                if isinstance(value, dict) and isinstance(config.get(key), dict):
+                    config[key].update(value)
+                else:
+                    config[key] = value
+    return config
+
+
+def _lookup(table: dict, command: str):
+    return table.get(command, table.get("default"))
+
+
+def sample_latency(spec: dict) -> float:
+    """依延遲分布取樣（秒）"""
+    dist = spec.get("dist", "fixed")
+    if dist == "uniform":
+        ms = random.uniform(spec.get("min_ms", 0), spec.get("max_ms", 0))
+    elif dist == "normal":
+        ms = random.gauss(spec.get("mean_ms", 0), spec.get("stddev_ms", 0))
+    elif dist == "lognormal":
+        ms = random.lognormvariate(0, spec.get("sigma", 0.5)) * spec.get("median_ms", 100)
+    else:
+        ms = spec.get("ms", 0)
+    return max(0.0, ms) / 1000
+
+
+def _state_path() -> str:
+    return os.environ.get("FAKE_NOTEBOOKLM_STATE") or os.path.join(
+        tempfile.gettempdir(), "fake_notebooklm_state.json")
+
+
+@contextmanager
+def locked_state():
+    """讀取並在區塊結束時寫回狀態（以檔案鎖保護）"""
+    path = _state_path()
+    with open(path + ".lock", "a+") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                state = {"notebooks": {}, "current": None}
+            yield state
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _option(args: list, *names: str):
+    for name in names:
+        if name in args:
+            index = args.index(name)
+            if index + 1 < len(args):
+                return args[index + 1]
+    return None
+
+
+def _positional(args: list) -> list:
+    """去除選項後的位置參數"""
+    values, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        if arg in ("--notebook", "-n", "--mode", "--from", "--format", "--difficulty", "--quantity",
+                   "--timeout", "-a"):
+            skip = True
+            continue
+        if arg.startswith("-"):
+            continue
+        values.append(arg)
+    return values
+
+
+def _notebook(state: dict, args: list) -> dict:
+    notebook_id = _option(args, "--notebook", "-n") or state.get("current") or "default"
+    return state["notebooks"].setdefault(notebook_id, {
+        "id": notebook_id, "title": notebook_id, "sources": [], "artifacts": []})
+
+
+def _artifact_view(artifact: dict) -> dict:
+    ready = time.time() >= artifact["ready_at"]
+    return {"id": artifact["id"], "type": artifact["type"], "title": artifact["title"],
+            "status": "completed" if ready else "processing", "created_at": artifact["created_at"]}
+
+
+def research(args: list, query: str, config: dict) -> dict:
+    """逐一加入研究找到的來源"""
+    spec = _lookup(config["research"], _option(args, "--mode") or "fast") or {}
+    count = int(spec.get("sources", 5))
+    added = []
+    for index in range(count):
+        time.sleep(spec.get("seconds", 0) / max(count, 1))
+        source = {"id": uuid.uuid4().hex[:12], "title": f"{query} #{index + 1}",
+                  "url": f"https://example.com/{uuid.uuid4().hex[:8]}"}
+        with locked_state() as state:
+            _notebook(state, args)["sources"].append(source)
+        added.append(source["id"])
+    return {"query": query, "sources_added": len(added), "source_ids": added}
+
+
+def run(args: list, config: dict) -> tuple:
+    """執行子指令，回傳 (結束碼, stdout 內容)"""
+    command = args[0] if args else ""
+    sub = args[1] if len(args) > 1 else ""
+    positional = _positional(args[1:])
+
+    if command == "auth":
+        return 0, {"authenticated": True, "account": "bench@example.com"}
+    if command == "status":
+        with locked_state() as state:
+            return 0, {"current_notebook": state.get("current")}
+    if command == "list":
+        with locked_state() as state:
+            notebooks = [{"id": nb["id"], "title": nb["title"]} for nb in state["notebooks"].values()]
+        return 0, {"notebooks": notebooks, "count": len(notebooks)}
+    if command == "create":
+        notebook_id = uuid.uuid4().hex[:12]
+        with locked_state() as state:
+            state["notebooks"][notebook_id] = {"id": notebook_id, "title": positional[0] if positional else "",
+                                               "sources": [], "artifacts": []}
+        return 0, {"id": notebook_id, "title": positional[0] if positional else ""}
+    if command in ("delete", "rename", "use"):
+        with locked_state() as state:
+            notebook_id = positional[0] if positional else None
+            if command == "delete":
+                state["notebooks"].pop(notebook_id, None)
+            elif command == "rename" and notebook_id in state["notebooks"]:
+                state["notebooks"][notebook_id]["title"] = positional[1] if len(positional) > 1 else ""
+            elif command == "use":
+                state["current"] = notebook_id
+        return 0, {"ok": True}
+
+    if command == "source" and sub == "add-research":
+        return 0, research(args, positional[1] if len(positional) > 1 else "", config)
+
+    if command == "source":
+        with locked_state() as state:
+            notebook = _notebook(state, args)
+            if sub == "list":
+                return 0, {"sources": notebook["sources"], "count": len(notebook["sources"])}
+            if sub == "add":
+                value = positional[1] if len(positional) > 1 else ""
+                source = {"id": uuid.uuid4().hex[:12], "title": os.path.basename(value) or value,
+                          "url": value if value.startswith("http") else None}
+                notebook["sources"].append(source)
+                return 0, {"source_id": source["id"], "source": source}
+            if sub == "delete":
+                source_id = positional[1] if len(positional) > 1 else None
+                notebook["sources"] = [s for s in notebook["sources"] if s["id"] != source_id]
+                return 0, {"ok": True}
+
+    if command == "ask":
+        question = positional[0] if positional else ""
+        return 0, {"answer": f"（模擬回答）{question}", "conversation_id": uuid.uuid4().hex[:8]}
+
+    if command == "generate":
+        render = _lookup(config["render_seconds"], sub) or 0
+        with locked_state() as state:
+            notebook = _notebook(state, args)
+            artifact = {"id": uuid.uuid4().hex[:12], "type": sub, "title": f"{sub} artifact",
+                        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "ready_at": time.time() + random.uniform(0.8, 1.2) * render}
+            notebook["artifacts"].append(artifact)
+        if sub == "mind-map":
+            return 0, {"id": artifact["id"], "mind_map": {"title": "模擬心智圖", "children": []}}
+        return 0, {"task_id": artifact["id"], "status": "pending"}
+
+    if command == "artifact":
+        with locked_state() as state:
+            artifacts = list(_notebook(state, args)["artifacts"])
+        if sub == "list":
+            views = [_artifact_view(a) for a in artifacts]
+            return 0, {"artifacts": views, "count": len(views)}
+        if sub == "wait":
+            artifact_id = positional[1] if len(positional) > 1 else None
+            artifact = next((a for a in artifacts if a["id"] == artifact_id), None)
+            if artifact is None:
+                return 1, "Artifact not found"
+            time.sleep(max(0.0, artifact["ready_at"] - time.time()))
+            return 0, _artifact_view(artifact)
+
+    if command == "download":
+        output = positional[1] if len(positional) > 1 else None
+        if not output:
+            return 1, "Missing output path"
+        with open(output, "wb") as f:
+            f.write(_DOWNLOAD_CONTENT)
+        return 0, {"output_path": output}
+
+    return 2, f"Unknown command: {' '.join(args)}"
+
+
+def main(argv: list) -> int:
+    config = load_config()
+    command = argv[0] if argv else ""
+    time.sleep(sample_latency(_lookup(config["latency"], command) or {}))
+
+    if command != "auth" and random.random() < (_lookup(config["failure_rate"], command) or 0):
+        messages, weights = zip(*config["failures"].items())
+        print(f"Error: {random.choices(messages, weights)[0]}", file=sys.stderr)
+        return 1
+
+    code, output = run(argv, config)
+    if code == 0:
+        print(json.dumps(output, ensure_ascii=False))
+    else:
+        print(f"Error: {output}", file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
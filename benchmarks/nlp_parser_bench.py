@@ -0,0 +1,114 @@
+"""NLPParser 關鍵字模式微基準測試
+
+比較預先編譯的 Aho–Corasick 比對器與舊版逐一子字串掃描的吞吐量，
+並列出兩者判斷不同的指令。兩者交替執行 --repeat 次，各取最佳值。
+
+    python benchmarks/nlp_parser_bench.py [--rounds 2000] [--repeat 5]
+
+在開發機上對這組短指令約快 1.1–1.4 倍（每次執行差異不小），並非數倍的差距：
+每個指令的參數提取等固定成本佔了大部分時間。
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.nlp_parser import NLPParser  # noqa: E402
+
+COMMANDS = [
+    "列出我所有的筆記本",
+    "建立一個叫做『AI研究』的筆記本",
+    "新增這個網址 https://example.com/article?id=42",
+    "加入這個 YouTube 影片 https://youtu.be/dQw4w9WgXcQ",
+    "幫我生成 Podcast",
+    "生成影片",
+    "新增影片 https://www.youtube.com/watch?v=abc",
+    "下載心智圖",
+    "製作心智圖",
+    "生成 10 題測驗",
+    "這些問題幫我生成測驗",
+    "請問 這份文件的重點是什麼？",
+    "幫我生成簡報",
+    "產生數據表",
+    "查看目前狀態",
+    "隨便說一句話",
+]
+
+
+def legacy_parse_keyword(text):
+    """舊版實作：依字典順序逐一子字串比對，再逐條模糊比對"""
+    text_lower = text.lower()
+    intent = None
+    for intent_name, patterns in NLPParser.INTENT_PATTERNS.items():
+        for pattern in patterns:
+            if pattern.lower() in text_lower:
+                intent = intent_name
+                break
+        if intent:
+            break
+    if not intent:
+        for name, groups in NLPParser.FUZZY_RULES:
+            if all(any(k in text_lower for k in group) for group in groups):
+                intent = name
+                break
+    legacy_extract_params(text)
+    return intent
+
+
+def legacy_extract_params(text):
+    """舊版參數提取：每次呼叫都以字串樣式查詢 re 模組快取"""
+    params = {}
+    for pattern in [r"[「『\"]([^」』\"]+)[」』\"]", r"叫做\s*[「『\"]?(\S+)[」』\"]?", r"名為\s*(\S+)"]:
+        match = re.search(pattern, text)
+        if match:
+            params["name"] = match.group(1)
+            break
+    for pattern in [r"(https?://[^\s]+)",
+                    r"((?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+)",
+                    r"(\d+)\s*(?:題|個|張)"]:
+        re.search(pattern, text)
+    return params
+
+
+def bench(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for command in COMMANDS:
+            func(command)
+    elapsed = time.perf_counter() - start
+    return rounds * len(COMMANDS) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    nlp = NLPParser()
+    current, legacy = 0.0, 0.0
+    for i in range(args.repeat):
+        # 交替執行順序，避免暖機與 CPU 頻率變化偏向其中一方
+        if i % 2:
+            legacy = max(legacy, bench(legacy_parse_keyword, args.rounds))
+            current = max(current, bench(nlp._parse_keyword, args.rounds))
+        else:
+            current = max(current, bench(nlp._parse_keyword, args.rounds))
+            legacy = max(legacy, bench(legacy_parse_keyword, args.rounds))
+
+    print(f"指令數: {len(COMMANDS)} × {args.rounds} 輪，取 {args.repeat} 次中的最佳值")
+    print(f"舊版（逐一掃描）  : {legacy:>10,.0f} 指令/秒")
+    print(f"Aho–Corasick      : {current:>10,.0f} 指令/秒 ({current / legacy:.2f}x)")
+
+    print("\n判斷不同的指令：")
+    for command in COMMANDS:
+        old, new = legacy_parse_keyword(command), nlp._parse_keyword(command)["intent"]
+        if old != new:
+            print(f"  {command!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
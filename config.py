@@ -11,8 +11,16 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
-    """生產環境設定"""
+    """生產環境設定（serve.py / gunicorn.conf.py 使用）"""
     DEBUG = False
+    SERVER_HOST = os.environ.get('HOST', '0.0.0.0')
+    SERVER_PORT = int(os.environ.get('PORT', 5000))
+    # 每個行程處理請求的執行緒數
+    SERVER_THREADS = int(os.environ.get('THREADS', 16))
+    # gunicorn 行程數；多行程時需將 task_store 與 task_broker 設為 sqlite
+    SERVER_WORKERS = int(os.environ.get('WORKERS', 1))
+    # 關閉時等待執行中請求與任務結束的秒數
+    SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 30))
 
 config = {
     'development': DevelopmentConfig,
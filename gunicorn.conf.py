@@ -0,0 +1,38 @@
+"""gunicorn 設定
+
+    gunicorn -c gunicorn.conf.py "app:create_app('production')"
+
+行程數與執行緒數來自 config.py 的 ProductionConfig（WORKERS / THREADS 環境變數）。
+WORKERS 大於 1 時請將 config.json 的 task_store 與 task_broker 設為 sqlite，
+各行程才會看到同一份任務狀態。
+"""
+from config import ProductionConfig
+
+bind = f"{ProductionConfig.SERVER_HOST}:{ProductionConfig.SERVER_PORT}"
+workers = ProductionConfig.SERVER_WORKERS
+threads = ProductionConfig.SERVER_THREADS
+worker_class = "gthread"
+# SSE 與長時間的提問請求需要較長的逾時
+timeout = 300
+graceful_timeout = ProductionConfig.SHUTDOWN_TIMEOUT
+
+
+def post_worker_init(worker):
+    """限制 SSE 串流數；收到 SIGTERM 時先結束所有串流，優雅關閉才能在 graceful_timeout 內完成"""
+    import signal
+    from routes.streaming import stream_limiter
+    stream_limiter.limit_to_threads(threads)
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        stream_limiter.drain()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_exit(server, worker):
+    """行程結束前等待任務佇列中執行中的任務"""
+    from app import shutdown_services
+    shutdown_services(ProductionConfig.SHUTDOWN_TIMEOUT)
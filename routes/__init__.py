@@ -5,4 +5,4 @@ from flask import Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # 匯入各子路由
-from . import auth, notebooks, sources, artifacts, execute, settings
+from . import auth, notebooks, sources, artifacts, execute, settings, cache, upstream
@@ -1,13 +1,29 @@
 """內容生成 API"""
-from flask import jsonify, request
+import base64
+import hashlib
+import json
+import mimetypes
+from datetime import datetime
+from flask import jsonify, request, Response, send_file
 from . import api_bp
+from .streaming import sse_response
+from services.artifact_cache import DOWNLOAD_TYPES
 from services.notebooklm_service import notebooklm_service
 from services.task_manager import task_manager
+from services.ask_manager import ask_manager, AskQueueFull
+from services.generation_pipeline import generation_pipeline, GENERATORS
+from services.bulk_generation import bulk_generator
+from services.tracing import tracer
 
 @api_bp.route('/notebooks/<notebook_id>/generate/<artifact_type>', methods=['POST'])
 def generate_artifact(notebook_id, artifact_type):
-    """生成內容"""
+    """生成內容
+
+    建立的任務會等到工件實際完成才結束（進度反映等待狀態）；
+    download 為 true 時完成後一併下載到工件快取。
+    """
     data = request.get_json() or {}
+    download = bool(data.get('download', False))
 
     # 根據類型呼叫對應的生成方法
     if artifact_type == 'audio':
@@ -15,73 +31,53 @@ def generate_artifact(notebook_id, artifact_type):
         format_type = data.get('format', 'deep-dive')
 
         # 建立背景任務
-        task_id = task_manager.create_task(
-            name=f"生成 Podcast",
-            func=notebooklm_service.generate_audio,
-            kwargs={
-                "notebook_id": notebook_id,
-                "instructions": instructions,
-                "format": format_type
-            }
-        )
+        task_id = generation_pipeline.submit("audio", notebook_id, {
+            "instructions": instructions,
+            "format": format_type
+        }, download=download)
         return jsonify({"success": True, "task_id": task_id, "message": "已開始生成 Podcast"})
 
     elif artifact_type == 'video':
         instructions = data.get('instructions', '')
 
-        task_id = task_manager.create_task(
-            name=f"生成影片",
-            func=notebooklm_service.generate_video,
-            kwargs={
-                "notebook_id": notebook_id,
-                "instructions": instructions
-            }
-        )
+        task_id = generation_pipeline.submit("video", notebook_id, {
+            "instructions": instructions
+        }, download=download)
         return jsonify({"success": True, "task_id": task_id, "message": "已開始生成影片"})
 
     elif artifact_type == 'quiz':
         difficulty = data.get('difficulty', 'medium')
         quantity = data.get('quantity', 'standard')
 
-        task_id = task_manager.create_task(
-            name=f"生成測驗",
-            func=notebooklm_service.generate_quiz,
-            kwargs={
-                "notebook_id": notebook_id,
-                "difficulty": difficulty,
-                "quantity": quantity
-            }
-        )
+        task_id = generation_pipeline.submit("quiz", notebook_id, {
+            "difficulty": difficulty,
+            "quantity": quantity
+        }, download=download)
         return jsonify({"success": True, "task_id": task_id, "message": "已開始生成測驗"})
 
     elif artifact_type == 'flashcards':
         difficulty = data.get('difficulty', 'medium')
         quantity = data.get('quantity', 'standard')
 
-        task_id = task_manager.create_task(
-            name=f"生成閃卡",
-            func=notebooklm_service.generate_flashcards,
-            kwargs={
-                "notebook_id": notebook_id,
-                "difficulty": difficulty,
-                "quantity": quantity
-            }
-        )
+        task_id = generation_pipeline.submit("flashcards", notebook_id, {
+            "difficulty": difficulty,
+            "quantity": quantity
+        }, download=download)
         return jsonify({"success": True, "task_id": task_id, "message": "已開始生成閃卡"})
 
     elif artifact_type == 'report':
         format_type = data.get('format', 'briefing-doc')
 
-        task_id = task_manager.create_task(
-            name=f"生成報告",
-            func=notebooklm_service.generate_report,
-            kwargs={
-                "notebook_id": notebook_id,
-                "format": format_type
-            }
-        )
+        task_id = generation_pipeline.submit("report", notebook_id, {
+            "format": format_type
+        }, download=download)
         return jsonify({"success": True, "task_id": task_id, "message": "已開始生成報告"})
 
+    elif artifact_type in ('infographic', 'slide-deck', 'data-table'):
+        task_id = generation_pipeline.submit(artifact_type, notebook_id, download=download)
+        return jsonify({"success": True, "task_id": task_id,
+                        "message": f"已開始{GENERATORS[artifact_type][0]}"})
+
     elif artifact_type == 'mindmap':
         result = notebooklm_service.generate_mindmap(notebook_id)
         return jsonify(result)
@@ -90,6 +86,58 @@ def generate_artifact(notebook_id, artifact_type):
         return jsonify({"success": False, "error": f"不支援的類型: {artifact_type}"}), 400
 
 
+@api_bp.route('/generate/bulk', methods=['POST'])
+def bulk_generate():
+    """批次生成：多個筆記本 × 多種工件類型
+
+    JSON：notebook_ids、types、options（類型 -> 生成選項）、download、
+    concurrency（本批次同時進行的上限）、per_notebook（每個筆記本同時進行的上限）。
+    """
+    data = request.get_json() or {}
+    notebook_ids = data.get('notebook_ids') or []
+    types = data.get('types') or []
+    if not isinstance(notebook_ids, list) or not isinstance(types, list):
+        return jsonify({"success": False, "error": "notebook_ids 與 types 必須是列表"}), 400
+    try:
+        result = bulk_generator.submit(
+            notebook_ids=[str(n) for n in notebook_ids],
+            artifact_types=[str(t) for t in types],
+            options=data.get('options') if isinstance(data.get('options'), dict) else None,
+            download=bool(data.get('download', False)),
+            concurrency=data.get('concurrency'),
+            per_notebook=data.get('per_notebook')
+        )
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "無效的並行上限"}), 400
+    if not result.get("success"):
+        return jsonify(result), 400
+    return jsonify(result), 202
+
+
+@api_bp.route('/generate/bulk', methods=['GET'])
+def list_bulk_jobs():
+    """列出批次生成工作"""
+    return jsonify({"success": True, "data": bulk_generator.list()})
+
+
+@api_bp.route('/generate/bulk/<job_id>', methods=['GET'])
+def get_bulk_job(job_id):
+    """取得批次生成進度（children=0 時不含子任務明細）"""
+    job = bulk_generator.get(job_id, include_children=request.args.get('children') != '0')
+    if job is None:
+        return jsonify({"success": False, "error": "批次工作不存在"}), 404
+    return jsonify({"success": True, "data": job})
+
+
+@api_bp.route('/generate/bulk/<job_id>/cancel', methods=['POST'])
+def cancel_bulk_job(job_id):
+    """取消批次中尚未開始的子任務"""
+    job = bulk_generator.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "批次工作不存在"}), 404
+    return jsonify({"success": True, "data": job})
+
+
 @api_bp.route('/notebooks/<notebook_id>/artifacts', methods=['GET'])
 def list_artifacts(notebook_id):
     """列出工件"""
@@ -97,31 +145,236 @@ def list_artifacts(notebook_id):
     return jsonify(result)
 
 
+@api_bp.route('/notebooks/<notebook_id>/artifacts/<artifact_id>/download', methods=['GET'])
+def download_artifact(notebook_id, artifact_id):
+    """下載工件檔案
+
+    檔案經由本機工件快取取得（首次下載後不再向上游取得），並支援 Range 請求，
+    瀏覽器播放 Podcast / 影片時可直接跳轉。未指定 type 時由工件列表推斷。
+    """
+    artifact_type = request.args.get('type')
+    if not artifact_type:
+        artifact = notebooklm_service.find_artifact(notebook_id, artifact_id=artifact_id)
+        if artifact is None:
+            return jsonify({"success": False, "error": "找不到工件"}), 404
+        artifact_type = artifact.get("download_type")
+    if artifact_type not in DOWNLOAD_TYPES:
+        return jsonify({"success": False, "error": f"不支援下載的類型: {artifact_type}"}), 400
+
+    result = notebooklm_service.fetch_artifact(artifact_type, artifact_id, notebook_id)
+    if not result.get("success"):
+        return jsonify(result), 502
+
+    download_name = f"{artifact_type}-{artifact_id}{DOWNLOAD_TYPES[artifact_type]}"
+    response = send_file(
+        result["path"],
+        mimetype=mimetypes.guess_type(download_name)[0] or "application/octet-stream",
+        as_attachment=request.args.get('attachment') in ('1', 'true'),
+        download_name=download_name,
+        conditional=True,
+        max_age=86400
+    )
+    response.headers['X-Cache'] = 'HIT' if result.get("cached") else 'MISS'
+    return response
+
+
 @api_bp.route('/notebooks/<notebook_id>/ask', methods=['POST'])
 def ask_question(notebook_id):
     """向筆記本提問"""
     data = request.get_json()
     question = data.get('question', '')
     new_conversation = data.get('new', False)
+    no_cache = data.get('no_cache', False)
 
     if not question:
         return jsonify({"success": False, "error": "請提供問題"}), 400
 
-    result = notebooklm_service.ask_question(question, notebook_id, new_conversation)
+    if data.get('async'):
+        # 非同步模式：立即回傳 ask_id，答案透過串流或輪詢取得
+        try:
+            job = ask_manager.submit(question, notebook_id, new_conversation, use_cache=not no_cache)
+        except AskQueueFull as e:
+            return jsonify({"success": False, "error": str(e)}), 429
+        return jsonify(job.to_handle()), 202
+
+    result = notebooklm_service.ask_question(question, notebook_id, new_conversation,
+                                             use_cache=not no_cache)
     return jsonify(result)
 
 
+@api_bp.route('/ask/<ask_id>', methods=['GET'])
+def get_ask_status(ask_id):
+    """取得非同步提問狀態"""
+    job = ask_manager.get(ask_id)
+    if not job:
+        return jsonify({"success": False, "error": "提問不存在"}), 404
+    return jsonify({"success": True, "ask": job.to_dict()})
+
+
+@api_bp.route('/ask/<ask_id>/stream', methods=['GET'])
+def stream_ask(ask_id):
+    """以 SSE 串流非同步提問的答案片段（status / chunk / done / error）"""
+    job = ask_manager.get(ask_id)
+    if not job:
+        return jsonify({"success": False, "error": "提問不存在"}), 404
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    if job.finished and after >= len(job.events):
+        # 已收到最後一個事件：回傳 204 讓瀏覽器停止自動重新連線
+        return Response(status=204)
+
+    def generate(alive):
+        sent = after
+        while True:
+            events = job.wait_events(sent)
+            if not events:
+                if job.finished or not alive():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                sent = event["id"]
+                yield _sse(event["id"], event["event"], event["data"])
+            if job.finished and sent >= len(job.events):
+                return
+            if not alive():
+                return
+
+    return sse_response(generate, wake=job.wake)
+
+
+def _sse(event_id, event: str, data) -> str:
+    """組成一則 SSE 訊息"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@api_bp.route('/tasks/stream', methods=['GET'])
+def stream_tasks():
+    """以 Server-Sent Events 推送任務狀態變更
+
+    首次連線（或 Last-Event-ID 已過舊、屬於重新啟動前或其他行程）時先送出 snapshot，
+    之後只送變更欄位。可用 ?notebook_id= 只接收特定筆記本的任務。
+    """
+    notebook_id = request.args.get('notebook_id')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    events = task_manager.events
+
+    def generate(alive):
+        pending = events.since(last_event_id)
+        if pending is None:
+            last_id = events.last_id
+            yield _sse(events.event_id(last_id), "snapshot", {"tasks": task_manager.get_task_summaries(notebook_id)})
+            pending = []
+        else:
+            last_id = events.parse_id(last_event_id)
+
+        while alive():
+            if not pending:
+                pending = events.wait(last_id, timeout=15)
+                if pending is None:
+                    # 事件已被淘汰，重新送出完整狀態
+                    last_id = events.last_id
+                    yield _sse(events.event_id(last_id), "snapshot",
+                               {"tasks": task_manager.get_task_summaries(notebook_id)})
+                    pending = []
+                    continue
+                if not pending:
+                    yield ": keepalive\n\n"
+                    continue
+            for event in pending:
+                last_id = event["id"]
+                if notebook_id and event["data"].get("notebook_id") != notebook_id:
+                    continue
+                yield _sse(events.event_id(event["id"]), event["event"], event["data"])
+            pending = []
+
+    return sse_response(generate, wake=events.wake)
+
+
 @api_bp.route('/tasks/<task_id>', methods=['GET'])
 def get_task_status(task_id):
-    """取得任務狀態"""
+    """取得任務狀態（trace=1 時附上追蹤時間軸）"""
     task = task_manager.get_task(task_id)
     if task:
-        return jsonify({"success": True, "task": task})
+        response = {"success": True, "task": task}
+        if request.args.get('trace') in ('1', 'true'):
+            response["trace"] = tracer.get_trace(task["trace_id"]) if task.get("trace_id") else None
+        return jsonify(response)
     return jsonify({"success": False, "error": "任務不存在"}), 404
 
 
+@api_bp.route('/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """取得追蹤時間軸（僅保留最近的追蹤）"""
+    trace = tracer.get_trace(trace_id)
+    if trace is None:
+        return jsonify({"success": False, "error": "追蹤不存在或已淘汰"}), 404
+    return jsonify({"success": True, "trace": trace})
+
+
+@api_bp.route('/tasks/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """取消尚未開始的任務"""
+    if task_manager.cancel_task(task_id):
+        return jsonify({"success": True, "message": "任務已取消"})
+    return jsonify({"success": False, "error": "任務不存在或已開始執行"}), 409
+
+
+def _encode_cursor(cursor) -> str:
+    """將 (created_at, id) 編碼為不透明的分頁游標"""
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode()
+
+
+def _decode_cursor(value: str) -> tuple:
+    created_at, task_id = json.loads(base64.urlsafe_b64decode(value.encode()))
+    return created_at, task_id
+
+
+def _parse_time(value: str) -> str:
+    """驗證 ISO 8601 時間並轉為與任務紀錄相同的格式"""
+    return datetime.fromisoformat(value).isoformat()
+
+
 @api_bp.route('/tasks', methods=['GET'])
 def list_tasks():
-    """列出所有任務"""
-    tasks = task_manager.get_all_tasks()
-    return jsonify({"success": True, "tasks": tasks})
+    """列出任務（分頁、篩選、欄位投影）
+
+    查詢參數：status（逗號分隔）、name、notebook_id、since、until、cursor、
+    limit（預設 50，上限 200）、fields（逗號分隔，預設不含 result）。
+    """
+    etag = hashlib.sha1(
+        f"{task_manager.list_version()}?{request.query_string.decode()}".encode()
+    ).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={"ETag": f'W/"{etag}"'})
+
+    args = request.args
+    try:
+        limit = min(max(int(args.get('limit', 50)), 1), 200)
+        cursor = _decode_cursor(args['cursor']) if args.get('cursor') else None
+        since = _parse_time(args['since']) if args.get('since') else None
+        until = _parse_time(args['until']) if args.get('until') else None
+    except (ValueError, TypeError):
+        return jsonify({"success": False, "error": "無效的查詢參數"}), 400
+
+    statuses = [s for s in args.get('status', '').split(',') if s] or None
+    fields = [f for f in args.get('fields', '').split(',') if f] or None
+
+    page = task_manager.query_tasks(
+        statuses=statuses,
+        name=args.get('name'),
+        notebook_id=args.get('notebook_id'),
+        created_after=since,
+        created_before=until,
+        cursor=cursor,
+        limit=limit,
+        fields=fields
+    )
+    response = jsonify({
+        "success": True,
+        "tasks": page["tasks"],
+        "next_cursor": _encode_cursor(page["next_cursor"]) if page["next_cursor"] else None,
+        "queue": task_manager.get_queue_stats()
+    })
+    response.set_etag(etag, weak=True)
+    return response
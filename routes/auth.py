@@ -1,12 +1,13 @@
 """認證相關 API"""
-from flask import jsonify
+from flask import jsonify, request
 from . import api_bp
 from services.notebooklm_service import notebooklm_service
 
 @api_bp.route('/auth/status', methods=['GET'])
 def get_auth_status():
-    """檢查認證狀態"""
-    result = notebooklm_service.check_auth_status()
+    """檢查認證狀態（?refresh=1 時立即重新驗證）"""
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    result = notebooklm_service.check_auth_status(refresh=refresh)
     return jsonify(result)
 
 @api_bp.route('/auth/login', methods=['POST'])
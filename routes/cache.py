@@ -0,0 +1,41 @@
+"""快取管理 API"""
+from flask import jsonify
+from . import api_bp
+from services.notebooklm_service import notebooklm_service
+from services.nlp_parser import nlp_parser
+from services.metrics import metrics
+
+
+def _hit_ratios():
+    """各快取的命中率（供 /metrics）"""
+    return {
+        ("lists",): notebooklm_service.list_cache.stats()["hit_ratio"],
+        ("answers",): notebooklm_service.answer_cache.stats()["hit_ratio"],
+        ("parses",): nlp_parser.parse_cache.hit_ratio(),
+        ("artifacts",): notebooklm_service.artifact_cache.stats()["hit_ratio"]
+    }
+
+
+metrics.gauge_callback("cache_hit_ratio", "快取命中率", ("cache",), _hit_ratios)
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """取得快取命中統計"""
+    return jsonify({
+        "success": True,
+        "caches": {
+            "lists": notebooklm_service.list_cache.stats(),
+            "answers": notebooklm_service.answer_cache.stats(),
+            "parses": nlp_parser.stats(),
+            "artifacts": notebooklm_service.artifact_cache.stats()
+        }
+    })
+
+@api_bp.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """清除列表、答案與指令解析快取"""
+    notebooklm_service.list_cache.clear()
+    notebooklm_service.answer_cache.clear()
+    nlp_parser.parse_cache.clear()
+    return jsonify({"success": True, "message": "快取已清除"})
@@ -1,9 +1,17 @@
 """自然語言執行 API"""
 from flask import jsonify, request
 from . import api_bp
+from .artifacts import _sse
+from .streaming import sse_response
+from services.batch_executor import BatchRunner, build_plan, ON_ERROR_MODES
+from services.config_manager import config_manager
 from services.nlp_parser import nlp_parser
 from services.notebooklm_service import notebooklm_service
+from services.ask_manager import ask_manager, AskQueueFull
+from services.generation_pipeline import generation_pipeline
+from services.research_jobs import research_runner
 from services.task_manager import task_manager
+from services.tracing import tracer
 
 @api_bp.route('/execute', methods=['POST'])
 def execute_command():
@@ -11,6 +19,7 @@ def execute_command():
     data = request.get_json()
     command = data.get('command', '')
     notebook_id = data.get('notebook_id')  # 可選，指定筆記本
+    async_mode = data.get('async', False)  # 可選，提問改為非同步回傳 ask_id
 
     if not command:
         return jsonify({"success": False, "error": "請提供指令"}), 400
@@ -28,13 +37,99 @@ def execute_command():
         })
 
     # 根據意圖執行對應操作
-    result = _execute_intent(intent, params, notebook_id)
+    with tracer.child_span("execute.intent", intent=intent):
+        result = _execute_intent(intent, params, notebook_id, async_mode)
     result["parsed"] = parsed
 
     return jsonify(result)
 
 
-def _execute_intent(intent: str, params: dict, notebook_id: str = None) -> dict:
+@api_bp.route('/execute/batch', methods=['POST'])
+def execute_batch():
+    """批次執行自然語言指令
+
+    commands 為指令字串或 {"command", "notebook_id"} 物件的列表。所有指令一次解析
+    （LLM 模式只呼叫一次 LLM），依筆記本與意圖建立依賴計畫後並行執行；
+    預設以 SSE 串流 plan / step / done 事件，stream 為 false 時回傳完整結果。
+    """
+    data = request.get_json() or {}
+    commands = data.get('commands')
+    notebook_id = data.get('notebook_id')
+    on_error = data.get('on_error', 'continue')
+    max_commands = config_manager.get("batch_max_commands", 100)
+
+    if not isinstance(commands, list) or not commands:
+        return jsonify({"success": False, "error": "請提供指令列表"}), 400
+    if len(commands) > max_commands:
+        return jsonify({"success": False, "error": f"單次最多 {max_commands} 個指令"}), 400
+    if on_error not in ON_ERROR_MODES:
+        return jsonify({"success": False, "error": f"無效的失敗處理方式: {on_error}"}), 400
+    try:
+        deadline = float(data.get('deadline', config_manager.get("batch_deadline", 600)))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "deadline 必須是秒數"}), 400
+
+    texts, notebook_ids = [], []
+    for item in commands:
+        if isinstance(item, dict):
+            texts.append(str(item.get('command', '')))
+            notebook_ids.append(item.get('notebook_id') or notebook_id)
+        else:
+            texts.append(str(item))
+            notebook_ids.append(notebook_id)
+
+    steps = build_plan(texts, nlp_parser.parse_many(texts), notebook_ids)
+    runner = BatchRunner(
+        steps, _execute_step,
+        max_workers=config_manager.get("batch_concurrency", 4),
+        on_error=on_error,
+        deadline=deadline
+    )
+
+    if not data.get('stream', True):
+        for _ in runner.run():
+            pass
+        return jsonify(runner.summary())
+
+    def generate(alive):
+        event_id = 1
+        yield _sse(event_id, "plan", {"steps": [
+            {"index": step.index, "command": step.command, "intent": step.intent,
+             "notebook_id": step.notebook_id, "depends_on": step.depends_on, "parsed": step.parsed}
+            for step in steps
+        ]})
+        for step in runner.run():
+            event_id += 1
+            yield _sse(event_id, "step", step.to_dict())
+            if not alive():
+                # 伺服器關閉中：回報已完成的步驟後結束
+                break
+        summary = runner.summary()
+        summary.pop("steps")
+        yield _sse(event_id + 1, "done", summary)
+
+    # 批次本身受 batch_deadline 限制且無法續傳，不套用串流存活時間
+    return sse_response(generate, limit_lifetime=False)
+
+
+def _execute_step(step) -> dict:
+    """執行批次中的單一步驟"""
+    if not step.command:
+        return {"success": False, "error": "請提供指令"}
+    if not step.intent:
+        return {"success": False, "error": "無法理解您的指令，請嘗試更明確的描述"}
+    result = _execute_intent(step.intent, step.params, step.notebook_id)
+    if step.intent == "research" and result.get("task_id"):
+        # 後續步驟依賴研究匯入的來源，批次中等待研究任務結束
+        task = task_manager.wait_task(result["task_id"], timeout=research_runner.timeout)
+        if task is None or task.get("status") in ("pending", "running"):
+            return {"success": False, "error": "研究逾時", "task_id": result["task_id"]}
+        return task.get("result") or {"success": False, "error": task.get("error") or "研究失敗"}
+    return result
+
+
+def _execute_intent(intent: str, params: dict, notebook_id: str = None,
+                    async_mode: bool = False) -> dict:
     """根據意圖執行操作"""
 
     # ===== 筆記本管理 =====
@@ -87,81 +182,52 @@ def _execute_intent(intent: str, params: dict, notebook_id: str = None) -> dict:
         question = params.get('question')
         if not question:
             return {"success": False, "error": "請提供問題"}
-        return notebooklm_service.ask_question(question, notebook_id)
+        # 經由提問池執行，與 /notebooks/<id>/ask 共用並行上限
+        try:
+            job = ask_manager.submit(question, notebook_id)
+        except AskQueueFull as e:
+            return {"success": False, "error": str(e)}
+        if async_mode:
+            return job.to_handle()
+        if not job.wait(timeout=200):
+            return {"success": False, "error": "操作逾時"}
+        return dict(job.result)
 
     # ===== 內容生成 =====
     elif intent == "generate_audio":
-        task_id = task_manager.create_task(
-            name="生成 Podcast",
-            func=notebooklm_service.generate_audio,
-            kwargs={"notebook_id": notebook_id}
-        )
+        task_id = generation_pipeline.submit("audio", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成 Podcast，請稍候..."}
 
     elif intent == "generate_video":
-        task_id = task_manager.create_task(
-            name="生成影片",
-            func=notebooklm_service.generate_video,
-            kwargs={"notebook_id": notebook_id}
-        )
+        task_id = generation_pipeline.submit("video", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成影片，請稍候..."}
 
     elif intent == "generate_quiz":
         quantity = "more" if params.get('quantity', 0) > 10 else "standard"
-        task_id = task_manager.create_task(
-            name="生成測驗",
-            func=notebooklm_service.generate_quiz,
-            kwargs={"notebook_id": notebook_id, "quantity": quantity}
-        )
+        task_id = generation_pipeline.submit("quiz", notebook_id, {"quantity": quantity})
         return {"success": True, "task_id": task_id, "message": "已開始生成測驗，請稍候..."}
 
     elif intent == "generate_flashcards":
-        task_id = task_manager.create_task(
-            name="生成閃卡",
-            func=notebooklm_service.generate_flashcards,
-            kwargs={"notebook_id": notebook_id}
-        )
+        task_id = generation_pipeline.submit("flashcards", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成閃卡，請稍候..."}
 
     elif intent == "generate_report":
-        task_id = task_manager.create_task(
-            name="生成報告",
-            func=notebooklm_service.generate_report,
-            kwargs={"notebook_id": notebook_id}
-        )
+        task_id = generation_pipeline.submit("report", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成報告，請稍候..."}
 
     elif intent == "generate_mindmap":
         return notebooklm_service.generate_mindmap(notebook_id)
 
     elif intent == "generate_infographic":
-        task_id = task_manager.create_task(
-            name="生成資訊圖",
-            func=lambda: notebooklm_service._run_cli(
-                ["generate", "infographic", "--json", "--notebook", notebook_id] if notebook_id
-                else ["generate", "infographic", "--json"]
-            )
-        )
+        task_id = generation_pipeline.submit("infographic", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成資訊圖，請稍候..."}
 
     elif intent == "generate_slides":
-        task_id = task_manager.create_task(
-            name="生成簡報",
-            func=lambda: notebooklm_service._run_cli(
-                ["generate", "slide-deck", "--json", "--notebook", notebook_id] if notebook_id
-                else ["generate", "slide-deck", "--json"]
-            )
-        )
+        task_id = generation_pipeline.submit("slide-deck", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成簡報，請稍候..."}
 
     elif intent == "generate_datatable":
-        task_id = task_manager.create_task(
-            name="生成數據表",
-            func=lambda: notebooklm_service._run_cli(
-                ["generate", "data-table", "--json", "--notebook", notebook_id] if notebook_id
-                else ["generate", "data-table", "--json"]
-            )
-        )
+        task_id = generation_pipeline.submit("data-table", notebook_id)
         return {"success": True, "task_id": task_id, "message": "已開始生成數據表，請稍候..."}
 
     # ===== 工件管理 =====
@@ -169,11 +235,23 @@ def _execute_intent(intent: str, params: dict, notebook_id: str = None) -> dict:
         return notebooklm_service.list_artifacts(notebook_id)
 
     elif intent == "download":
-        # 下載需要更多參數，回傳提示
+        artifact_type = params.get('artifact_type')
+        if not artifact_type:
+            return {
+                "success": False,
+                "error": "請指定要下載的內容類型（audio/video/report/mindmap 等）",
+                "hint": "例如：下載 Podcast、下載報告"
+            }
+        if not notebook_id:
+            return {"success": False, "error": "請指定要下載的筆記本"}
+        artifact = notebooklm_service.find_artifact(notebook_id, artifact_type=artifact_type)
+        if artifact is None:
+            return {"success": False, "error": "找不到可下載的內容，請先生成"}
         return {
-            "success": False,
-            "error": "請指定要下載的內容類型（audio/video/report/mindmap 等）",
-            "hint": "例如：下載 Podcast、下載報告"
+            "success": True,
+            "artifact_id": artifact.get("id"),
+            "download_url": f"/api/notebooks/{notebook_id}/artifacts/{artifact.get('id')}/download?type={artifact_type}",
+            "message": f"已找到「{artifact.get('title') or artifact_type}」"
         }
 
     # ===== 研究功能 =====
@@ -181,7 +259,10 @@ def _execute_intent(intent: str, params: dict, notebook_id: str = None) -> dict:
         query = params.get('question') or params.get('name')
         if not query:
             return {"success": False, "error": "請提供搜尋關鍵字"}
-        return notebooklm_service.add_research(query, notebook_id)
+        result = research_runner.submit(notebook_id, [query])
+        if result["success"]:
+            result["message"] = "已開始研究，匯入的來源會陸續出現，請稍候..."
+        return result
 
     # ===== 幫助 =====
     elif intent == "help":
@@ -44,6 +44,18 @@ def update_settings():
         if data['openai_model'] not in config_manager.OPENAI_MODELS:
             return jsonify({"success": False, "error": f"無效的 OpenAI 模型: {data['openai_model']}"}), 400
 
+    if 'notebooklm_backend' in data:
+        if data['notebooklm_backend'] not in config_manager.NOTEBOOKLM_BACKENDS:
+            return jsonify({"success": False, "error": f"無效的 NotebookLM 後端: {data['notebooklm_backend']}"}), 400
+
+    if 'task_store' in data:
+        if data['task_store'] not in config_manager.TASK_STORES:
+            return jsonify({"success": False, "error": f"無效的任務儲存方式: {data['task_store']}"}), 400
+
+    if 'task_broker' in data:
+        if data['task_broker'] not in config_manager.TASK_BROKERS:
+            return jsonify({"success": False, "error": f"無效的任務佇列方式: {data['task_broker']}"}), 400
+
     # 更新設定
     success = config_manager.update(data)
 
@@ -1,7 +1,15 @@
 """來源管理 API"""
-from flask import jsonify, request
+import os
+import tempfile
+from pathlib import Path
+from flask import jsonify, request, current_app
+from werkzeug.formparser import parse_form_data
 from . import api_bp
+from services.config_manager import config_manager
+from services.content_index import hash_file
 from services.notebooklm_service import notebooklm_service
+from services.research_jobs import research_runner
+from services.source_ingest import source_ingester
 
 @api_bp.route('/notebooks/<notebook_id>/sources', methods=['GET'])
 def list_sources(notebook_id):
@@ -28,6 +36,90 @@ def add_source(notebook_id):
 
     return jsonify(result)
 
+@api_bp.route('/notebooks/<notebook_id>/sources/upload', methods=['POST'])
+def upload_source(notebook_id):
+    """上傳檔案並新增為來源（multipart，欄位 file）
+
+    請求內容直接串流寫入上傳目錄中的暫存檔，不會整個載入記憶體；
+    檔案依內容雜湊存放，同一筆記本已有相同內容時不會再次上傳。
+    """
+    upload_dir = Path(config_manager.get("upload_dir") or Path(current_app.root_path) / "data" / "uploads")
+    tmp_dir = upload_dir / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        return tempfile.NamedTemporaryFile("wb+", dir=tmp_dir, delete=False)
+
+    _, _, files = parse_form_data(request.environ, stream_factory=stream_factory,
+                                  max_content_length=current_app.config.get('MAX_CONTENT_LENGTH'))
+    # 每個檔案欄位（含重複的欄位名稱）都各自寫入一個暫存檔，全部關閉並於結束時刪除
+    parts = [upload for _, upload in files.items(multi=True)]
+    temp_paths = []
+    for part in parts:
+        part.stream.close()
+        if hasattr(part.stream, "name"):
+            temp_paths.append(part.stream.name)
+
+    try:
+        if len(parts) > 1:
+            return jsonify({"success": False, "error": "一次只能上傳一個檔案"}), 400
+        upload = files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({"success": False, "error": "請選擇要上傳的檔案"}), 400
+        sha256 = hash_file(upload.stream.name)
+        dest = upload_dir / sha256 / _safe_filename(upload.filename)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if not dest.exists():
+            os.replace(upload.stream.name, dest)
+    finally:
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    result = notebooklm_service.add_source_file(str(dest), notebook_id, sha256=sha256)
+    result["sha256"] = sha256
+    return jsonify(result)
+
+def _safe_filename(filename: str) -> str:
+    """保留原始檔名（含中文）作為來源標題，只去除路徑與控制字元"""
+    name = os.path.basename(filename.replace("\\", "/")).strip()
+    name = "".join(ch for ch in name if ch.isprintable())
+    return name if name not in ("", ".", "..") else "upload"
+
+@api_bp.route('/notebooks/<notebook_id>/sources/bulk', methods=['POST'])
+def add_sources_bulk(notebook_id):
+    """批次新增來源
+
+    JSON：{"items": [網址或路徑字串，或 {"type", "value"}]}；
+    或以 multipart 上傳清單檔（欄位 file，每行一個網址或路徑）。
+    已存在或重複的項目會略過；有新項目時建立背景任務並回傳 task_id。
+    """
+    if 'file' in request.files:
+        entries = request.files['file'].read().decode('utf-8', errors='replace').splitlines()
+    else:
+        data = request.get_json(silent=True) or {}
+        entries = data.get('items')
+        if not isinstance(entries, list):
+            return jsonify({"success": False, "error": "請提供來源列表"}), 400
+
+    plan = source_ingester.plan(notebook_id, entries)
+    if not plan["new"]:
+        return jsonify({
+            "success": True,
+            "task_id": None,
+            "skipped": plan["skipped"],
+            "message": "沒有需要新增的來源"
+        })
+
+    task_id = source_ingester.submit(notebook_id, plan["new"])
+    return jsonify({
+        "success": True,
+        "task_id": task_id,
+        "queued": len(plan["new"]),
+        "skipped": plan["skipped"],
+        "message": f"已開始匯入 {len(plan['new'])} 個來源，請稍候..."
+    }), 202
+
 @api_bp.route('/notebooks/<notebook_id>/sources/<source_id>', methods=['DELETE'])
 def delete_source(notebook_id, source_id):
     """刪除來源"""
@@ -36,14 +128,21 @@ def delete_source(notebook_id, source_id):
 
 @api_bp.route('/notebooks/<notebook_id>/research', methods=['POST'])
 def add_research(notebook_id):
-    """新增研究"""
-    data = request.get_json()
-    query = data.get('query', '')
+    """新增研究（背景任務）
+
+    JSON：{"query": "..."} 或 {"queries": [...]}（同一任務依序執行），可選 mode（fast / deep）
+    與 source（web / drive）。回傳 task_id；匯入的來源會逐步出現在任務的 partial.sources。
+    """
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list):
+        queries = [data.get('query', '')]
     mode = data.get('mode', 'fast')
     source = data.get('source', 'web')
 
-    if not query:
-        return jsonify({"success": False, "error": "請提供搜尋關鍵字"}), 400
-
-    result = notebooklm_service.add_research(query, notebook_id, mode, source)
-    return jsonify(result)
+    result = research_runner.submit(notebook_id, queries, mode, source)
+    if not result["success"]:
+        return jsonify(result), 400
+    count = len([q for q in queries if isinstance(q, str) and q.strip()])
+    result["message"] = f"已開始研究 {count} 個主題，請稍候..." if count > 1 else "已開始研究，請稍候..."
+    return jsonify(result), 202
@@ -0,0 +1,93 @@
+"""SSE 串流的連線上限、存活時間與關閉"""
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+from flask import Response, jsonify, stream_with_context
+from services.config_manager import config_manager
+
+
+class StreamLimiter:
+    """SSE 串流限制
+
+    每個串流在整個連線期間佔用一個請求執行緒，因此同時開啟的串流最多 max_streams 個
+    （應小於伺服器執行緒數，保留執行緒給一般請求），超過時回傳 503。每個串流最長
+    max_lifetime 秒後結束，由瀏覽器帶 Last-Event-ID 重新連線；drain() 喚醒所有等待中的
+    串流並使其結束，讓關閉伺服器時不會被開著的頁面卡住。
+    """
+
+    def __init__(self, max_streams: int = 8, max_lifetime: float = 300):
+        self.max_streams = max_streams
+        self.max_lifetime = max_lifetime
+        self._wakers: Dict[int, Optional[Callable[[], None]]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._draining = threading.Event()
+
+    def acquire(self, wake: Optional[Callable[[], None]] = None) -> Optional[int]:
+        """取得串流名額，回傳名額 ID（已滿或關閉中時回傳 None）"""
+        with self._lock:
+            if self._draining.is_set() or len(self._wakers) >= self.max_streams:
+                return None
+            slot = next(self._ids)
+            self._wakers[slot] = wake
+            return slot
+
+    def release(self, slot: int):
+        with self._lock:
+            self._wakers.pop(slot, None)
+
+    def limit_to_threads(self, threads: int):
+        """串流數不超過請求執行緒數的一半，保留執行緒給一般請求"""
+        self.max_streams = max(1, min(self.max_streams, threads // 2))
+
+    def drain(self):
+        """通知所有串流結束，之後不再接受新串流"""
+        self._draining.set()
+        with self._lock:
+            wakers = [wake for wake in self._wakers.values() if wake]
+        for wake in wakers:
+            wake()
+
+    @property
+    def draining(self) -> bool:
+        return self._draining.is_set()
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._wakers), "max_streams": self.max_streams, "max_lifetime": self.max_lifetime}
+
+
+def sse_response(generate: Callable[[Callable[[], bool]], Iterator[str]],
+                 wake: Optional[Callable[[], None]] = None, limit_lifetime: bool = True) -> Response:
+    """以 stream_limiter 包裝 SSE 產生器
+
+    generate(alive) 須在每次等待後呼叫 alive()，回傳 False 時結束；wake 用於 drain 時
+    喚醒串流正在等待的事件來源。無法續傳的串流（本身已有時限）以 limit_lifetime=False
+    只在 drain 時結束。
+    """
+    slot = stream_limiter.acquire(wake)
+    if slot is None:
+        response = jsonify({"success": False, "error": "同時開啟的串流過多，請稍後再試"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    deadline = time.monotonic() + stream_limiter.max_lifetime if limit_lifetime else None
+
+    def alive() -> bool:
+        if stream_limiter.draining:
+            return False
+        return deadline is None or time.monotonic() < deadline
+
+    response = Response(stream_with_context(generate(alive)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: stream_limiter.release(slot))
+    return response
+
+
+# 建立單例
+stream_limiter = StreamLimiter(
+    max_streams=config_manager.get("sse_max_streams", 8),
+    max_lifetime=config_manager.get("sse_max_lifetime", 300)
+)
@@ -0,0 +1,20 @@
+"""上游呼叫狀態 API"""
+from flask import jsonify
+from . import api_bp
+from services.notebooklm_service import notebooklm_service
+from services.metrics import metrics
+
+
+def _breaker_open():
+    """各操作類別的斷路器是否開啟（1 為開啟，供 /metrics）"""
+    return {(name,): int(breaker.stats()["state"] != "closed")
+            for name, breaker in notebooklm_service.guard.breakers.items()}
+
+
+metrics.gauge_callback("upstream_circuit_open", "上游斷路器是否開啟（含半開）", ("operation",), _breaker_open)
+
+
+@api_bp.route('/upstream/status', methods=['GET'])
+def get_upstream_status():
+    """取得各操作類別的限流器、斷路器與錯誤統計"""
+    return jsonify({"success": True, "upstream": notebooklm_service.guard.stats()})
@@ -0,0 +1,115 @@
+"""
+亮言~NotebookLM 自動化 Skill
+正式環境啟動程式
+
+    python serve.py [--host 0.0.0.0] [--port 5000] [--threads 16]
+
+預設值來自 config.py 的 ProductionConfig（可用 HOST / PORT / THREADS /
+SHUTDOWN_TIMEOUT 環境變數覆寫），以固定執行緒數的 Werkzeug 伺服器執行（不啟用除錯與
+自動重新載入）。收到 SIGINT / SIGTERM 時停止接受新連線並結束所有 SSE 串流，等待處理中的
+請求與任務佇列中執行中的任務結束（合計最多 SHUTDOWN_TIMEOUT 秒）後離開。
+多行程部署請使用 gunicorn.conf.py。
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from werkzeug.serving import BaseWSGIServer
+from app import create_app, shutdown_services
+from config import ProductionConfig
+from routes.streaming import stream_limiter
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """以固定大小執行緒池處理請求的 Werkzeug 伺服器
+
+    Werkzeug 的 threaded 模式每個連線開一個執行緒、沒有上限；這裡改為最多
+    threads 個，超過時連線在池中排隊。SSE 串流同樣佔用執行緒，數量由
+    routes.streaming 的 sse_max_streams 限制。
+    """
+
+    def __init__(self, host: str, port: int, app, threads: int = 16):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self._futures = set()
+        self._futures_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        future = self._pool.submit(self._process, request, client_address)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+
+    def _forget(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, timeout: float) -> int:
+        """等待處理中的請求結束（最多 timeout 秒），回傳仍未結束的請求數"""
+        self._pool.shutdown(wait=False)
+        with self._futures_lock:
+            futures = list(self._futures)
+        _, not_done = wait(futures, timeout=timeout)
+        return len(not_done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以正式環境設定啟動網頁伺服器")
+    parser.add_argument("--host", default=ProductionConfig.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=ProductionConfig.SERVER_PORT)
+    parser.add_argument("--threads", type=int, default=ProductionConfig.SERVER_THREADS)
+    parser.add_argument("--shutdown-timeout", type=float, default=ProductionConfig.SHUTDOWN_TIMEOUT)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    stream_limiter.limit_to_threads(args.threads)
+    server = PooledWSGIServer(args.host, args.port, app, args.threads)
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    server_thread = threading.Thread(target=server.serve_forever, name="http-server", daemon=True)
+    server_thread.start()
+    print(f"   正式環境伺服器已啟動: http://{args.host}:{args.port}（{args.threads} 個執行緒）")
+
+    # 主執行緒只等待訊號；Windows 上 Event.wait() 不會被 Ctrl+C 中斷，因此分段等待
+    while not stopping.wait(1.0):
+        if not server_thread.is_alive():
+            break
+
+    print("   停止接受新連線，等待處理中的請求與任務結束...")
+    deadline = time.monotonic() + args.shutdown_timeout
+    stream_limiter.drain()
+    server.shutdown()
+    unfinished = server.drain(args.shutdown_timeout)
+    server.server_close()
+    if unfinished:
+        print(f"   仍有 {unfinished} 個請求未結束")
+    remaining = shutdown_services(max(0.0, deadline - time.monotonic()))
+    if remaining["running"] or remaining["pending"]:
+        print(f"   仍有 {remaining['running']} 個執行中、{remaining['pending']} 個排隊中的任務未完成")
+    print("   已關閉")
+    if unfinished:
+        # 執行緒池的執行緒在直譯器結束時會被等待，逾時未結束的請求需強制離開
+        sys.stdout.flush()
+        os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
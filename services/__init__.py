@@ -3,3 +3,4 @@ from .notebooklm_service import NotebookLMService
 from .nlp_parser import NLPParser
 from .task_manager import TaskManager
 from .config_manager import ConfigManager
+from .client_pool import NotebookLMClientPool
@@ -0,0 +1,185 @@
+"""提問答案快取（內容定址、磁碟儲存、請求合併）"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+def normalize_question(question: str) -> str:
+    """正規化問題文字：全半形統一、小寫、合併空白、去除結尾標點"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?？。.!！~ ")
+
+
+def source_fingerprint(sources: List[Dict[str, Any]]) -> str:
+    """以來源 ID 集合計算指紋，新增或刪除來源都會改變指紋"""
+    ids = sorted(str(s.get("id")) for s in sources if isinstance(s, dict))
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def answer_key(notebook_id: str, question: str, fingerprint: str) -> str:
+    """計算答案的內容位址"""
+    raw = json.dumps([notebook_id, normalize_question(question), fingerprint], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class AnswerCache:
+    """磁碟答案快取
+
+    每個答案存為 <key>.json；總大小超過 max_bytes 時依最後使用時間淘汰。
+    相同 key 的並行請求只會呼叫一次 compute。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 100 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._index: Dict[str, List[float]] = {}  # key -> [size, last_used]
+        self._total = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "evictions": 0}
+        self._loaded = False
+
+    def _load_index(self):
+        """掃描快取目錄建立索引（呼叫時須持有鎖）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob("*.json"):
+            stat = path.stat()
+            self._index[path.stem] = [stat.st_size, stat.st_mtime]
+            self._total += stat.st_size
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        """讀取快取答案"""
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            self._index[key][1] = time.time()
+        try:
+            value = json.loads(self._path(key).read_text(encoding="utf-8"))
+            os.utime(self._path(key))
+            return value
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry:
+                    self._total -= entry[0]
+            return None
+
+    def put(self, key: str, value: Any):
+        """寫入快取答案並依大小淘汰"""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_dir / f".{key}.{threading.get_ident()}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._load_index()
+            old = self._index.get(key)
+            if old:
+                self._total -= old[0]
+            self._index[key] = [len(data), time.time()]
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        """超過大小上限時淘汰最久未使用的答案（呼叫時須持有鎖）"""
+        if self._total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            self._path(key).unlink(missing_ok=True)
+            del self._index[key]
+            self._total -= size
+            self._stats["evictions"] += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       should_cache: Callable[[Any], bool] = lambda value: True,
+                       use_cache: bool = True) -> tuple:
+        """取得答案，回傳 (結果, 是否來自快取)
+
+        use_cache 為 False 時略過讀取與合併，直接呼叫 compute 並以新結果覆寫快取。
+        """
+        if not use_cache:
+            with self._lock:
+                self._stats["bypassed"] += 1
+            value = compute()
+            if should_cache(value):
+                self.put(key, value)
+            return value, False
+
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return cached, True
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            try:
+                flight.value = compute()
+                if should_cache(flight.value):
+                    self.put(key, flight.value)
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, False
+
+    def clear(self):
+        """清除所有快取答案"""
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._path(key).unlink(missing_ok=True)
+            self._index.clear()
+            self._total = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """取得命中統計"""
+        with self._lock:
+            self._load_index()
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total
+            stats["max_bytes"] = self.max_bytes
+            stats["in_flight"] = len(self._flights)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,166 @@
+"""工件檔案快取（依工件 ID 存放、LRU 大小淘汰、下載合併與重試）"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# 下載類型對應的副檔名
+DOWNLOAD_TYPES = {
+    "audio": ".mp3",
+    "video": ".mp4",
+    "slide-deck": ".pdf",
+    "infographic": ".png",
+    "report": ".md",
+    "mind-map": ".json",
+    "data-table": ".csv",
+    "quiz": ".json",
+    "flashcards": ".json",
+}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class ArtifactCache:
+    """磁碟工件快取
+
+    工件完成後內容不再改變，因此以工件 ID 為 key 永久保存，只在總大小超過
+    max_bytes 時依最後使用時間淘汰。下載先寫入 <id>.part.<副檔名>，完成後才改名，
+    中斷的下載不會留下不完整的快取；失敗時依 retries 次數重試。
+    同一工件同時只有一個下載在進行。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 * 1024 * 1024,
+                 retries: int = 2, backoff: float = 2.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._index: Dict[str, list] = {}  # 檔名 -> [size, last_used]
+        self._total = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "retries": 0, "evictions": 0}
+        self._loaded = False
+
+    def _load_index(self):
+        """掃描快取目錄建立索引（呼叫時須持有鎖）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and ".part" not in path.suffixes:
+                stat = path.stat()
+                self._index[path.name] = [stat.st_size, stat.st_atime]
+                self._total += stat.st_size
+
+    def path_for(self, artifact_id: str, artifact_type: str) -> Path:
+        return self.cache_dir / f"{artifact_id}{DOWNLOAD_TYPES.get(artifact_type, '')}"
+
+    def get_or_fetch(self, artifact_id: str, artifact_type: str,
+                     fetch: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """取得快取檔案，必要時呼叫 fetch(輸出路徑) 下載
+
+        回傳 {"success", "path", "cached"} 或 fetch 的失敗結果。
+        """
+        path = self.path_for(artifact_id, artifact_type)
+        with self._lock:
+            self._load_index()
+            if path.name in self._index and path.exists():
+                self._index[path.name][1] = time.time()
+                self._stats["hits"] += 1
+                return {"success": True, "path": str(path), "cached": True}
+            flight = self._flights.get(path.name)
+            leader = flight is None
+            if leader:
+                flight = self._flights[path.name] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            flight.result = self._download(path, fetch)
+        except Exception as e:
+            flight.result = {"success": False, "error": str(e)}
+        finally:
+            with self._lock:
+                self._flights.pop(path.name, None)
+            flight.done.set()
+        return flight.result
+
+    def _download(self, path: Path, fetch: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """下載到暫存檔，成功後改名並登記；失敗時重試"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 保留副檔名（CLI 依副檔名決定輸出格式）
+        part = path.with_name(path.stem + ".part" + path.suffix)
+        attempt = 0
+        while True:
+            result = fetch(str(part))
+            if result.get("success") and part.exists():
+                break
+            if attempt >= self.retries:
+                part.unlink(missing_ok=True)
+                if result.get("success"):
+                    return {"success": False, "error": "下載完成但找不到檔案"}
+                return result
+            attempt += 1
+            with self._lock:
+                self._stats["retries"] += 1
+            time.sleep(self.backoff * attempt)
+
+        os.replace(part, path)
+        size = path.stat().st_size
+        with self._lock:
+            old = self._index.get(path.name)
+            if old:
+                self._total -= old[0]
+            self._index[path.name] = [size, time.time()]
+            self._total += size
+            self._evict(keep=path.name)
+        return {"success": True, "path": str(path), "cached": False}
+
+    def _evict(self, keep: str):
+        """超過大小上限時淘汰最久未使用的檔案（呼叫時須持有鎖）"""
+        if self._total <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            (self.cache_dir / name).unlink(missing_ok=True)
+            del self._index[name]
+            self._total -= size
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """清除所有快取檔案"""
+        with self._lock:
+            self._load_index()
+            for name in list(self._index):
+                (self.cache_dir / name).unlink(missing_ok=True)
+            self._index.clear()
+            self._total = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """取得命中統計"""
+        with self._lock:
+            self._load_index()
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total
+            stats["max_bytes"] = self.max_bytes
+            stats["in_flight"] = len(self._flights)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
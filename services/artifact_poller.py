@@ -0,0 +1,168 @@
+"""共用的工件狀態輪詢器"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, List, Optional
+from .config_manager import config_manager
+from .notebooklm_service import notebooklm_service, artifact_state
+
+
+class _Watch:
+    """一個等待中的工件"""
+
+    def __init__(self, artifact_id: str, notebook_id: Optional[str], artifact_type: Optional[str],
+                 timeout: Optional[float], min_delay: float):
+        self.artifact_id = artifact_id
+        self.notebook_id = notebook_id
+        self.artifact_type = artifact_type
+        self.timeout = timeout
+        self.future: Future = Future()
+        self.started = time.monotonic()
+        self.next_check = self.started + min_delay
+        self.overdue_checks = 0
+        self.listeners: List[Callable[[float], None]] = []
+
+
+class ArtifactPoller:
+    """以單一背景執行緒追蹤所有生成中的工件
+
+    每一輪只對有到期工件的筆記本各呼叫一次 list_artifacts，並用同一份結果
+    更新該筆記本所有等待中的工件（不論是否到期）。完成、失敗或逾時時解析對應的 Future，
+    等待的一方不需佔用執行緒。
+
+    檢查間隔依該類型「通常需要多久」調整：距離預估完成時間越遠檢查越稀疏，
+    超過預估時間後由 min_interval 起倍增至 max_interval。預估時間以實際完成時間的
+    指數移動平均持續修正。
+    """
+
+    def __init__(self, min_interval: float = 2.0, max_interval: float = 30.0,
+                 default_expected: float = 120.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_expected = default_expected
+        self._watches: Dict[str, _Watch] = {}
+        self._typical: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"ticks": 0, "list_calls": 0, "resolved": 0}
+
+    def watch(self, artifact_id: str, notebook_id: Optional[str] = None,
+              artifact_type: Optional[str] = None, expected: Optional[float] = None,
+              timeout: Optional[float] = None,
+              on_check: Optional[Callable[[float], None]] = None) -> Future:
+        """開始追蹤工件，回傳結果為 completed / failed / timeout 的 Future
+
+        on_check(已等待秒數) 在每次檢查後仍未完成時呼叫（於輪詢執行緒中）。
+        同一工件重複追蹤時共用同一個 Future。
+        """
+        with self._cond:
+            entry = self._watches.get(artifact_id)
+            if entry is None:
+                if artifact_type and expected and artifact_type not in self._typical:
+                    self._typical[artifact_type] = float(expected)
+                entry = _Watch(artifact_id, notebook_id, artifact_type, timeout, self.min_interval)
+                self._watches[artifact_id] = entry
+            if on_check is not None:
+                entry.listeners.append(on_check)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="artifact-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return entry.future
+
+    def unwatch(self, artifact_id: str):
+        """停止追蹤（例如呼叫端已逾時）"""
+        with self._cond:
+            entry = self._watches.pop(artifact_id, None)
+        if entry is not None:
+            entry.future.cancel()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._watches:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    wake = min(w.next_check for w in self._watches.values())
+                    if wake <= now:
+                        break
+                    self._cond.wait(wake - now)
+                due_notebooks = {w.notebook_id for w in self._watches.values() if w.next_check <= now}
+                self._stats["ticks"] += 1
+            for notebook_id in due_notebooks:
+                self._check_notebook(notebook_id)
+
+    def _check_notebook(self, notebook_id: Optional[str]):
+        """以一次 list_artifacts 更新筆記本內所有等待中的工件"""
+        try:
+            result = notebooklm_service.list_artifacts(notebook_id, fresh=True)
+        except Exception:
+            result = {"success": False}
+        states = {}
+        if result.get("success") and isinstance(result.get("data"), dict):
+            for artifact in result["data"].get("artifacts", []):
+                if isinstance(artifact, dict) and artifact.get("id"):
+                    states[artifact["id"]] = artifact_state(artifact)
+
+        resolved: List[tuple] = []
+        pending: List[_Watch] = []
+        with self._cond:
+            self._stats["list_calls"] += 1
+            now = time.monotonic()
+            for entry in [w for w in self._watches.values() if w.notebook_id == notebook_id]:
+                state = states.get(entry.artifact_id, "processing")
+                if state == "processing" and entry.timeout and now - entry.started >= entry.timeout:
+                    state = "timeout"
+                if state != "processing":
+                    del self._watches[entry.artifact_id]
+                    self._stats["resolved"] += 1
+                    if state == "completed" and entry.artifact_type:
+                        self._learn(entry.artifact_type, now - entry.started)
+                    resolved.append((entry, state))
+                else:
+                    # 剛取得最新狀態，同筆記本的工件一起排定下一次檢查
+                    entry.next_check = now + self._interval(entry, now)
+                    pending.append(entry)
+        for entry, state in resolved:
+            if not entry.future.cancelled():
+                entry.future.set_result(state)
+        for entry in pending:
+            for listener in entry.listeners:
+                try:
+                    listener(now - entry.started)
+                except Exception:
+                    pass
+
+    def _interval(self, entry: _Watch, now: float) -> float:
+        """下一次檢查的間隔（呼叫時須持有鎖）"""
+        expected = self._typical.get(entry.artifact_type, self.default_expected)
+        remaining = expected - (now - entry.started)
+        if remaining > 0:
+            interval = remaining / 2
+        else:
+            interval = self.min_interval * (2 ** entry.overdue_checks)
+            entry.overdue_checks += 1
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _learn(self, artifact_type: str, duration: float):
+        """以實際完成時間修正該類型的預估時間（呼叫時須持有鎖）"""
+        previous = self._typical.get(artifact_type)
+        self._typical[artifact_type] = duration if previous is None else 0.7 * previous + 0.3 * duration
+
+    def stats(self) -> Dict[str, Any]:
+        """取得輪詢統計"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["watching"] = len(self._watches)
+            stats["notebooks"] = len({w.notebook_id for w in self._watches.values()})
+            stats["typical_seconds"] = {k: round(v, 1) for k, v in self._typical.items()}
+        return stats
+
+
+# 建立單例
+artifact_poller = ArtifactPoller(
+    min_interval=config_manager.get("artifact_poll_min_interval", 2),
+    max_interval=config_manager.get("artifact_poll_max_interval", 30)
+)
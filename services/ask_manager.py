@@ -0,0 +1,180 @@
+"""非同步提問管理"""
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, List
+from .config_manager import config_manager
+from .notebooklm_service import notebooklm_service
+
+
+class AskQueueFull(RuntimeError):
+    """提問佇列已滿"""
+
+
+class AskJob:
+    """一次非同步提問
+
+    events 依序記錄 status / chunk / done / error 事件，事件 ID 即其索引 + 1，
+    串流端可憑 Last-Event-ID 續傳。
+    """
+
+    def __init__(self, job_id: str, question: str, notebook_id: Optional[str]):
+        self.id = job_id
+        self.question = question
+        self.notebook_id = notebook_id
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.events: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """新增事件並喚醒等待中的串流"""
+        with self._cond:
+            self.events.append({"id": len(self.events) + 1, "event": event, "data": data})
+            self._cond.notify_all()
+
+    def finish(self, status: str, event: str, result: Dict[str, Any]):
+        """結束提問（狀態與最後一個事件同時生效）"""
+        with self._cond:
+            self.result = result
+            self.finished_at = time.time()
+            self.status = status
+            self.events.append({"id": len(self.events) + 1, "event": event, "data": result})
+            self._cond.notify_all()
+
+    def wake(self):
+        """喚醒等待中的串流（不新增事件）"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_events(self, after: int, timeout: float = 15.0) -> List[Dict[str, Any]]:
+        """等待 after 之後的事件"""
+        with self._cond:
+            if len(self.events) <= after and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[after:]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待提問結束"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.finished, timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_handle(self) -> Dict[str, Any]:
+        """送出後回傳給呼叫端的內容"""
+        return {
+            "success": True,
+            "ask_id": self.id,
+            "status_url": f"/api/ask/{self.id}",
+            "stream_url": f"/api/ask/{self.id}/stream",
+            "message": "已送出問題，請稍候..."
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "question": self.question,
+            "notebook_id": self.notebook_id,
+            "status": self.status,
+            "result": self.result,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+def split_answer(answer: str) -> List[str]:
+    """將答案依段落切成串流片段"""
+    parts = re.split(r"(\n\s*\n)", answer)
+    chunks = []
+    for part in parts:
+        if chunks and not part.strip():
+            chunks[-1] += part
+        elif part:
+            chunks.append(part)
+    return chunks or [answer]
+
+
+class AskManager:
+    """非同步提問管理器
+
+    提問在獨立的執行緒池中執行（與生成任務佇列分開限流），呼叫端立即取得
+    ask_id，再透過輪詢或 SSE 取得答案片段。
+    """
+
+    def __init__(self, ask_func: Callable[..., Dict[str, Any]], max_workers: int = 3,
+                 max_pending: int = 50, retention_seconds: float = 600):
+        self.ask_func = ask_func
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, AskJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ask-worker")
+
+    def submit(self, question: str, notebook_id: Optional[str] = None,
+               new_conversation: bool = False, use_cache: bool = True) -> AskJob:
+        """送出提問，回傳 AskJob"""
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self.jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise AskQueueFull("提問佇列已滿，請稍後再試")
+            job = AskJob(str(uuid.uuid4())[:8], question, notebook_id)
+            self.jobs[job.id] = job
+        job.emit("status", {"status": "queued"})
+        self._executor.submit(self._run, job, new_conversation, use_cache)
+        return job
+
+    def _run(self, job: AskJob, new_conversation: bool, use_cache: bool):
+        """執行提問並發布答案片段"""
+        job.status = "running"
+        job.emit("status", {"status": "running"})
+        try:
+            result = self.ask_func(job.question, job.notebook_id, new_conversation, use_cache=use_cache)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        if result.get("success"):
+            data = result.get("data")
+            answer = data.get("answer") if isinstance(data, dict) else None
+            if isinstance(answer, str):
+                for chunk in split_answer(answer):
+                    job.emit("chunk", {"text": chunk})
+            job.finish("completed", "done", result)
+        else:
+            job.finish("failed", "error", result)
+
+    def get(self, job_id: str) -> Optional[AskJob]:
+        """取得提問"""
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        """移除已結束且超過保留時間的提問（呼叫時須持有鎖）"""
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """取得提問佇列統計"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return {
+            "queued": sum(1 for j in jobs if j.status == "queued"),
+            "running": sum(1 for j in jobs if j.status == "running"),
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending
+        }
+
+
+# 建立單例
+ask_manager = AskManager(
+    notebooklm_service.ask_question,
+    max_workers=config_manager.get("ask_concurrency", 3)
+)
@@ -0,0 +1,135 @@
+"""認證狀態監控（背景驗證，狀態由記憶體提供）"""
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+from .upstream_guard import classify_error
+
+# 狀態：unknown（尚未檢查）、valid、expired（認證錯誤）、error（無法檢查，例如 CLI 不存在）
+AUTH_STATES = ("unknown", "valid", "expired", "error")
+
+
+class AuthMonitor:
+    """認證狀態監控
+
+    背景執行緒每 poll_interval 秒檢查 storage_state.json 的修改時間，只在檔案變更、
+    距上次驗證超過 ttl 秒或被要求確認時才執行 check（auth check）。
+    上游呼叫回報認證錯誤時以 mark_expired 立即標記為過期，並在 verify_delay 秒後
+    重新驗證一次，避免單一呼叫的 403 誤判。狀態在 expired 與其他狀態之間切換時通知監聽者
+    （例如暫停 / 恢復任務佇列）。
+    """
+
+    def __init__(self, check: Callable[[], Dict[str, Any]], storage_path: Path, ttl: float = 300,
+                 poll_interval: float = 5, verify_delay: float = 30):
+        self.check = check
+        self.storage_path = Path(storage_path)
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.verify_delay = verify_delay
+        self._status: Dict[str, Any] = {"state": "unknown", "authenticated": False}
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._verify_at: Optional[float] = None
+        self._listeners: List[Callable[[bool], None]] = []
+        self._lock = threading.Lock()
+        self._checking = threading.Lock()
+        self._first_check = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, callback: Callable[[bool], None]):
+        """註冊狀態切換的監聽者，callback(expired) 在進入或離開 expired 時呼叫"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """啟動背景監控（重複呼叫無作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="auth-monitor", daemon=True)
+                self._thread.start()
+
+    def status(self, refresh: bool = False, wait: float = 15.0) -> Dict[str, Any]:
+        """取得認證狀態（refresh 為 True 時立即重新驗證；首次驗證完成前最多等待 wait 秒）"""
+        self.start()
+        if refresh:
+            self.refresh()
+        elif not self._first_check.is_set():
+            self._first_check.wait(wait)
+        with self._lock:
+            return dict(self._status)
+
+    def is_expired(self) -> bool:
+        return self._status["state"] == "expired"
+
+    def refresh(self) -> Dict[str, Any]:
+        """立即驗證並回傳狀態"""
+        with self._checking:
+            try:
+                mtime = self.storage_path.stat().st_mtime
+            except OSError:
+                mtime = None
+            result = self.check()
+            with self._lock:
+                self._mtime = mtime
+                self._checked_at = time.monotonic()
+                self._verify_at = None
+            if result.get("success"):
+                status = {"state": "valid", "authenticated": True, "details": result.get("data")}
+            else:
+                error = result.get("error") or "未登入"
+                state = "expired" if classify_error(error) == "auth" else "error"
+                status = {"state": state, "authenticated": False, "error": error}
+            self._set_status(status, source="check")
+            self._first_check.set()
+            return status
+
+    def mark_expired(self, error: Optional[str] = None):
+        """上游呼叫回報認證錯誤：標記為過期並排程重新驗證"""
+        with self._lock:
+            if self._status["state"] == "expired":
+                return
+            self._verify_at = time.monotonic() + self.verify_delay
+        self._set_status({"state": "expired", "authenticated": False,
+                          "error": error or "登入已過期，請重新登入"}, source="call")
+        self._wakeup.set()
+
+    def _set_status(self, status: Dict[str, Any], source: str):
+        status = dict(status, source=source, checked_at=datetime.now().isoformat())
+        with self._lock:
+            was_expired = self._status["state"] == "expired"
+            self._status = status
+        expired = status["state"] == "expired"
+        if expired != was_expired:
+            for callback in self._listeners:
+                try:
+                    callback(expired)
+                except Exception as e:
+                    print(f"認證狀態監聽者錯誤: {e}")
+
+    def _due(self) -> bool:
+        """是否需要重新驗證"""
+        try:
+            mtime = self.storage_path.stat().st_mtime
+        except OSError:
+            mtime = None
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is None or mtime != self._mtime:
+                return True
+            if self._verify_at is not None and now >= self._verify_at:
+                return True
+            return now - self._checked_at >= self.ttl
+
+    def _loop(self):
+        while True:
+            try:
+                if self._due():
+                    self.refresh()
+            except Exception as e:
+                print(f"認證狀態檢查失敗: {e}")
+                self._first_check.set()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
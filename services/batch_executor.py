@@ -0,0 +1,242 @@
+"""批次指令執行（依賴規劃與並行執行）"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+# 意圖分類：同一筆記本內，不同類別的步驟依指令順序執行，同類別可並行
+BARRIER_INTENTS = {"create_notebook", "delete_notebook", "use_notebook"}
+SOURCE_INTENTS = {"add_source_url", "add_source_youtube", "add_source_file", "research"}
+
+ON_ERROR_MODES = ["continue", "skip_dependents", "abort"]
+
+
+def intent_class(intent: Optional[str]) -> str:
+    """回傳意圖類別：barrier（筆記本操作）、source（匯入來源）、consumer（其他）"""
+    if intent in BARRIER_INTENTS:
+        return "barrier"
+    if intent in SOURCE_INTENTS:
+        return "source"
+    return "consumer"
+
+
+class BatchStep:
+    """批次中的一個步驟"""
+
+    def __init__(self, index: int, command: str, parsed: Dict[str, Any], notebook_id: Optional[str]):
+        self.index = index
+        self.command = command
+        self.parsed = parsed
+        self.intent = parsed.get("intent")
+        self.params = parsed.get("params", {})
+        self.notebook_id = notebook_id
+        self.depends_on: List[int] = []
+        self.status = "pending"
+        self.result: Optional[Dict[str, Any]] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "skipped", "timeout")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "command": self.command,
+            "intent": self.intent,
+            "notebook_id": self.notebook_id,
+            "depends_on": self.depends_on,
+            "status": self.status,
+            "result": self.result,
+            "elapsed": round(self.finished_at - self.started_at, 3)
+            if self.started_at and self.finished_at else None
+        }
+
+
+def build_plan(commands: List[str], parsed: List[Dict[str, Any]],
+               notebook_ids: List[Optional[str]]) -> List[BatchStep]:
+    """建立依賴計畫
+
+    同一筆記本（未指定筆記本的步驟共用一個範圍）內：
+    - 筆記本操作與前後所有步驟依序執行
+    - 來源匯入等待先前的生成/查詢，生成/查詢等待先前的來源匯入
+    - 同類別的相鄰步驟（如連續新增 30 個網址）可並行
+    不同筆記本之間互不依賴。
+    """
+    steps = [BatchStep(i, command, p, nb) for i, (command, p, nb) in enumerate(zip(commands, parsed, notebook_ids))]
+    for step in steps:
+        cls = intent_class(step.intent)
+        for earlier in steps[:step.index]:
+            if earlier.notebook_id != step.notebook_id:
+                continue
+            earlier_cls = intent_class(earlier.intent)
+            if cls == "barrier" or earlier_cls == "barrier" or cls != earlier_cls:
+                step.depends_on.append(earlier.index)
+    return steps
+
+
+class BatchRunner:
+    """依計畫並行執行步驟
+
+    on_error：
+    - continue：失敗不影響其他步驟
+    - skip_dependents：略過直接或間接依賴失敗步驟的步驟
+    - abort：任一步驟失敗後不再啟動新步驟
+    deadline 秒後尚未開始的步驟標記為 skipped，執行中的標記為 timeout。
+
+    步驟狀態只在 _lock 內變更：步驟結束時由完成回呼記錄結果、標記略過的步驟並送出
+    新的可執行步驟，run() 只從佇列依序取出已結束的步驟。
+    """
+
+    def __init__(self, steps: List[BatchStep], execute: Callable[[BatchStep], Dict[str, Any]],
+                 max_workers: int = 4, on_error: str = "continue", deadline: float = 600):
+        self.steps = steps
+        self.execute = execute
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self.deadline = deadline
+        self.started_at: Optional[float] = None
+        self.aborted = False
+        # 完成回呼可能在送出步驟的執行緒中同步執行，因此使用可重入鎖
+        self._lock = threading.RLock()
+        self._running: Dict[Future, BatchStep] = {}
+        self._finished: "queue.Queue[Optional[BatchStep]]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+    def run(self) -> Iterator[BatchStep]:
+        """執行所有步驟，每個步驟結束時產生該步驟"""
+        self.started_at = time.time()
+        end = time.monotonic() + self.deadline
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-step")
+        try:
+            with self._lock:
+                self._advance()
+            while True:
+                try:
+                    step = self._finished.get(timeout=max(end - time.monotonic(), 0))
+                except queue.Empty:
+                    with self._lock:
+                        expired = self._expire()
+                    yield from expired
+                    break
+                if step is None:
+                    break
+                yield step
+        finally:
+            with self._lock:
+                self._closed = True
+            # 執行中的步驟無法中斷，僅不再等待
+            self._executor.shutdown(wait=False)
+
+    def _advance(self):
+        """標記應略過的步驟並送出可執行的步驟；全部結束時放入 None（呼叫時須持有鎖）"""
+        if self._closed:
+            return
+        for step in self._settle():
+            self._finished.put(step)
+        while len(self._running) < self.max_workers:
+            step = self._next_ready()
+            if step is None:
+                break
+            step.status = "running"
+            step.started_at = time.time()
+            future = self._executor.submit(self._run_step, step)
+            self._running[future] = step
+            future.add_done_callback(self._on_done)
+        if not self._running and not self._closed:
+            self._closed = True
+            self._finished.put(None)
+
+    def _on_done(self, future: Future):
+        """步驟結束：記錄結果並送出接下來可執行的步驟"""
+        with self._lock:
+            step = self._running.pop(future, None)
+            if step is None or step.status != "running":
+                return  # 已因逾時結束
+            result = future.result()
+            step.result = result
+            step.finished_at = time.time()
+            step.status = "completed" if result.get("success") else "failed"
+            if step.status == "failed" and self.on_error == "abort":
+                self.aborted = True
+            self._finished.put(step)
+            self._advance()
+
+    def _run_step(self, step: BatchStep) -> Dict[str, Any]:
+        try:
+            return self.execute(step)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def _next_ready(self) -> Optional[BatchStep]:
+        """依賴都已結束、可以開始的第一個步驟（呼叫時須持有鎖）"""
+        if self.aborted:
+            return None
+        for step in self.steps:
+            if step.status == "pending" and all(self.steps[i].finished for i in step.depends_on):
+                return step
+        return None
+
+    def _settle(self) -> List[BatchStep]:
+        """依失敗處理方式標記應略過的步驟"""
+        skipped = []
+        for step in self.steps:
+            if step.status != "pending":
+                continue
+            if self.aborted:
+                reason = "批次已因先前步驟失敗而中止"
+            elif self.on_error == "skip_dependents" and any(
+                    self.steps[i].status in ("failed", "skipped", "timeout") for i in step.depends_on):
+                reason = "依賴的步驟未成功"
+            else:
+                continue
+            self._finish(step, "skipped", reason)
+            skipped.append(step)
+        return skipped
+
+    def _expire(self) -> List[BatchStep]:
+        """超過期限：執行中標記 timeout，未開始標記 skipped（呼叫時須持有鎖）
+
+        先取出期限前已結束、尚未產生的步驟，之後結束的步驟由完成回呼忽略。
+        """
+        self._closed = True
+        expired = []
+        while True:
+            try:
+                step = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            if step is not None:
+                expired.append(step)
+        for step in self._running.values():
+            self._finish(step, "timeout", "批次執行逾時")
+            expired.append(step)
+        self._running.clear()
+        for step in self.steps:
+            if step.status == "pending":
+                self._finish(step, "skipped", "批次執行逾時")
+                expired.append(step)
+        return expired
+
+    @staticmethod
+    def _finish(step: BatchStep, status: str, error: str):
+        step.status = status
+        step.result = {"success": False, "error": error}
+        step.finished_at = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        """批次執行結果摘要"""
+        counts = {status: 0 for status in ("completed", "failed", "skipped", "timeout")}
+        for step in self.steps:
+            if step.status in counts:
+                counts[step.status] += 1
+        return {
+            "success": counts["completed"] == len(self.steps),
+            **counts,
+            "total": len(self.steps),
+            "elapsed": round(time.time() - self.started_at, 3) if self.started_at else 0,
+            "steps": [step.to_dict() for step in self.steps]
+        }
@@ -0,0 +1,169 @@
+"""批次生成（多個筆記本 × 多種工件類型）"""
+import inspect
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from .config_manager import config_manager
+from .generation_pipeline import generation_pipeline, GENERATORS
+from .notebooklm_service import notebooklm_service
+from .task_manager import task_manager, TaskPriority, TaskStatus
+
+# 可批次生成的類型（mindmap 為同步生成，以一般任務執行）
+BULK_TYPES = tuple(GENERATORS) + ("mindmap",)
+
+_UNFINISHED = (TaskStatus.PENDING.value, TaskStatus.RUNNING.value)
+
+
+def _allowed_options(artifact_type: str) -> set:
+    """生成方法可接受的選項名稱"""
+    method = "generate_mindmap" if artifact_type == "mindmap" else GENERATORS[artifact_type][1]
+    params = inspect.signature(getattr(notebooklm_service, method)).parameters
+    return {name for name in params if name != "notebook_id"}
+
+
+class BulkGenerator:
+    """批次生成
+
+    將筆記本 × 類型的組合全部建立為同一群組的子任務，由 TaskManager 依群組上限
+    （整體 concurrency 與每個筆記本 per_notebook）排程；全域的 max_workers /
+    max_per_notebook 仍然適用。父工作只保存子任務 ID，進度與狀態即時由子任務彙整。
+    父工作保存在 task_manager.store（kind 為 bulk），共用 store 的其他行程也能查詢與取消，
+    重新啟動後仍然存在。
+    """
+
+    def __init__(self, concurrency: int = 8, per_notebook: int = 2, max_items: int = 400,
+                 max_jobs: int = 200):
+        self.concurrency = concurrency
+        self.per_notebook = per_notebook
+        self.max_items = max_items
+        self.max_jobs = max_jobs
+
+    def submit(self, notebook_ids: List[str], artifact_types: List[str],
+               options: Optional[Dict[str, Dict[str, Any]]] = None, download: bool = False,
+               concurrency: Optional[int] = None, per_notebook: Optional[int] = None) -> Dict[str, Any]:
+        """建立批次生成工作，回傳 {"success", "data"} 或錯誤"""
+        notebook_ids = list(dict.fromkeys(n for n in notebook_ids if n))
+        artifact_types = list(dict.fromkeys(artifact_types))
+        if not notebook_ids or not artifact_types:
+            return {"success": False, "error": "請指定筆記本與工件類型"}
+        unsupported = [t for t in artifact_types if t not in BULK_TYPES]
+        if unsupported:
+            return {"success": False, "error": f"不支援的類型: {', '.join(unsupported)}"}
+        total = len(notebook_ids) * len(artifact_types)
+        if total > self.max_items:
+            return {"success": False, "error": f"批次數量 {total} 超過上限 {self.max_items}"}
+
+        options = options or {}
+        type_options = {}
+        for artifact_type in artifact_types:
+            given = options.get(artifact_type) or {}
+            allowed = _allowed_options(artifact_type)
+            type_options[artifact_type] = {k: v for k, v in given.items() if k in allowed}
+
+        job_id = str(uuid.uuid4())[:8]
+        group = f"bulk-{job_id}"
+        limit = max(1, int(concurrency or self.concurrency))
+        nb_limit = max(1, int(per_notebook or self.per_notebook))
+        task_manager.set_group_limit(group, limit, nb_limit)
+
+        children = []
+        for notebook_id in notebook_ids:
+            for artifact_type in artifact_types:
+                if artifact_type == "mindmap":
+                    task_id = task_manager.dispatch(
+                        "notebooklm.generate_mindmap",
+                        name="生成心智圖",
+                        kwargs={"notebook_id": notebook_id},
+                        priority=TaskPriority.NORMAL,
+                        notebook_id=notebook_id,
+                        group=group
+                    )
+                else:
+                    task_id = generation_pipeline.submit(artifact_type, notebook_id, type_options[artifact_type],
+                                                         download=download, group=group)
+                children.append({"task_id": task_id, "notebook_id": notebook_id, "artifact_type": artifact_type})
+
+        job = {
+            "id": job_id,
+            "group": group,
+            "notebook_ids": notebook_ids,
+            "artifact_types": artifact_types,
+            "concurrency": limit,
+            "per_notebook": nb_limit,
+            "download": download,
+            "children": children,
+            "cancelled": False,
+            "created_at": datetime.now().isoformat()
+        }
+        task_manager.store.save_job("bulk", job, keep=self.max_jobs)
+        return {"success": True, "data": self._summarize(job)}
+
+    def get(self, job_id: str, include_children: bool = True) -> Optional[Dict[str, Any]]:
+        """取得批次工作（含彙整進度）"""
+        job = task_manager.store.get_job("bulk", job_id)
+        return self._summarize(job, include_children) if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """列出批次工作（由新到舊，不含子任務明細）"""
+        return [self._summarize(job, include_children=False) for job in task_manager.store.list_jobs("bulk")]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消批次中尚未開始的子任務；已開始的子任務會執行完成"""
+        job = task_manager.store.get_job("bulk", job_id)
+        if job is None:
+            return None
+        job["cancelled"] = True
+        task_manager.store.save_job("bulk", job, keep=self.max_jobs)
+        cancelled = task_manager.cancel_group(job["group"])
+        summary = self._summarize(job)
+        summary["cancelled_tasks"] = len(cancelled)
+        return summary
+
+    def _summarize(self, job: Dict[str, Any], include_children: bool = True) -> Dict[str, Any]:
+        """由子任務彙整進度與狀態"""
+        counts: Dict[str, int] = {}
+        progress_total = 0
+        children = []
+        for child in job["children"]:
+            task = task_manager.get_task(child["task_id"]) or {}
+            status = task.get("status", "unknown")
+            counts[status] = counts.get(status, 0) + 1
+            # 已結束的子任務（不論成敗）視為 100%
+            progress_total += (task.get("progress") or 0) if status in _UNFINISHED else 100
+            if include_children:
+                children.append({**child, "status": status, "progress": task.get("progress"),
+                                 "error": task.get("error")})
+
+        total = len(job["children"])
+        if any(counts.get(s) for s in _UNFINISHED):
+            status = "running"
+        elif counts.get(TaskStatus.COMPLETED.value) == total:
+            status = "completed"
+        elif job["cancelled"]:
+            status = "cancelled"
+        elif counts.get(TaskStatus.COMPLETED.value):
+            status = "partial"
+        else:
+            status = "failed"
+
+        summary = {key: job[key] for key in ("id", "notebook_ids", "artifact_types", "concurrency",
+                                             "per_notebook", "download", "created_at")}
+        summary.update({
+            "status": status,
+            "total": total,
+            "counts": counts,
+            "progress": round(progress_total / total) if total else 100
+        })
+        if include_children:
+            summary["children"] = children
+        return summary
+
+
+# 建立單例
+bulk_generator = BulkGenerator(
+    concurrency=config_manager.get("bulk_concurrency", 8),
+    per_notebook=config_manager.get("bulk_per_notebook", 2),
+    max_items=config_manager.get("bulk_max_items", 400)
+)
+
+task_manager.register_handler("notebooklm.generate_mindmap", notebooklm_service.generate_mindmap)
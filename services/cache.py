@@ -0,0 +1,135 @@
+"""讀取快取（TTL + LRU、stale-while-revalidate、single-flight）"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """進行中的載入（同 key 的並行請求共用結果）"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ReadThroughCache:
+    """讀穿式快取
+
+    - 未過期（ttl 內）直接回傳
+    - 過期但仍在 stale_ttl 內：回傳舊值並於背景重新載入
+    - 同一 key 同時只有一個載入在進行，其他請求等待共用結果
+    - should_cache 決定結果是否寫入快取（例如只快取成功的回應）
+    """
+
+    def __init__(self, ttl: float = 30, stale_ttl: float = 300, max_entries: int = 256,
+                 should_cache: Optional[Callable[[Any], bool]] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.should_cache = should_cache or (lambda value: True)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                       "loads": 0, "refreshes": 0, "invalidations": 0, "evictions": 0}
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """取得快取值，必要時呼叫 loader 載入"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._flights:
+                        flight = self._start_flight(key)
+                        self._stats["refreshes"] += 1
+                        threading.Thread(target=self._load, args=(key, loader, flight),
+                                         daemon=True).start()
+                    return value
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = self._start_flight(key)
+                self._stats["misses"] += 1
+                leader = True
+
+        if leader:
+            self._load(key, loader, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _start_flight(self, key: Hashable) -> _Flight:
+        """登記新的載入（呼叫時須持有鎖）"""
+        flight = _Flight()
+        self._flights[key] = flight
+        return flight
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], flight: _Flight):
+        """執行載入並寫入快取"""
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+        with self._lock:
+            self._stats["loads"] += 1
+            # 載入期間已失效（被分離）的結果不寫回，避免覆蓋失效後的資料
+            current = self._flights.get(key) is flight
+            if current:
+                del self._flights[key]
+            if current and flight.error is None and self.should_cache(flight.value):
+                self._entries[key] = (flight.value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        flight.done.set()
+
+    def invalidate(self, key: Hashable):
+        """讓指定 key 失效"""
+        with self._lock:
+            self._invalidate(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """讓所有符合條件的 key 失效"""
+        with self._lock:
+            for key in set(self._entries) | set(self._flights):
+                if predicate(key):
+                    self._invalidate(key)
+
+    def _invalidate(self, key: Hashable):
+        """移除快取值並分離進行中的載入（呼叫時須持有鎖）
+
+        分離後的載入結果不寫入快取，之後的讀取開始新的載入，不會共用失效前的結果。
+        """
+        self._flights.pop(key, None)
+        if self._entries.pop(key, None) is not None:
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        """清除所有快取"""
+        self.invalidate_where(lambda key: True)
+
+    def stats(self) -> Dict[str, Any]:
+        """取得命中統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["in_flight"] = len(self._flights)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
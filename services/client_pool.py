@@ -0,0 +1,251 @@
+"""notebooklm-py 常駐客戶端池"""
+import asyncio
+import concurrent.futures
+import dataclasses
+import threading
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class ClientPoolUnavailable(RuntimeError):
+    """notebooklm-py 無法在行程內使用（未安裝或無法載入）"""
+
+
+def to_jsonable(obj: Any) -> Any:
+    """將 notebooklm-py 回傳的物件轉換為可 JSON 序列化的結構"""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [to_jsonable(v) for v in obj]
+    if dataclasses.is_dataclass(obj):
+        return {f.name: to_jsonable(getattr(obj, f.name)) for f in dataclasses.fields(obj)}
+    if hasattr(obj, "__dict__"):
+        return {k: to_jsonable(v) for k, v in vars(obj).items() if not k.startswith("_")}
+    return str(obj)
+
+
+class NotebookLMClientPool:
+    """在背景事件迴圈中維護多個已認證的 NotebookLMClient
+
+    客戶端建立後保持開啟以重用 HTTP 連線；storage_state.json 變更時
+    （例如重新登入）會自動汰換舊的客戶端。已建立的客戶端數達 size 時等待 _available，
+    歸還或捨棄客戶端（含建立失敗）時都會喚醒等待者。
+    """
+
+    def __init__(self, storage_path: Path, size: int = 4):
+        self.storage_path = storage_path
+        self.size = max(1, size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._idle: deque = deque()
+        self._available: Optional[asyncio.Condition] = None
+        self._created = 0
+        self._generation = 0
+        self._storage_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._client_cls = None
+
+    # ===== 生命週期 =====
+
+    def _load_client_cls(self):
+        """載入 notebooklm-py 的客戶端類別"""
+        if self._client_cls is None:
+            try:
+                from notebooklm import NotebookLMClient
+            except ImportError as e:
+                raise ClientPoolUnavailable(f"notebooklm-py 無法載入: {e}")
+            self._client_cls = NotebookLMClient
+        return self._client_cls
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """啟動背景事件迴圈執行緒"""
+        with self._lock:
+            if self._loop is None:
+                self._load_client_cls()
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _runner():
+                    asyncio.set_event_loop(loop)
+                    self._available = asyncio.Condition()
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_runner, name="notebooklm-client-pool", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def is_available(self) -> bool:
+        """notebooklm-py 是否可在行程內使用"""
+        try:
+            self._load_client_cls()
+            return True
+        except ClientPoolUnavailable:
+            return False
+
+    def close(self):
+        """關閉所有客戶端並停止事件迴圈"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._drain(), loop)
+        try:
+            future.result(timeout=10)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    # ===== 客戶端借還 =====
+
+    def _check_storage(self):
+        """storage_state.json 變更時讓現有客戶端失效"""
+        try:
+            mtime = self.storage_path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._storage_mtime:
+            if self._storage_mtime is not None:
+                self._generation += 1
+            self._storage_mtime = mtime
+
+    async def _open_client(self):
+        """建立並開啟一個新的客戶端"""
+        client_cls = self._load_client_cls()
+        client = await client_cls.from_storage(str(self.storage_path))
+        await client.__aenter__()
+        return client
+
+    async def _close_client(self, client):
+        """關閉客戶端（忽略錯誤）"""
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+    async def _acquire(self):
+        """取得一個可用的客戶端（已達上限時等待歸還或釋出名額）"""
+        self._check_storage()
+        stale = []
+        try:
+            async with self._available:
+                while True:
+                    while self._idle:
+                        generation, client = self._idle.popleft()
+                        if generation == self._generation:
+                            return generation, client
+                        self._discard(client, stale)
+                    if self._created < self.size:
+                        self._created += 1
+                        break
+                    await self._available.wait()
+        finally:
+            for client in stale:
+                await self._close_client(client)
+
+        generation = self._generation
+        try:
+            return generation, await self._open_client()
+        except BaseException:
+            async with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def _discard(self, client, closing: list):
+        """釋出客戶端的名額並喚醒一個等待者，客戶端稍後關閉（呼叫時須持有 _available）"""
+        self._created -= 1
+        self._available.notify()
+        closing.append(client)
+
+    async def _release(self, generation: int, client, broken: bool = False):
+        """歸還客戶端；已損壞或過期者直接關閉"""
+        closing = []
+        async with self._available:
+            if broken or generation != self._generation:
+                self._discard(client, closing)
+            else:
+                self._idle.append((generation, client))
+                self._available.notify()
+        for client in closing:
+            await self._close_client(client)
+
+    async def _drain(self):
+        """關閉所有閒置客戶端"""
+        if self._available is None:
+            return
+        closing = []
+        async with self._available:
+            while self._idle:
+                _, client = self._idle.popleft()
+                self._discard(client, closing)
+        for client in closing:
+            await self._close_client(client)
+
+    async def _call(self, op: Callable[[Any], Awaitable[Any]]) -> Any:
+        """借出客戶端執行 op 後歸還"""
+        generation, client = await self._acquire()
+        broken = False
+        try:
+            return await op(client)
+        except (OSError, asyncio.TimeoutError, asyncio.CancelledError):
+            # 連線層錯誤或中途取消：捨棄此客戶端，下次重新建立
+            broken = True
+            raise
+        finally:
+            await self._release(generation, client, broken)
+
+    def run(self, op: Callable[[Any], Awaitable[Any]], timeout: float = 120) -> Any:
+        """在池中的客戶端上執行 op，阻塞直到完成或逾時"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._call(op), loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """取得客戶端池狀態"""
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": len(self._idle),
+            "generation": self._generation,
+            "running": self._loop is not None
+        }
+
+
+def enum_value(enum_name: str, value: Optional[str]) -> Any:
+    """將 CLI 風格的選項（如 deep-dive）轉為 notebooklm-py 的列舉值"""
+    if value is None:
+        return None
+    try:
+        import notebooklm
+        enum_cls = getattr(notebooklm, enum_name)
+        return enum_cls[value.upper().replace("-", "_")]
+    except (ImportError, AttributeError, KeyError):
+        return value
+
+
+def wrap_list(key: str) -> Callable[[Any], Dict[str, Any]]:
+    """將清單結果包裝為與 CLI --json 相同的 {key: [...], "count": n} 結構"""
+    def _wrap(items: Any) -> Dict[str, Any]:
+        items = to_jsonable(items) or []
+        if isinstance(items, dict) and key in items:
+            return items
+        items_list: List[Any] = items if isinstance(items, list) else [items]
+        return {key: items_list, "count": len(items_list)}
+    return _wrap
@@ -1,5 +1,7 @@
 """使用者設定管理"""
 import json
+import os
+import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 
@@ -13,7 +15,58 @@ class ConfigManager:
         "openai_api_key": "",
         "openai_model": "gpt-4o",
         "theme": "modern",
-        "language": "zh_Hant"
+        "language": "zh_Hant",
+        "notebooklm_backend": "library",
+        "client_pool_size": 4,
+        "task_store": "memory",
+        "task_store_path": "",
+        "task_broker": "local",
+        "task_broker_path": "",
+        "list_cache_ttl": 30,
+        "list_cache_stale_ttl": 300,
+        "answer_cache_dir": "",
+        "answer_cache_max_mb": 100,
+        "ask_concurrency": 3,
+        "parse_cache_dir": "",
+        "parse_cache_max_entries": 1024,
+        "nlp_fast_path_confidence": 0.9,
+        "batch_concurrency": 4,
+        "batch_deadline": 600,
+        "batch_max_commands": 100,
+        "ingest_concurrency": 4,
+        "ingest_rate_per_minute": 30,
+        "ingest_max_retries": 3,
+        "content_index_path": "",
+        "upload_dir": "",
+        "artifact_cache_dir": "",
+        "artifact_cache_max_mb": 2048,
+        "generation_timeout": 1800,
+        "artifact_poll_min_interval": 2,
+        "artifact_poll_max_interval": 30,
+        "bulk_concurrency": 8,
+        "bulk_per_notebook": 2,
+        "bulk_max_items": 400,
+        "research_fast_concurrency": 3,
+        "research_deep_concurrency": 1,
+        "research_timeout": 1800,
+        "research_poll_interval": 10,
+        "research_max_queries": 20,
+        "upstream_rate_read": 120,
+        "upstream_rate_ask": 30,
+        "upstream_rate_generate": 10,
+        "upstream_rate_upload": 30,
+        "upstream_burst": 5,
+        "upstream_max_retries": 2,
+        "upstream_backoff": 1.0,
+        "circuit_failure_threshold": 5,
+        "circuit_reset_timeout": 30,
+        "auth_check_ttl": 300,
+        "auth_poll_interval": 5,
+        "sse_max_streams": 8,
+        "sse_max_lifetime": 300,
+        "tracing_exporter": "none",
+        "tracing_path": "",
+        "tracing_otlp_endpoint": ""
     }
 
     # 可用的選項
@@ -21,19 +74,40 @@ class ConfigManager:
     THEMES = ["modern", "rich", "dark", "light"]
     GEMINI_MODELS = ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-3.0-flash", "gemini-3.0-pro"]
     OPENAI_MODELS = ["gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-5.1"]
+    NOTEBOOKLM_BACKENDS = ["library", "cli"]
+    TASK_STORES = ["memory", "sqlite"]
+    TASK_BROKERS = ["local", "sqlite"]
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, reload_interval: float = 1.0):
         if config_path:
             self.config_path = Path(config_path)
         else:
             self.config_path = Path(__file__).parent.parent / "config.json"
         self._config = None
+        # 多個行程共用 config.json：最多每 reload_interval 秒檢查一次修改時間，有變更時重新載入
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return self.config_path.stat().st_mtime
+        except OSError:
+            return None
 
     def load(self) -> Dict[str, Any]:
-        """載入設定"""
+        """載入設定（其他行程修改 config.json 後自動重新載入）"""
         if self._config is not None:
-            return self._config
+            now = time.monotonic()
+            if now - self._checked_at < self.reload_interval:
+                return self._config
+            self._checked_at = now
+            if self._file_mtime() == self._mtime:
+                return self._config
+            self._config = None
 
+        self._mtime = self._file_mtime()
+        self._checked_at = time.monotonic()
         if self.config_path.exists():
             try:
                 with open(self.config_path, 'r', encoding='utf-8') as f:
@@ -53,8 +127,12 @@ class ConfigManager:
     def save(self) -> bool:
         """儲存設定"""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
+            # 先寫入暫存檔再取代，其他行程不會讀到寫到一半的檔案
+            tmp_path = self.config_path.with_name(f"{self.config_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(self._config or self.DEFAULT_CONFIG, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.config_path)
+            self._mtime = self._file_mtime()
             return True
         except IOError:
             return False
@@ -88,7 +166,10 @@ class ConfigManager:
             "nlp_modes": self.NLP_MODES,
             "themes": self.THEMES,
             "gemini_models": self.GEMINI_MODELS,
-            "openai_models": self.OPENAI_MODELS
+            "openai_models": self.OPENAI_MODELS,
+            "notebooklm_backends": self.NOTEBOOKLM_BACKENDS,
+            "task_stores": self.TASK_STORES,
+            "task_brokers": self.TASK_BROKERS
         }
 
 
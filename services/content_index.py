@@ -0,0 +1,109 @@
+"""本機檔案內容索引（SHA-256 → 來源 ID，依筆記本區分）"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """以 mmap 分段計算檔案的 SHA-256，不會將整個檔案讀入記憶體"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, chunk_size):
+                    digest.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def extract_source_id(data: Any) -> Optional[str]:
+    """從新增來源的回應中取出來源 ID"""
+    if not isinstance(data, dict):
+        return None
+    for key in ("source_id", "id"):
+        if isinstance(data.get(key), str):
+            return data[key]
+    source = data.get("source")
+    if isinstance(source, dict) and isinstance(source.get("id"), str):
+        return source["id"]
+    return None
+
+
+class ContentIndex:
+    """內容定址的上傳紀錄
+
+    以 JSON 檔保存 {notebook_id: {sha256: {"source_id", "name", "size", "added_at"}}}，
+    相同內容再次上傳到同一筆記本時可直接略過，不需查詢上游。
+    刪除來源或筆記本時需呼叫 forget_source / forget_notebook 保持一致。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """載入索引（呼叫時須持有鎖）"""
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self._data = {}
+        return self._data
+
+    def _save(self):
+        """原子寫入索引（呼叫時須持有鎖）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def lookup(self, notebook_id: str, sha256: str) -> Optional[Dict[str, Any]]:
+        """查詢筆記本中是否已有相同內容的來源"""
+        with self._lock:
+            entry = self._load().get(notebook_id, {}).get(sha256)
+            return dict(entry) if entry else None
+
+    def record(self, notebook_id: str, sha256: str, source_id: Optional[str], name: str, size: int):
+        """記錄已上傳的內容"""
+        with self._lock:
+            self._load().setdefault(notebook_id, {})[sha256] = {
+                "source_id": source_id,
+                "name": name,
+                "size": size,
+                "added_at": time.time()
+            }
+            self._save()
+
+    def forget_source(self, notebook_id: str, source_id: str):
+        """移除指向已刪除來源的紀錄"""
+        with self._lock:
+            entries = self._load().get(notebook_id, {})
+            stale = [sha for sha, entry in entries.items() if entry.get("source_id") == source_id]
+            for sha in stale:
+                del entries[sha]
+            if stale:
+                self._save()
+
+    def forget_notebook(self, notebook_id: str):
+        """移除整個筆記本的紀錄"""
+        with self._lock:
+            if self._load().pop(notebook_id, None) is not None:
+                self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = self._load()
+            return {"notebooks": len(data), "entries": sum(len(v) for v in data.values())}
@@ -0,0 +1,172 @@
+"""生成管線（送出生成 → 等待工件完成 → 可選下載，作為單一任務追蹤）"""
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+from .artifact_poller import artifact_poller
+from .config_manager import config_manager
+from .notebooklm_service import notebooklm_service, extract_artifact_id
+from .task_manager import task_manager, TaskPriority
+from .tracing import tracer
+
+# 類型 -> (任務名稱, 生成方法名稱, 預估完成秒數)
+GENERATORS = {
+    "audio": ("生成 Podcast", "generate_audio", 300),
+    "video": ("生成影片", "generate_video", 600),
+    "quiz": ("生成測驗", "generate_quiz", 60),
+    "flashcards": ("生成閃卡", "generate_flashcards", 60),
+    "report": ("生成報告", "generate_report", 60),
+    "infographic": ("生成資訊圖", "generate_infographic", 120),
+    "slide-deck": ("生成簡報", "generate_slide_deck", 180),
+    "data-table": ("生成數據表", "generate_data_table", 60),
+}
+
+LONG_TYPES = {"audio", "video"}
+
+
+class GenerationPipeline:
+    """生成管線
+
+    任務進度分為三段：送出生成（0–10）、等待工件完成（10–90）、下載（90–100）。
+    等待期間上游不提供百分比，進度依已等待時間相對於該類型預估完成時間估算。
+    送出生成後任務函式回傳 Future：工件狀態交由共用的 artifact_poller 追蹤，
+    等待期間不佔用任務工作執行緒；完成後的下載在小型執行緒池中進行。
+    工件 ID 取得後立即以 set_resume 記錄，服務重新啟動時可接續等待。
+    """
+
+    def __init__(self, timeout: float = 1800, finish_workers: int = 2):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=finish_workers, thread_name_prefix="generation-finish")
+
+    def submit(self, artifact_type: str, notebook_id: Optional[str] = None,
+               options: Optional[Dict[str, Any]] = None, download: bool = False,
+               group: Optional[str] = None) -> str:
+        """建立生成任務，回傳任務 ID"""
+        name = GENERATORS[artifact_type][0]
+        return task_manager.dispatch(
+            "generation.run",
+            name=name,
+            args=(artifact_type, notebook_id, options or {}, download),
+            priority=TaskPriority.LONG if artifact_type in LONG_TYPES else TaskPriority.NORMAL,
+            notebook_id=notebook_id,
+            group=group
+        )
+
+    def run(self, artifact_type: str, notebook_id: Optional[str],
+            options: Dict[str, Any], download: bool = False):
+        """送出生成（於任務中執行），回傳等待完成的 Future"""
+        task_id = task_manager.current_task_id()
+        report = self._reporter(task_id)
+        report(0)
+
+        generate = getattr(notebooklm_service, GENERATORS[artifact_type][1])
+        result = generate(notebook_id=notebook_id, **options)
+        if not result.get("success"):
+            return result
+        artifact_id = extract_artifact_id(result.get("data"))
+        if not artifact_id:
+            # 無法追蹤的回應：維持原本「已送出」的行為
+            return result
+
+        if task_id:
+            task_manager.set_resume(task_id, {
+                "artifact_id": artifact_id,
+                "notebook_id": notebook_id,
+                "artifact_type": artifact_type,
+                "download": download
+            })
+        report(10)
+        return self.wait(artifact_id, notebook_id, artifact_type, download, report)
+
+    def resume(self, artifact_id: str, notebook_id: Optional[str] = None,
+               artifact_type: Optional[str] = None, download: bool = False) -> Future:
+        """重新啟動後接續等待（TaskManager 接續中斷任務時以 generation.resume 送出）"""
+        report = self._reporter(task_manager.current_task_id())
+        return self.wait(artifact_id, notebook_id, artifact_type, download, report)
+
+    def wait(self, artifact_id: str, notebook_id: Optional[str], artifact_type: Optional[str],
+             download: bool, report: Callable[[int], None]) -> Future:
+        """等待工件完成（可選下載），回傳結果為 {"success", "data"} 的 Future"""
+        expected = GENERATORS.get(artifact_type, (None, None, 120))[2]
+        started = time.time()
+        outcome: Future = Future()
+        # 等待完成後在其他執行緒繼續，沿用目前（task.run）的追蹤
+        parent = tracer.current_context()
+
+        def on_check(elapsed: float):
+            # 10 → 90 依預估時間漸進，超過預估後趨緩但不到 90
+            report(10 + int(80 * (1 - math.exp(-elapsed / expected))))
+
+        def on_done(watched: Future):
+            self._executor.submit(self._complete, watched, outcome, artifact_id, notebook_id,
+                                  artifact_type, download, report, started, parent)
+
+        artifact_poller.watch(artifact_id, notebook_id, artifact_type, expected,
+                              timeout=self.timeout, on_check=on_check).add_done_callback(on_done)
+        return outcome
+
+    def _complete(self, watched: Future, outcome: Future, artifact_id: str, notebook_id: Optional[str],
+                  artifact_type: Optional[str], download: bool, report: Callable[[int], None],
+                  started: float, parent=None):
+        """工件結束後整理結果並下載"""
+        if parent is None:
+            self._finish(watched, outcome, artifact_id, notebook_id, artifact_type, download, report, started)
+            return
+        state = "timeout" if watched.cancelled() else watched.result()
+        tracer.record("artifact.wait", started, time.time(), parent=parent,
+                      artifact_id=artifact_id, status=state)
+        with tracer.span("generation.finish", parent=parent, artifact_id=artifact_id, download=download):
+            self._finish(watched, outcome, artifact_id, notebook_id, artifact_type, download, report, started)
+
+    def _finish(self, watched: Future, outcome: Future, artifact_id: str, notebook_id: Optional[str],
+                artifact_type: Optional[str], download: bool, report: Callable[[int], None],
+                started: float):
+        try:
+            state = "timeout" if watched.cancelled() else watched.result()
+            data = {
+                "artifact_id": artifact_id,
+                "artifact_type": artifact_type,
+                "notebook_id": notebook_id,
+                "status": state,
+                "waited": round(time.time() - started, 1)
+            }
+            if state != "completed":
+                error = "工件生成失敗" if state == "failed" else "等待工件完成逾時"
+                outcome.set_result({"success": False, "error": error, "data": data})
+                return
+
+            report(90)
+            if download and artifact_type:
+                fetched = notebooklm_service.fetch_artifact(artifact_type, artifact_id, notebook_id)
+                if not fetched.get("success"):
+                    outcome.set_result({"success": False, "error": fetched.get("error") or "下載失敗",
+                                        "data": data})
+                    return
+                data["path"] = fetched["path"]
+            if notebook_id and artifact_type:
+                data["download_url"] = (f"/api/notebooks/{notebook_id}/artifacts/{artifact_id}/download"
+                                        f"?type={artifact_type}")
+            outcome.set_result({"success": True, "data": data})
+        except Exception as e:
+            outcome.set_exception(e)
+
+    @staticmethod
+    def _reporter(task_id: Optional[str]) -> Callable[[int], None]:
+        """回傳只在進度增加時才更新的回報函式"""
+        last = [-1]
+
+        def report(progress: int):
+            if task_id and progress > last[0]:
+                last[0] = progress
+                task_manager.update_progress(task_id, progress)
+        return report
+
+
+# 建立單例
+generation_pipeline = GenerationPipeline(
+    timeout=config_manager.get("generation_timeout", 1800)
+)
+
+# dispatch 使用的處理函式（執行任務的行程匯入本模組時註冊）
+task_manager.register_handler("generation.run", generation_pipeline.run)
+task_manager.register_handler("generation.resume", generation_pipeline.resume)
@@ -0,0 +1,116 @@
+"""預先編譯的意圖關鍵字比對（Aho–Corasick）"""
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """比對前的正規化：轉小寫並移除空白（「生成 Podcast」可比對「生成Podcast」）"""
+    return "".join(text.lower().split())
+
+
+class AhoCorasick:
+    """Aho–Corasick 多字串比對自動機，比對時間與輸入長度成線性"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        for pattern, payload in patterns:
+            if pattern:
+                self._add(pattern, payload)
+        self._build()
+
+    def _add(self, pattern: str, payload: Any):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), payload))
+
+    def _build(self):
+        """以 BFS 建立失敗轉移並合併輸出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """逐一產生 (start, end, payload)"""
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i + 1 - length, i + 1, payload
+
+
+class IntentMatcher:
+    """意圖比對器
+
+    精確比對：在所有命中的意圖片語中，優先採用長度 ≥ 2 的片語，
+    其中取最左邊出現者，同位置取最長者（leftmost-longest），
+    與字典順序無關。單字片語（如「問」）只在沒有其他命中時使用。
+
+    模糊比對：同一個自動機也收錄模糊關鍵字，依規則順序檢查
+    「每一組至少命中一個關鍵字」是否成立。
+
+    精確命中的信心分數依片語佔整句的比例計算：整句幾乎就是片語時接近 0.95，
+    片語只是長句中的一小段（其餘多為參數或其他內容）時接近 0.7；同時命中其他
+    意圖的片語時再扣 0.1。單字片語一律為 0.5。
+    """
+
+    def __init__(self, intent_patterns: Dict[str, Sequence[str]],
+                 fuzzy_rules: Sequence[Tuple[str, Sequence[Sequence[str]]]]):
+        entries = []
+        for intent, phrases in intent_patterns.items():
+            for phrase in phrases:
+                entries.append((normalize_text(phrase), ("intent", intent)))
+        keywords = {normalize_text(k) for _, groups in fuzzy_rules for group in groups for k in group}
+        for keyword in keywords:
+            entries.append((keyword, ("keyword", keyword)))
+        self._automaton = AhoCorasick(entries)
+        self._fuzzy_rules = [(intent, [{normalize_text(k) for k in group} for group in groups])
+                             for intent, groups in fuzzy_rules]
+
+    def match(self, text: str) -> Tuple[Optional[str], float]:
+        """回傳 (意圖, 信心分數)；精確命中 0.5–0.95、模糊命中 0.6、未命中 (None, 0.0)"""
+        normalized = normalize_text(text)
+        best = None  # ((是否單字, 起點, -長度), 意圖)
+        keywords = set()
+        intents = set()  # 命中長度 ≥ 2 片語的意圖
+        for start, end, (kind, value) in self._automaton.iter_matches(normalized):
+            if kind == "keyword":
+                keywords.add(value)
+                continue
+            if end - start >= 2:
+                intents.add(value)
+            rank = (end - start < 2, start, start - end)
+            if best is None or rank < best[0]:
+                best = (rank, value)
+
+        if best is not None:
+            (single, _, negative_length), intent = best
+            if single:
+                return intent, 0.5
+            coverage = -negative_length / len(normalized)
+            confidence = 0.7 + 0.25 * coverage - (0.1 if len(intents) > 1 else 0.0)
+            return intent, round(confidence, 2)
+
+        for intent, groups in self._fuzzy_rules:
+            if all(group & keywords for group in groups):
+                return intent, 0.6
+        return None, 0.0
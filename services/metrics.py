@@ -0,0 +1,160 @@
+"""輕量的 Prometheus 格式指標（計數器、直方圖、抓取時計算的量測值）"""
+import bisect
+import threading
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+# 預設的延遲分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不減的計數器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: float = 1):
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """固定分桶的直方圖（每次觀測只做一次二分搜尋）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # key -> [各分桶計數..., 總和, 次數]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any):
+        key = tuple(str(v) for v in label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class GaugeCallback:
+    """抓取時才由 callback 計算的量測值
+
+    callback 回傳 {(標籤值, ...): 數值}；沒有標籤時 key 為空 tuple。
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str],
+                 callback: Callable[[], Dict[Tuple, float]]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labels, tuple(key))} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """指標登錄處
+
+    指標依名稱登錄，重複登錄同名指標時回傳既有的指標（量測值 callback 則以新的取代），
+    模組重新載入或多次建立應用程式時不會重複。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, GaugeCallback):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, labels: Iterable[str],
+                       callback: Callable[[], Dict[Tuple, float]]) -> GaugeCallback:
+        return self._register(GaugeCallback(name, help_text, labels, callback))
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """輸出 Prometheus 文字格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 建立單例
+metrics = MetricsRegistry()
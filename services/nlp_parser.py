@@ -1,7 +1,32 @@
 """自然語言解析器"""
 import re
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from .config_manager import config_manager
+from .intent_matcher import IntentMatcher
+from .parse_cache import ParseCache, LLMClientCache, parse_key
+from .metrics import metrics
+from .tracing import tracer
+
+_parse_seconds = metrics.histogram(
+    "nlp_parse_seconds", "指令解析耗時（path：keyword、fast_path、cache、llm、fallback）", ("mode", "path"))
+_llm_seconds = metrics.histogram("nlp_llm_seconds", "LLM 解析呼叫耗時", ("mode",))
+
+
+def _parse_path(parse_mode: str) -> str:
+    """由 parse_mode 取得解析路徑（指標標籤不含錯誤訊息）"""
+    if parse_mode == "keyword":
+        return "keyword"
+    if parse_mode.endswith("(cached)"):
+        return "cache"
+    if parse_mode.endswith("fast path)"):
+        return "fast_path"
+    if parse_mode.startswith("keyword"):
+        return "fallback"
+    return "llm"
+
 
 class NLPParser:
     """自然語言解析器類別"""
@@ -90,6 +115,25 @@ class NLPParser:
         ]
     }
 
+    # 模糊匹配規則（依序檢查，每一組至少命中一個關鍵字）
+    FUZZY_RULES = [
+        ("create_notebook", [["筆記本"], ["建", "新", "創"]]),
+        ("list_notebooks", [["筆記本"], ["列", "顯", "看"]]),
+        ("generate_audio", [["podcast", "播客", "音訊"]]),
+        ("generate_video", [["影片", "視頻", "video"]]),
+        ("generate_quiz", [["測驗", "題目", "quiz"]]),
+        ("generate_flashcards", [["閃卡", "字卡", "flashcard"]]),
+        ("generate_report", [["報告", "摘要", "report"]]),
+        ("generate_mindmap", [["心智圖", "mindmap"]]),
+        ("generate_infographic", [["資訊圖", "圖表", "infographic"]]),
+        ("generate_slides", [["簡報", "投影片", "slides"]]),
+        ("generate_datatable", [["數據表", "資料表", "表格", "datatable"]]),
+        ("download", [["下載", "匯出", "download"]]),
+        ("ask_question", [["問", "查詢", "?", "？"]]),
+        ("add_source_url", [["來源"], ["加", "新"]]),
+        ("add_source_youtube", [["youtube", "yt"]]),
+    ]
+
     # 參數提取模式
     PARAM_PATTERNS = {
         "notebook_name": r"[「『\"]([^」』\"]+)[」』\"]|叫做\s*(\S+)|名為\s*(\S+)|名稱\s*(\S+)",
@@ -101,11 +145,27 @@ class NLPParser:
 
     def __init__(self):
         self.config = config_manager
+        self.clients = LLMClientCache()
+        self.parse_cache = ParseCache(
+            self.config.get("parse_cache_dir") or str(Path(__file__).parent.parent / "data" / "parse_cache"),
+            max_entries=self.config.get("parse_cache_max_entries", 1024)
+        )
+        self._llm_stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
 
     def parse(self, text: str) -> Dict[str, Any]:
         """解析自然語言輸入"""
         nlp_mode = self.config.get("nlp_mode", "keyword")
+        with tracer.child_span("nlp.parse", mode=nlp_mode) as span:
+            start = time.perf_counter()
+            result = self._parse(text, nlp_mode)
+            path = _parse_path(result.get("parse_mode", ""))
+            _parse_seconds.observe(time.perf_counter() - start, nlp_mode, path)
+            if span:
+                span.set(path=path, intent=result.get("intent") or "")
+        return result
 
+    def _parse(self, text: str, nlp_mode: str) -> Dict[str, Any]:
         if nlp_mode == "keyword":
             return self._parse_keyword(text)
         elif nlp_mode == "gemini":
@@ -115,27 +175,17 @@ class NLPParser:
         else:
             return self._parse_keyword(text)
 
-    def _parse_keyword(self, text: str) -> Dict[str, Any]:
-        """使用關鍵字匹配解析"""
-        text_lower = text.lower()
-
-        # 找出意圖
-        intent = None
-        confidence = 0.0
-
-        for intent_name, patterns in self.INTENT_PATTERNS.items():
-            for pattern in patterns:
-                if pattern.lower() in text_lower:
-                    intent = intent_name
-                    confidence = 0.9
-                    break
-            if intent:
-                break
+    def parse_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """批次解析多個指令（LLM 模式下只呼叫一次 LLM）"""
+        nlp_mode = self.config.get("nlp_mode", "keyword")
+        settings = self._llm_settings(nlp_mode) if nlp_mode in ("gemini", "openai") else None
+        if settings is None:
+            return [self.parse(text) for text in texts]
+        return self._parse_many_with_llm(texts, nlp_mode, *settings)
 
-        if not intent:
-            # 嘗試模糊匹配
-            intent = self._fuzzy_match(text_lower)
-            confidence = 0.6 if intent else 0.0
+    def _parse_keyword(self, text: str) -> Dict[str, Any]:
+        """使用關鍵字匹配解析（預先編譯的 Aho–Corasick 自動機，單次掃描）"""
+        intent, confidence = _INTENT_MATCHER.match(text)
 
         # 提取參數
         params = self._extract_params(text)
@@ -148,76 +198,42 @@ class NLPParser:
             "parse_mode": "keyword"
         }
 
-    def _fuzzy_match(self, text: str) -> Optional[str]:
-        """模糊匹配意圖"""
-        # 簡單的關鍵字檢測
-        if "筆記本" in text and ("建" in text or "新" in text or "創" in text):
-            return "create_notebook"
-        if "筆記本" in text and ("列" in text or "顯" in text or "看" in text):
-            return "list_notebooks"
-        if "podcast" in text.lower() or "播客" in text or "音訊" in text:
-            return "generate_audio"
-        if "影片" in text or "視頻" in text or "video" in text.lower():
-            return "generate_video"
-        if "測驗" in text or "題目" in text or "quiz" in text.lower():
-            return "generate_quiz"
-        if "閃卡" in text or "字卡" in text or "flashcard" in text.lower():
-            return "generate_flashcards"
-        if "報告" in text or "摘要" in text or "report" in text.lower():
-            return "generate_report"
-        if "心智圖" in text or "mindmap" in text.lower():
-            return "generate_mindmap"
-        if "資訊圖" in text or "圖表" in text or "infographic" in text.lower():
-            return "generate_infographic"
-        if "簡報" in text or "投影片" in text or "slides" in text.lower():
-            return "generate_slides"
-        if "數據表" in text or "資料表" in text or "表格" in text or "datatable" in text.lower():
-            return "generate_datatable"
-        if "下載" in text or "匯出" in text or "download" in text.lower():
-            return "download"
-        if "問" in text or "查詢" in text or "?" in text or "？" in text:
-            return "ask_question"
-        if "來源" in text and ("加" in text or "新" in text):
-            return "add_source_url"
-        if "youtube" in text.lower() or "yt" in text.lower():
-            return "add_source_youtube"
-
-        return None
-
     def _extract_params(self, text: str) -> Dict[str, Any]:
         """提取參數"""
         params = {}
 
         # 提取筆記本名稱
-        for pattern in [r"[「『\"]([^」』\"]+)[」』\"]", r"叫做\s*[「『\"]?(\S+)[」』\"]?", r"名為\s*(\S+)"]:
-            match = re.search(pattern, text)
+        for pattern in _NAME_PATTERNS:
+            match = pattern.search(text)
             if match:
                 params["name"] = match.group(1)
                 break
 
         # 提取 URL
-        url_match = re.search(r"(https?://[^\s]+)", text)
+        url_match = _URL_PATTERN.search(text)
         if url_match:
             params["url"] = url_match.group(1)
 
         # 提取 YouTube URL
-        yt_match = re.search(r"((?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+)", text)
+        yt_match = _YOUTUBE_PATTERN.search(text)
         if yt_match:
             params["youtube_url"] = yt_match.group(1)
 
         # 提取數量
-        qty_match = re.search(r"(\d+)\s*(?:題|個|張)", text)
+        qty_match = _QUANTITY_PATTERN.search(text)
         if qty_match:
             params["quantity"] = int(qty_match.group(1))
 
+        # 提取工件類型（對於 download 意圖）
+        lowered = text.lower()
+        for keywords, artifact_type in _ARTIFACT_TYPE_KEYWORDS:
+            if any(k in lowered for k in keywords):
+                params["artifact_type"] = artifact_type
+                break
+
         # 提取問題內容（對於 ask_question 意圖）
-        question_patterns = [
-            r"問[一]?下?\s*[「『\"]?(.+?)[」』\"]?\s*$",
-            r"查詢\s*[「『\"]?(.+?)[」』\"]?\s*$",
-            r"請問\s*(.+)",
-        ]
-        for pattern in question_patterns:
-            match = re.search(pattern, text)
+        for pattern in _QUESTION_PATTERNS:
+            match = pattern.search(text)
             if match:
                 params["question"] = match.group(1).strip()
                 break
@@ -226,58 +242,176 @@ class NLPParser:
 
     def _parse_with_gemini(self, text: str) -> Dict[str, Any]:
         """使用 Gemini API 解析"""
-        api_key = self.config.get("gemini_api_key")
-        model = self.config.get("gemini_model", "gemini-2.5-flash")
-
-        if not api_key:
+        settings = self._llm_settings("gemini")
+        if settings is None:
             # 沒有 API Key，回退到關鍵字匹配
             result = self._parse_keyword(text)
             result["parse_mode"] = "keyword (gemini fallback - no api key)"
             return result
-
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-
-            prompt = self._build_llm_prompt(text)
-            model_instance = genai.GenerativeModel(model)
-            response = model_instance.generate_content(prompt)
-
-            return self._parse_llm_response(response.text, text, "gemini")
-        except Exception as e:
-            # 錯誤時回退到關鍵字匹配
-            result = self._parse_keyword(text)
-            result["parse_mode"] = f"keyword (gemini error: {str(e)})"
-            return result
+        return self._parse_with_llm(text, "gemini", *settings)
 
     def _parse_with_openai(self, text: str) -> Dict[str, Any]:
         """使用 OpenAI API 解析"""
-        api_key = self.config.get("openai_api_key")
-        model = self.config.get("openai_model", "gpt-4o")
-
-        if not api_key:
+        settings = self._llm_settings("openai")
+        if settings is None:
             # 沒有 API Key，回退到關鍵字匹配
             result = self._parse_keyword(text)
             result["parse_mode"] = "keyword (openai fallback - no api key)"
             return result
+        return self._parse_with_llm(text, "openai", *settings)
+
+    def _llm_settings(self, mode: str) -> Optional[Tuple[str, Callable[[str], str]]]:
+        """取得 (模型, 呼叫函式)；未設定 API Key 時回傳 None"""
+        if mode == "gemini":
+            api_key = self.config.get("gemini_api_key")
+            model = self.config.get("gemini_model", "gemini-2.5-flash")
+
+            def complete(prompt: str) -> str:
+                model_instance = self.clients.get("gemini", (api_key, model),
+                                                  lambda: self._create_gemini_model(api_key, model))
+                return model_instance.generate_content(prompt).text
+        else:
+            api_key = self.config.get("openai_api_key")
+            model = self.config.get("openai_model", "gpt-4o")
+
+            def complete(prompt: str) -> str:
+                client = self.clients.get("openai", (api_key,), lambda: self._create_openai_client(api_key))
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0
+                )
+                return response.choices[0].message.content
 
-        try:
-            from openai import OpenAI
-            client = OpenAI(api_key=api_key)
-
-            prompt = self._build_llm_prompt(text)
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
+        if not api_key:
+            return None
+        return model, complete
+
+    @staticmethod
+    def _create_gemini_model(api_key: str, model: str):
+        """建立 Gemini 模型（genai.configure 為全域設定，只在 Key 或模型變更時呼叫）"""
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model)
+
+    @staticmethod
+    def _create_openai_client(api_key: str):
+        """建立 OpenAI 用戶端（內含可重用的 HTTP 連線池）"""
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+
+    def _parse_with_llm(self, text: str, mode: str, model: str,
+                        complete: Callable[[str], str]) -> Dict[str, Any]:
+        """LLM 解析共用流程：關鍵字快速路徑 → 解析快取 → 呼叫 LLM"""
+        result, key, level, keyword_result = self._lookup_llm(text, mode, model)
+        if result is not None:
+            return result
 
-            return self._parse_llm_response(response.choices[0].message.content, text, "openai")
+        start = time.perf_counter()
+        try:
+            response = complete(self._build_llm_prompt(text))
         except Exception as e:
             # 錯誤時回退到關鍵字匹配
-            result = self._parse_keyword(text)
-            result["parse_mode"] = f"keyword (openai error: {str(e)})"
-            return result
+            keyword_result["parse_mode"] = f"keyword ({mode} error: {str(e)})"
+            keyword_result["parse_meta"] = self._parse_meta(mode, model, level)
+            return keyword_result
+        latency_ms = self._record_latency(mode, start)
+
+        result = self._parse_llm_response(response, text, mode)
+        self._store_llm(key, result, mode)
+        result["parse_meta"] = self._parse_meta(mode, model, level, latency_ms)
+        return result
+
+    def _parse_many_with_llm(self, texts: List[str], mode: str, model: str,
+                             complete: Callable[[str], str]) -> List[Dict[str, Any]]:
+        """批次 LLM 解析：快速路徑與快取未命中的指令合併為一次 LLM 呼叫"""
+        results: List[Optional[Dict[str, Any]]] = []
+        pending = []  # (索引, key, 快取層級, 關鍵字結果)
+        for index, text in enumerate(texts):
+            result, key, level, keyword_result = self._lookup_llm(text, mode, model)
+            results.append(result)
+            if result is None:
+                pending.append((index, key, level, keyword_result))
+        if not pending:
+            return results
+
+        start = time.perf_counter()
+        try:
+            response = complete(self._build_llm_batch_prompt([texts[index] for index, *_ in pending]))
+        except Exception as e:
+            items, latency_ms, error = None, None, f"{mode} error: {str(e)}"
+        else:
+            latency_ms = self._record_latency(mode, start)
+            items = self._parse_llm_batch_response(response, len(pending))
+            error = f"{mode} parse failed"
+
+        for position, (index, key, level, keyword_result) in enumerate(pending):
+            if items is None:
+                keyword_result["parse_mode"] = f"keyword ({error})"
+                result = keyword_result
+            else:
+                result = self._llm_result(items[position], texts[index], mode)
+                self._store_llm(key, result, mode)
+            result["parse_meta"] = self._parse_meta(mode, model, level, latency_ms)
+            results[index] = result
+        return results
+
+    def _lookup_llm(self, text: str, mode: str, model: str) -> tuple:
+        """查詢快速路徑與解析快取，回傳 (結果或 None, 快取 key, 快取層級, 關鍵字結果)"""
+        keyword_result = self._parse_keyword(text)
+
+        # 關鍵字比對信心夠高時不呼叫 LLM
+        threshold = self.config.get("nlp_fast_path_confidence", 0.9)
+        if threshold and keyword_result["confidence"] >= threshold:
+            keyword_result["parse_mode"] = f"keyword ({mode} fast path)"
+            keyword_result["parse_meta"] = self._parse_meta(mode, model, "skipped")
+            return keyword_result, None, "skipped", keyword_result
+
+        key = parse_key(mode, model, text)
+        cached, level = self.parse_cache.get(key)
+        if cached is not None:
+            result = dict(cached, original_text=text, parse_mode=f"{mode} (cached)")
+            result["parse_meta"] = self._parse_meta(mode, model, level)
+            return result, key, level, keyword_result
+        return None, key, level, keyword_result
+
+    def _store_llm(self, key: str, result: Dict[str, Any], mode: str):
+        """快取成功的 LLM 解析結果"""
+        if result["parse_mode"] == mode and result.get("intent"):
+            self.parse_cache.put(key, {k: result[k] for k in ("intent", "confidence", "params")})
+
+    def _record_latency(self, mode: str, start: float) -> float:
+        """記錄一次 LLM 呼叫的延遲（毫秒）"""
+        elapsed = time.perf_counter() - start
+        _llm_seconds.observe(elapsed, mode)
+        latency_ms = round(elapsed * 1000, 1)
+        with self._stats_lock:
+            stats = self._llm_stats.setdefault(mode, {"calls": 0, "total_ms": 0.0, "last_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += latency_ms
+            stats["last_ms"] = latency_ms
+        return latency_ms
+
+    def _parse_meta(self, mode: str, model: str, cache: str,
+                    latency_ms: Optional[float] = None) -> Dict[str, Any]:
+        """解析結果附帶的統計資訊"""
+        with self._stats_lock:
+            stats = self._llm_stats.get(mode, {"calls": 0, "total_ms": 0.0})
+            avg_ms = round(stats["total_ms"] / stats["calls"], 1) if stats["calls"] else None
+        return {
+            "model": model,
+            "cache": cache,
+            "cache_hit_rate": self.parse_cache.hit_ratio(),
+            "llm_latency_ms": latency_ms,
+            "llm_avg_latency_ms": avg_ms
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """取得解析快取、LLM 延遲與用戶端重用統計"""
+        with self._stats_lock:
+            llm = {mode: dict(s, avg_ms=round(s["total_ms"] / s["calls"], 1) if s["calls"] else None)
+                   for mode, s in self._llm_stats.items()}
+        return {"cache": self.parse_cache.stats(), "llm": llm, "clients": self.clients.stats()}
 
     def _build_llm_prompt(self, text: str) -> str:
         """建構 LLM 提示詞"""
@@ -304,6 +438,56 @@ class NLPParser:
 
 只回覆 JSON，不要其他文字。"""
 
+    def _build_llm_batch_prompt(self, texts: List[str]) -> str:
+        """建構批次解析的 LLM 提示詞"""
+        import json
+        intents = list(self.INTENT_PATTERNS.keys())
+
+        return f"""分析以下 {len(texts)} 則使用者輸入，分別判斷其意圖和參數。
+
+使用者輸入（JSON 陣列）：{json.dumps(texts, ensure_ascii=False)}
+
+可能的意圖（每則選擇一個最匹配的）：
+{', '.join(intents)}
+
+請以 JSON 陣列回覆，順序與輸入相同，每個元素格式為：
+{{
+  "intent": "意圖名稱",
+  "confidence": 0.0-1.0 的信心分數,
+  "params": {{
+    "name": "筆記本名稱（如有）",
+    "url": "網址（如有）",
+    "question": "問題內容（如有）",
+    "quantity": 數量（如有）
+  }}
+}}
+
+只回覆 JSON，不要其他文字。"""
+
+    def _parse_llm_batch_response(self, response: str, count: int) -> Optional[List[Dict[str, Any]]]:
+        """解析批次 LLM 回應；格式或數量不符時回傳 None"""
+        import json
+
+        try:
+            json_match = re.search(r'\[[\s\S]*\]', response)
+            if json_match:
+                items = json.loads(json_match.group())
+                if isinstance(items, list) and len(items) == count and all(isinstance(i, dict) for i in items):
+                    return items
+        except json.JSONDecodeError:
+            pass
+        return None
+
+    def _llm_result(self, data: Dict[str, Any], original_text: str, mode: str) -> Dict[str, Any]:
+        """將 LLM 回傳的單筆 JSON 轉為解析結果"""
+        return {
+            "intent": data.get("intent"),
+            "confidence": data.get("confidence", 0.8),
+            "params": data.get("params", {}),
+            "original_text": original_text,
+            "parse_mode": mode
+        }
+
     def _parse_llm_response(self, response: str, original_text: str, mode: str) -> Dict[str, Any]:
         """解析 LLM 回應"""
         import json
@@ -313,13 +497,7 @@ class NLPParser:
             json_match = re.search(r'\{[\s\S]*\}', response)
             if json_match:
                 data = json.loads(json_match.group())
-                return {
-                    "intent": data.get("intent"),
-                    "confidence": data.get("confidence", 0.8),
-                    "params": data.get("params", {}),
-                    "original_text": original_text,
-                    "parse_mode": mode
-                }
+                return self._llm_result(data, original_text, mode)
         except json.JSONDecodeError:
             pass
 
@@ -329,5 +507,30 @@ class NLPParser:
         return result
 
 
+# 預先編譯（模組載入時建立一次）
+_INTENT_MATCHER = IntentMatcher(NLPParser.INTENT_PATTERNS, NLPParser.FUZZY_RULES)
+_NAME_PATTERNS = [re.compile(p) for p in
+                  (r"[「『\"]([^」』\"]+)[」』\"]", r"叫做\s*[「『\"]?(\S+)[」』\"]?", r"名為\s*(\S+)")]
+_URL_PATTERN = re.compile(r"(https?://[^\s]+)")
+_YOUTUBE_PATTERN = re.compile(r"((?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+)")
+_QUANTITY_PATTERN = re.compile(r"(\d+)\s*(?:題|個|張)")
+_ARTIFACT_TYPE_KEYWORDS = [
+    (("心智圖", "mindmap", "mind map"), "mind-map"),
+    (("簡報", "投影片", "slide"), "slide-deck"),
+    (("資訊圖", "infographic"), "infographic"),
+    (("數據表", "資料表", "表格", "datatable"), "data-table"),
+    (("閃卡", "字卡", "flashcard"), "flashcards"),
+    (("測驗", "題目", "quiz"), "quiz"),
+    (("報告", "摘要", "report"), "report"),
+    (("影片", "視頻", "video"), "video"),
+    (("podcast", "播客", "音訊", "音檔", "audio"), "audio"),
+]
+_QUESTION_PATTERNS = [re.compile(p) for p in (
+    r"問[一]?下?\s*[「『\"]?(.+?)[」』\"]?\s*$",
+    r"查詢\s*[「『\"]?(.+?)[」』\"]?\s*$",
+    r"請問\s*(.+)",
+)]
+
+
 # 建立單例
 nlp_parser = NLPParser()
@@ -1,56 +1,228 @@
 """NotebookLM 操作服務封裝"""
 import asyncio
+import concurrent.futures
 import subprocess
+import threading
 import json
 import os
+import time
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from .client_pool import NotebookLMClientPool, ClientPoolUnavailable, to_jsonable, enum_value, wrap_list
+from .config_manager import config_manager
+from .cache import ReadThroughCache
+from .answer_cache import AnswerCache, answer_key, source_fingerprint
+from .content_index import ContentIndex, hash_file, extract_source_id
+from .artifact_cache import ArtifactCache, DOWNLOAD_TYPES
+from .upstream_guard import UpstreamGuard, OPERATION_CLASSES, operation_class
+from .auth_monitor import AuthMonitor
+from .metrics import metrics
+from .tracing import tracer
+
+# 有子指令的 CLI 指令（指標標籤取前兩段，其餘只取第一段，避免參數進入標籤）
+_SUBCOMMAND_GROUPS = {"source", "artifact", "generate", "auth", "download"}
+
+_cli_seconds = metrics.histogram(
+    "notebooklm_cli_seconds", "CLI 子行程耗時（phase=spawn 為啟動行程，upstream 為執行至結束）",
+    ("subcommand", "phase"))
+_library_seconds = metrics.histogram(
+    "notebooklm_library_seconds", "notebooklm-py 行程內呼叫耗時", ("subcommand",))
+_calls_total = metrics.counter(
+    "notebooklm_calls_total", "上游呼叫次數", ("subcommand", "backend", "outcome"))
+
+
+def subcommand_label(args: List[str]) -> str:
+    """CLI 參數對應的指標標籤（例如 source add、ask）"""
+    if not args:
+        return ""
+    if args[0] in _SUBCOMMAND_GROUPS and len(args) > 1 and not args[1].startswith("-"):
+        return f"{args[0]} {args[1]}"
+    return args[0]
+
 
 class NotebookLMService:
-    """NotebookLM 操作服務類別"""
+    """NotebookLM 操作服務類別
+
+    預設透過 notebooklm-py 在行程內呼叫（library 後端），
+    無法使用或設定為 cli 時改以 notebooklm CLI 子行程執行。
+    """
 
     def __init__(self):
         self.storage_path = Path.home() / ".notebooklm" / "storage_state.json"
+        self.config = config_manager
+        self.client_pool = NotebookLMClientPool(
+            self.storage_path, size=self.config.get("client_pool_size", 4)
+        )
+        # 進行中的對話（筆記本 ID -> 對話 ID，CLI 未回傳 ID 時為 None；每個筆記本延續同一段對話）
+        self._conversations: Dict[str, Optional[str]] = {}
+        # 請求執行緒與 library 客戶端的事件迴圈執行緒都會讀寫 _conversations
+        self._conversations_lock = threading.Lock()
+        # 筆記本、來源、工件列表的讀取快取（只快取成功的回應）
+        self.list_cache = ReadThroughCache(
+            ttl=self.config.get("list_cache_ttl", 30),
+            stale_ttl=self.config.get("list_cache_stale_ttl", 300),
+            should_cache=lambda result: bool(result.get("success"))
+        )
+        # 提問答案快取
+        self.answer_cache = AnswerCache(
+            self.config.get("answer_cache_dir") or str(Path(__file__).parent.parent / "data" / "answer_cache"),
+            max_bytes=int(self.config.get("answer_cache_max_mb", 100)) * 1024 * 1024
+        )
+        # 已上傳檔案的內容索引（SHA-256 → 來源 ID）
+        self.content_index = ContentIndex(
+            self.config.get("content_index_path") or str(Path(__file__).parent.parent / "data" / "content_index.json")
+        )
+        # 已下載的工件檔案
+        self.artifact_cache = ArtifactCache(
+            self.config.get("artifact_cache_dir") or str(Path(__file__).parent.parent / "data" / "artifacts"),
+            max_bytes=int(self.config.get("artifact_cache_max_mb", 2048)) * 1024 * 1024
+        )
+        # 上游呼叫的限流、斷路器與重試
+        self.guard = UpstreamGuard(
+            rates={name: self.config.get(f"upstream_rate_{name}", 60) for name in OPERATION_CLASSES},
+            burst=self.config.get("upstream_burst", 5),
+            max_retries=self.config.get("upstream_max_retries", 2),
+            backoff=self.config.get("upstream_backoff", 1.0),
+            failure_threshold=self.config.get("circuit_failure_threshold", 5),
+            reset_timeout=self.config.get("circuit_reset_timeout", 30),
+            on_auth_error=lambda error: self.auth_monitor.mark_expired(error)
+        )
+        # 認證狀態（背景驗證 storage_state.json，上游回報認證錯誤時立即標記過期）
+        self.auth_monitor = AuthMonitor(
+            lambda: self._spawn_cli(["auth", "check", "--json"]),
+            self.storage_path,
+            ttl=self.config.get("auth_check_ttl", 300),
+            poll_interval=self.config.get("auth_poll_interval", 5)
+        )
+
+    def _invalidate(self, notebook_id: Optional[str], *kinds: str):
+        """讓筆記本相關的列表快取失效
+
+        kinds 可為 notebooks、sources、artifacts。未指定筆記本的操作作用於
+        CLI 目前使用中的筆記本（無法得知是哪一本），因此讓該類所有鍵失效；
+        指定筆記本時則同時讓 None 鍵失效。
+        """
+        for kind in kinds:
+            if kind == "notebooks":
+                self.list_cache.invalidate(("notebooks",))
+            elif notebook_id is None:
+                self.list_cache.invalidate_where(lambda key, kind=kind: key[0] == kind)
+            else:
+                self.list_cache.invalidate((kind, notebook_id))
+                self.list_cache.invalidate((kind, None))
+
+    def get_backend(self) -> str:
+        """取得目前實際使用的後端"""
+        if self.config.get("notebooklm_backend", "library") == "library" and self.client_pool.is_available():
+            return "library"
+        return "cli"
+
+    def _execute(self, args: List[str], timeout: int = 120,
+                 op: Optional[Callable[[Any], Awaitable[Any]]] = None,
+                 shape: Optional[Callable[[Any], Any]] = None) -> Dict[str, Any]:
+        """依設定的後端執行操作
+
+        op 為在 notebooklm-py 客戶端上執行的協程函式；未提供（該操作僅 CLI 支援）
+        或 library 後端不可用時改用 args 執行 CLI。兩種後端回傳相同的
+        {"success", "data"/"error"} 格式。呼叫經由 self.guard 依操作類別限流與重試。
+        """
+        return self.guard.call(operation_class(args), lambda: self._dispatch(args, timeout, op, shape))
+
+    def _dispatch(self, args: List[str], timeout: int,
+                  op: Optional[Callable[[Any], Awaitable[Any]]],
+                  shape: Optional[Callable[[Any], Any]]) -> Dict[str, Any]:
+        """選擇後端執行一次操作"""
+        if op is None or self.get_backend() != "library":
+            return self._spawn_cli(args, timeout)
+
+        label = subcommand_label(args)
+        with tracer.child_span(f"library {label}") as span:
+            start = time.perf_counter()
+            try:
+                data = self.client_pool.run(op, timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                _calls_total.inc(label, "library", "timeout")
+                if span:
+                    span.fail("操作逾時")
+                return {"success": False, "error": "操作逾時"}
+            except ClientPoolUnavailable:
+                if span:
+                    span.set(fallback="cli")
+                return self._spawn_cli(args, timeout)
+            except Exception as e:
+                _calls_total.inc(label, "library", "error")
+                if span:
+                    span.fail(e)
+                return {"success": False, "error": str(e)}
+            finally:
+                _library_seconds.observe(time.perf_counter() - start, label)
+
+        _calls_total.inc(label, "library", "success")
+        return {"success": True, "data": shape(data) if shape else to_jsonable(data)}
 
     def _run_cli(self, args: List[str], timeout: int = 120) -> Dict[str, Any]:
-        """執行 notebooklm CLI 指令"""
+        """執行 notebooklm CLI 指令（經由 self.guard）"""
+        return self.guard.call(operation_class(args), lambda: self._spawn_cli(args, timeout))
+
+    def _spawn_cli(self, args: List[str], timeout: int = 120) -> Dict[str, Any]:
+        """啟動一次 notebooklm CLI 子行程
+
+        分別記錄啟動行程（spawn）與等待執行結束（upstream）的耗時。
+        """
+        with tracer.child_span(f"cli {subcommand_label(args)}") as span:
+            result = self._spawn_cli_timed(args, timeout, span)
+            if span and not result.get("success"):
+                span.fail(result.get("error"))
+            return result
+
+    def _spawn_cli_timed(self, args: List[str], timeout: int, span) -> Dict[str, Any]:
+        label = subcommand_label(args)
+        outcome = "error"
+        start = time.perf_counter()
         try:
             cmd = ["notebooklm"] + args
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=timeout,
                 encoding='utf-8'
             )
-
-            if result.returncode == 0:
+            spawned = time.perf_counter()
+            _cli_seconds.observe(spawned - start, label, "spawn")
+            if span:
+                span.set(spawn_ms=round((spawned - start) * 1000, 2))
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+            finally:
+                _cli_seconds.observe(time.perf_counter() - spawned, label, "upstream")
+
+            if process.returncode == 0:
+                outcome = "success"
                 # 嘗試解析 JSON 輸出
                 try:
-                    return {"success": True, "data": json.loads(result.stdout)}
+                    return {"success": True, "data": json.loads(stdout)}
                 except json.JSONDecodeError:
-                    return {"success": True, "data": result.stdout.strip()}
+                    return {"success": True, "data": stdout.strip()}
             else:
-                return {"success": False, "error": result.stderr.strip() or result.stdout.strip()}
+                return {"success": False, "error": stderr.strip() or stdout.strip()}
         except subprocess.TimeoutExpired:
+            outcome = "timeout"
             return {"success": False, "error": "操作逾時"}
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            _calls_total.inc(label, "cli", outcome)
 
     # ===== 認證相關 =====
 
-    def check_auth_status(self) -> Dict[str, Any]:
-        """檢查認證狀態"""
-        result = self._run_cli(["auth", "check", "--json"])
-        if result["success"]:
-            return {
-                "authenticated": True,
-                "details": result["data"]
-            }
-        return {
-            "authenticated": False,
-            "error": result.get("error", "未登入")
-        }
+    def check_auth_status(self, refresh: bool = False) -> Dict[str, Any]:
+        """取得認證狀態（由 auth_monitor 快取；refresh 為 True 時立即重新驗證）"""
+        return self.auth_monitor.status(refresh=refresh)
 
     def trigger_login(self) -> Dict[str, Any]:
         """觸發瀏覽器登入（非同步執行）"""
@@ -68,23 +240,41 @@ class NotebookLMService:
 
     def list_notebooks(self) -> Dict[str, Any]:
         """列出所有筆記本"""
-        return self._run_cli(["list", "--json"])
+        return self.list_cache.get_or_load(("notebooks",), lambda: self._execute(
+            ["list", "--json"],
+            op=lambda c: c.notebooks.list(),
+            shape=wrap_list("notebooks")))
 
     def create_notebook(self, title: str) -> Dict[str, Any]:
         """建立新筆記本"""
-        return self._run_cli(["create", title, "--json"])
+        result = self._execute(["create", title, "--json"],
+                               op=lambda c: c.notebooks.create(title))
+        self._invalidate(None, "notebooks")
+        return result
 
     def delete_notebook(self, notebook_id: str) -> Dict[str, Any]:
         """刪除筆記本"""
-        return self._run_cli(["delete", notebook_id])
+        result = self._execute(["delete", notebook_id],
+                               op=lambda c: c.notebooks.delete(notebook_id))
+        self._invalidate(notebook_id, "notebooks", "sources", "artifacts")
+        if result.get("success"):
+            self.content_index.forget_notebook(notebook_id)
+        return result
 
     def rename_notebook(self, notebook_id: str, new_title: str) -> Dict[str, Any]:
         """重命名筆記本"""
-        return self._run_cli(["rename", notebook_id, new_title])
+        result = self._execute(["rename", notebook_id, new_title],
+                               op=lambda c: c.notebooks.rename(notebook_id, new_title))
+        self._invalidate(notebook_id, "notebooks")
+        return result
 
     def use_notebook(self, notebook_id: str) -> Dict[str, Any]:
         """設定當前使用的筆記本"""
-        return self._run_cli(["use", notebook_id])
+        result = self._run_cli(["use", notebook_id])
+        # 目前使用中的筆記本改變，未指定筆記本的列表需重新取得
+        self.list_cache.invalidate(("sources", None))
+        self.list_cache.invalidate(("artifacts", None))
+        return result
 
     def get_status(self) -> Dict[str, Any]:
         """取得當前狀態"""
@@ -92,45 +282,135 @@ class NotebookLMService:
 
     # ===== 來源管理 =====
 
-    def list_sources(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
-        """列出筆記本的來源"""
+    def list_sources(self, notebook_id: Optional[str] = None, fresh: bool = False) -> Dict[str, Any]:
+        """列出筆記本的來源（fresh 為 True 時略過快取重新取得，並更新快取）"""
         args = ["source", "list", "--json"]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args)
+            op = lambda c: c.sources.list(notebook_id)
+        if fresh:
+            self.list_cache.invalidate(("sources", notebook_id))
+        return self.list_cache.get_or_load(
+            ("sources", notebook_id), lambda: self._execute(args, op=op, shape=wrap_list("sources")))
 
     def add_source_url(self, url: str, notebook_id: Optional[str] = None) -> Dict[str, Any]:
         """新增 URL 來源"""
         args = ["source", "add", url, "--json"]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args)
+            op = lambda c: c.sources.add_url(notebook_id, url)
+        result = self._execute(args, op=op)
+        self._invalidate(notebook_id, "sources")
+        return result
+
+    def add_source_file(self, file_path: str, notebook_id: Optional[str] = None,
+                        sha256: Optional[str] = None) -> Dict[str, Any]:
+        """新增檔案來源
+
+        指定筆記本時先以檔案內容的 SHA-256 查詢本機內容索引，
+        同一筆記本已上傳過相同內容時直接回傳既有來源（duplicate 為 True）。
+        呼叫端已計算過雜湊時以 sha256 傳入，不再重新讀取檔案。
+        """
+        if not notebook_id or not os.path.isfile(file_path):
+            sha256 = None
+        elif sha256 is None:
+            sha256 = hash_file(file_path)
+        if sha256:
+            entry = self.content_index.lookup(notebook_id, sha256)
+            if entry:
+                return {
+                    "success": True,
+                    "data": {"source_id": entry["source_id"], "name": entry["name"], "sha256": sha256},
+                    "duplicate": True
+                }
 
-    def add_source_file(self, file_path: str, notebook_id: Optional[str] = None) -> Dict[str, Any]:
-        """新增檔案來源"""
         args = ["source", "add", file_path, "--json"]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args)
+            op = lambda c: c.sources.add_file(notebook_id, file_path)
+        result = self._execute(args, op=op)
+        self._invalidate(notebook_id, "sources")
+
+        source_id = extract_source_id(result.get("data")) if result.get("success") else None
+        if sha256 and source_id:
+            self.content_index.record(notebook_id, sha256, source_id,
+                                      os.path.basename(file_path), os.path.getsize(file_path))
+        return result
 
     def delete_source(self, source_id: str, notebook_id: Optional[str] = None) -> Dict[str, Any]:
         """刪除來源"""
         args = ["source", "delete", source_id]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args)
+            op = lambda c: c.sources.delete(notebook_id, source_id)
+        result = self._execute(args, op=op)
+        self._invalidate(notebook_id, "sources")
+        if notebook_id and result.get("success"):
+            self.content_index.forget_source(notebook_id, source_id)
+        return result
 
     # ===== 對話功能 =====
 
     def ask_question(self, question: str, notebook_id: Optional[str] = None,
-                     new_conversation: bool = False) -> Dict[str, Any]:
-        """向筆記本提問"""
+                     new_conversation: bool = False, use_cache: bool = True) -> Dict[str, Any]:
+        """向筆記本提問
+
+        指定筆記本時先查答案快取：鍵由筆記本 ID、正規化後的問題與目前來源集合的
+        指紋組成，因此新增或刪除來源後自動失效；相同問題同時進行時只送出一次。
+        use_cache 為 False 時一律向上游提問並更新快取。快取命中不會延續對話。
+        答案取決於對話脈絡，因此只有不帶脈絡的提問（新對話或該筆記本的第一個問題）
+        使用快取與合併，進行中對話的後續提問一律直接送出。
+        """
+        with self._conversations_lock:
+            in_conversation = notebook_id in self._conversations
+        if not notebook_id or (in_conversation and not new_conversation):
+            return self._ask(question, notebook_id, new_conversation)
+
+        sources = self.list_sources(notebook_id)
+        if not sources.get("success") or not isinstance(sources.get("data"), dict):
+            return self._ask(question, notebook_id, new_conversation)
+
+        key = answer_key(notebook_id, question, source_fingerprint(sources["data"].get("sources", [])))
+        result, cached = self.answer_cache.get_or_compute(
+            key,
+            lambda: self._ask(question, notebook_id, new_conversation),
+            should_cache=lambda r: bool(r.get("success")),
+            use_cache=use_cache
+        )
+        return dict(result, cached=cached)
+
+    def _ask(self, question: str, notebook_id: Optional[str] = None,
+             new_conversation: bool = False) -> Dict[str, Any]:
+        """向上游送出提問"""
         args = ["ask", question, "--json"]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
+            with self._conversations_lock:
+                if new_conversation:
+                    self._conversations.pop(notebook_id, None)
+                conversation_id = self._conversations.get(notebook_id)
+
+            async def op(c):
+                result = await c.chat.ask(notebook_id, question, conversation_id=conversation_id)
+                if getattr(result, "conversation_id", None):
+                    with self._conversations_lock:
+                        self._conversations[notebook_id] = result.conversation_id
+                return result
         if new_conversation:
             args.append("--new")
-        return self._run_cli(args, timeout=180)
+        result = self._execute(args, timeout=180, op=op)
+        if notebook_id and result.get("success"):
+            # CLI 後端自行延續對話，這裡只記錄該筆記本已有進行中的對話（有回傳 ID 時一併記錄）
+            data = result.get("data")
+            with self._conversations_lock:
+                self._conversations.setdefault(
+                    notebook_id, data.get("conversation_id") if isinstance(data, dict) else None)
+        return result
 
     # ===== 內容生成 =====
 
@@ -140,9 +420,15 @@ class NotebookLMService:
         args = ["generate", "audio", "--json", "--format", format]
         if instructions:
             args.append(instructions)
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+            op = lambda c: c.artifacts.generate_audio(
+                notebook_id, instructions=instructions or None,
+                audio_format=enum_value("AudioFormat", format))
+        result = self._execute(args, timeout=60, op=op)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     def generate_video(self, notebook_id: Optional[str] = None,
                        instructions: str = "") -> Dict[str, Any]:
@@ -150,59 +436,112 @@ class NotebookLMService:
         args = ["generate", "video", "--json"]
         if instructions:
             args.append(instructions)
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+            op = lambda c: c.artifacts.generate_video(notebook_id, instructions=instructions or None)
+        result = self._execute(args, timeout=60, op=op)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     def generate_quiz(self, notebook_id: Optional[str] = None,
                       difficulty: str = "medium", quantity: str = "standard") -> Dict[str, Any]:
         """生成測驗"""
         args = ["generate", "quiz", "--json",
                 "--difficulty", difficulty, "--quantity", quantity]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+            op = lambda c: c.artifacts.generate_quiz(
+                notebook_id, difficulty=enum_value("QuizDifficulty", difficulty),
+                quantity=enum_value("QuizQuantity", quantity))
+        result = self._execute(args, timeout=60, op=op)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     def generate_flashcards(self, notebook_id: Optional[str] = None,
                             difficulty: str = "medium", quantity: str = "standard") -> Dict[str, Any]:
         """生成閃卡"""
         args = ["generate", "flashcards", "--json",
                 "--difficulty", difficulty, "--quantity", quantity]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+            op = lambda c: c.artifacts.generate_flashcards(
+                notebook_id, difficulty=enum_value("QuizDifficulty", difficulty),
+                quantity=enum_value("QuizQuantity", quantity))
+        result = self._execute(args, timeout=60, op=op)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     def generate_report(self, notebook_id: Optional[str] = None,
                         format: str = "briefing-doc") -> Dict[str, Any]:
         """生成報告"""
         args = ["generate", "report", "--json", "--format", format]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+            op = lambda c: c.artifacts.generate_report(
+                notebook_id, report_format=enum_value("ReportFormat", format))
+        result = self._execute(args, timeout=60, op=op)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     def generate_mindmap(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
         """生成心智圖"""
         args = ["generate", "mind-map", "--json"]
+        op = None
+        if notebook_id:
+            args.extend(["--notebook", notebook_id])
+            op = lambda c: c.artifacts.generate_mind_map(notebook_id)
+        result = self._execute(args, timeout=60, op=op, shape=_wrap_mind_map)
+        self._invalidate(notebook_id, "artifacts")
+        return result
+
+    def generate_infographic(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
+        """生成資訊圖"""
+        return self._generate_cli("infographic", notebook_id)
+
+    def generate_slide_deck(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
+        """生成簡報"""
+        return self._generate_cli("slide-deck", notebook_id)
+
+    def generate_data_table(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
+        """生成數據表"""
+        return self._generate_cli("data-table", notebook_id)
+
+    def _generate_cli(self, kind: str, notebook_id: Optional[str]) -> Dict[str, Any]:
+        """僅 CLI 支援的生成指令"""
+        args = ["generate", kind, "--json"]
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=60)
+        result = self._run_cli(args, timeout=60)
+        self._invalidate(notebook_id, "artifacts")
+        return result
 
     # ===== 工件管理 =====
 
-    def list_artifacts(self, notebook_id: Optional[str] = None) -> Dict[str, Any]:
-        """列出工件"""
+    def list_artifacts(self, notebook_id: Optional[str] = None, fresh: bool = False) -> Dict[str, Any]:
+        """列出工件（fresh 為 True 時略過快取重新取得，並更新快取）"""
         args = ["artifact", "list", "--json"]
+        op = None
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args)
+            op = lambda c: c.artifacts.list(notebook_id)
+        if fresh:
+            self.list_cache.invalidate(("artifacts", notebook_id))
+        return self.list_cache.get_or_load(
+            ("artifacts", notebook_id), lambda: self._execute(args, op=op, shape=wrap_list("artifacts")))
 
     def wait_artifact(self, artifact_id: str, notebook_id: Optional[str] = None,
                       timeout: int = 600) -> Dict[str, Any]:
         """等待工件完成"""
         args = ["artifact", "wait", artifact_id, "--timeout", str(timeout)]
+        op = None
         if notebook_id:
             args.extend(["-n", notebook_id])
-        return self._run_cli(args, timeout=timeout + 30)
+            op = lambda c: c.artifacts.wait_for_completion(notebook_id, artifact_id, timeout=timeout)
+        return self._execute(args, timeout=timeout + 30, op=op)
 
     def download_artifact(self, artifact_type: str, output_path: str,
                           artifact_id: Optional[str] = None,
@@ -211,19 +550,96 @@ class NotebookLMService:
         args = ["download", artifact_type, output_path]
         if artifact_id:
             args.extend(["-a", artifact_id])
+        op = None
         if notebook_id:
             args.extend(["-n", notebook_id])
-        return self._run_cli(args, timeout=300)
+
+            async def op(c):
+                download = getattr(c.artifacts, "download_" + artifact_type.replace("-", "_"))
+                return {"output_path": await download(notebook_id, output_path, artifact_id=artifact_id)}
+        return self._execute(args, timeout=300, op=op)
+
+    def fetch_artifact(self, artifact_type: str, artifact_id: str,
+                       notebook_id: Optional[str] = None) -> Dict[str, Any]:
+        """經由工件快取取得已下載的檔案，回傳 {"success", "path", "cached"}"""
+        return self.artifact_cache.get_or_fetch(
+            artifact_id, artifact_type,
+            lambda path: self.download_artifact(artifact_type, path, artifact_id, notebook_id))
+
+    def find_artifact(self, notebook_id: Optional[str], artifact_id: Optional[str] = None,
+                      artifact_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """從工件列表找出指定 ID 的工件，或指定類型中最新的一個，並附上 download_type"""
+        result = self.list_artifacts(notebook_id)
+        if not result.get("success") or not isinstance(result.get("data"), dict):
+            return None
+        matches = []
+        for artifact in result["data"].get("artifacts", []):
+            if not isinstance(artifact, dict):
+                continue
+            download_type = artifact_download_type(artifact)
+            if artifact_id and artifact.get("id") == artifact_id:
+                return dict(artifact, download_type=download_type)
+            if not artifact_id and artifact_type and download_type == artifact_type:
+                matches.append(dict(artifact, download_type=download_type))
+        if not matches:
+            return None
+        return max(matches, key=lambda a: str(a.get("created_at") or ""))
 
     # ===== 研究功能 =====
 
     def add_research(self, query: str, notebook_id: Optional[str] = None,
-                     mode: str = "fast", source: str = "web") -> Dict[str, Any]:
-        """新增研究"""
+                     mode: str = "fast", source: str = "web", timeout: int = 300) -> Dict[str, Any]:
+        """新增研究（阻塞至研究完成並匯入來源；背景執行請使用 research_jobs）"""
         args = ["source", "add-research", query, "--mode", mode, "--from", source]
         if notebook_id:
             args.extend(["--notebook", notebook_id])
-        return self._run_cli(args, timeout=300)
+        result = self._run_cli(args, timeout=timeout)
+        self._invalidate(notebook_id, "sources")
+        return result
+
+
+def artifact_download_type(artifact: Dict[str, Any]) -> Optional[str]:
+    """由工件的類型欄位推斷下載類型（對應 DOWNLOAD_TYPES）"""
+    for key in ("type", "artifact_type", "kind"):
+        value = artifact.get(key)
+        if value is None:
+            continue
+        text = str(value).lower().replace("_", "-")
+        for download_type in sorted(DOWNLOAD_TYPES, key=len, reverse=True):
+            if download_type in text or download_type.replace("-", "") in text:
+                return download_type
+    return None
+
+
+def artifact_state(artifact: Dict[str, Any]) -> str:
+    """將工件狀態正規化為 completed / failed / processing"""
+    status = str(artifact.get("status") or artifact.get("state") or "").lower()
+    if any(word in status for word in ("complete", "ready", "done", "success")):
+        return "completed"
+    if any(word in status for word in ("fail", "error")):
+        return "failed"
+    return "processing"
+
+
+def extract_artifact_id(data: Any) -> Optional[str]:
+    """從生成回應中取出工件 ID（notebooklm-py 的 task_id 即工件 ID）"""
+    if not isinstance(data, dict):
+        return None
+    for key in ("artifact_id", "task_id", "id"):
+        if isinstance(data.get(key), str) and data[key]:
+            return data[key]
+    artifact = data.get("artifact")
+    if isinstance(artifact, dict) and isinstance(artifact.get("id"), str):
+        return artifact["id"]
+    return None
+
+
+def _wrap_mind_map(data: Any) -> Dict[str, Any]:
+    """將心智圖結果包裝為與 CLI --json 相同的 {"mind_map": ...} 結構"""
+    data = to_jsonable(data)
+    if isinstance(data, dict) and "mind_map" in data:
+        return data
+    return {"mind_map": data}
 
 
 # 建立單例
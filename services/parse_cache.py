@@ -0,0 +1,145 @@
+"""LLM 指令解析快取（記憶體 LRU + 磁碟）"""
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from .answer_cache import AnswerCache
+
+
+def normalize_command(text: str) -> str:
+    """正規化指令文字：全半形統一、合併空白（保留大小寫，避免改動名稱與網址參數）"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def parse_key(mode: str, model: str, text: str) -> str:
+    """計算解析結果的快取 key（依模式與模型區分）"""
+    raw = json.dumps([mode, model, normalize_command(text)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """兩層解析快取
+
+    記憶體層為固定大小的 LRU；未命中時查詢磁碟層（AnswerCache），
+    磁碟命中會回填記憶體層，重新啟動後仍可沿用先前的解析結果。
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 1024,
+                 max_bytes: int = 10 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk = AnswerCache(cache_dir, max_bytes=max_bytes)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> tuple:
+        """讀取解析結果，回傳 (結果或 None, 命中層級 memory/disk/miss)"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value, "memory"
+
+        value = self.disk.get(key)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None, "miss"
+            self._stats["disk_hits"] += 1
+            self._remember(key, value)
+        return value, "disk"
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """寫入解析結果"""
+        with self._lock:
+            self._remember(key, value)
+        self.disk.put(key, value)
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        """寫入記憶體層（呼叫時須持有鎖）"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清除兩層快取"""
+        with self._lock:
+            self._entries.clear()
+        self.disk.clear()
+
+    def hit_ratio(self) -> float:
+        with self._lock:
+            hits = self._stats["hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+        return round(hits / lookups, 4) if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """取得命中統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+        disk = self.disk.stats()
+        stats["disk_entries"] = disk["entries"]
+        stats["disk_bytes"] = disk["bytes"]
+        stats["hit_ratio"] = self.hit_ratio()
+        return stats
+
+
+class LLMClientCache:
+    """長期重用的 LLM 用戶端
+
+    每個供應商保留一個用戶端（其底層 HTTP 連線池可跨請求重用），
+    只有在簽章（API Key、模型）改變時才重建。
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, tuple] = {}  # provider -> (signature, client)
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0}
+
+    def get(self, provider: str, signature: tuple, factory: Callable[[], Any]) -> Any:
+        """取得用戶端；簽章變更時以 factory 重建並關閉舊用戶端"""
+        with self._lock:
+            entry = self._clients.get(provider)
+            if entry is not None and entry[0] == signature:
+                self._stats["reused"] += 1
+                return entry[1]
+            client = factory()
+            self._clients[provider] = (signature, client)
+            self._stats["created"] += 1
+        if entry is not None:
+            self._close(entry[1])
+        return client
+
+    def reset(self, provider: Optional[str] = None):
+        """捨棄用戶端（例如連線錯誤後）"""
+        with self._lock:
+            if provider is None:
+                entries = list(self._clients.values())
+                self._clients.clear()
+            else:
+                entry = self._clients.pop(provider, None)
+                entries = [entry] if entry else []
+        for _, client in entries:
+            self._close(client)
+
+    @staticmethod
+    def _close(client: Any):
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["providers"] = sorted(self._clients)
+        return stats
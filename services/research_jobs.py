@@ -0,0 +1,210 @@
+"""研究任務（背景執行網頁 / 雲端硬碟研究，逐步回報匯入的來源）"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from .config_manager import config_manager
+from .notebooklm_service import notebooklm_service
+from .task_manager import task_manager, TaskPriority
+from .tracing import tracer
+
+RESEARCH_MODES = ("fast", "deep")
+RESEARCH_SOURCES = ("web", "drive")
+
+
+def _source_id(source: Any) -> Optional[str]:
+    if isinstance(source, dict):
+        return source.get("id") or source.get("source_id")
+    return None
+
+
+def _summary(source_id: str, source: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    source = source or {}
+    return {"id": source_id, "title": source.get("title"), "url": source.get("url")}
+
+
+def _reported_source_ids(data: Any) -> Optional[List[str]]:
+    """研究結果中 CLI 回報的已匯入來源 ID（沒有回報時為 None）"""
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("source_ids"), list):
+        return [i for i in data["source_ids"] if isinstance(i, str)]
+    if isinstance(data.get("sources"), list):
+        return [i for i in (_source_id(s) for s in data["sources"]) if i]
+    return None
+
+
+def _final_sources(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """任務最終的來源：CLI 有回報時只含確定屬於本任務的來源"""
+    sources = state["sources"]
+    if state["reported"]:
+        return [sources[i] for i in sources if i in state["confirmed"]]
+    return list(sources.values())
+
+
+class ResearchRunner:
+    """研究任務
+
+    同一筆記本的多個查詢合併為一個任務依序執行。快速與深度研究各屬一個任務群組，
+    以 set_group_limit 分別限制並行數，並各自使用同樣大小的執行緒池執行阻塞的 CLI 呼叫；
+    任務函式回傳 Future，不佔用任務工作執行緒。執行期間每 poll_interval 秒重新列出
+    來源（同一筆記本只列一次），新出現的來源即時以 update_partial 推送。
+
+    來源的歸屬：每個查詢結束時，CLI 回報的來源 ID（source_ids 或 sources）確定屬於該任務，
+    也不會再算入同一筆記本的其他研究任務；有回報時任務最終的 sources 只含這些來源。
+    執行中的即時推送只在該筆記本只有一個進行中的研究任務時進行（無法分辨同時進行的
+    研究各自匯入了哪些來源），CLI 未回報 ID 時最終結果也以此為準。
+    """
+
+    def __init__(self, fast_concurrency: int = 3, deep_concurrency: int = 1, timeout: float = 1800,
+                 poll_interval: float = 10, max_queries: int = 20):
+        self.limits = {"fast": max(1, fast_concurrency), "deep": max(1, deep_concurrency)}
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_queries = max_queries
+        self._pools = {mode: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"research-{mode}")
+                       for mode, limit in self.limits.items()}
+        # 任務 ID -> {"notebook_id", "known", "sources", "confirmed", "reported"}
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def submit(self, notebook_id: str, queries: List[str], mode: str = "fast",
+               source: str = "web") -> Dict[str, Any]:
+        """建立研究任務，回傳 {"success", "task_id"} 或錯誤"""
+        queries = list(dict.fromkeys(q.strip() for q in queries if isinstance(q, str) and q.strip()))
+        if not queries:
+            return {"success": False, "error": "請提供搜尋關鍵字"}
+        if len(queries) > self.max_queries:
+            return {"success": False, "error": f"查詢數量 {len(queries)} 超過上限 {self.max_queries}"}
+        if mode not in RESEARCH_MODES:
+            return {"success": False, "error": f"不支援的研究模式: {mode}"}
+        if source not in RESEARCH_SOURCES:
+            return {"success": False, "error": f"不支援的研究來源: {source}"}
+
+        group = f"research-{mode}"
+        task_manager.set_group_limit(group, self.limits[mode])
+        label = queries[0] if len(queries) == 1 else f"{queries[0]} 等 {len(queries)} 項"
+        task_id = task_manager.dispatch(
+            "research.run",
+            name=f"{'深度' if mode == 'deep' else '快速'}研究：{label}",
+            args=(notebook_id, queries, mode, source),
+            priority=TaskPriority.LONG if mode == "deep" else TaskPriority.NORMAL,
+            notebook_id=notebook_id,
+            group=group
+        )
+        return {"success": True, "task_id": task_id}
+
+    def run(self, notebook_id: str, queries: List[str], mode: str = "fast", source: str = "web") -> Future:
+        """記錄目前的來源後交由該模式的執行緒池執行（於任務中執行）"""
+        task_id = task_manager.current_task_id()
+        known = self._list_source_ids(notebook_id)
+        if task_id:
+            with self._lock:
+                self._active[task_id] = {"notebook_id": notebook_id, "known": known, "sources": {},
+                                         "confirmed": set(), "reported": False}
+            self._ensure_watcher()
+        parent = tracer.current_context()
+        return self._pools[mode].submit(self._run_batch, task_id, notebook_id, queries, mode, source, parent)
+
+    def _run_batch(self, task_id: Optional[str], notebook_id: str, queries: List[str], mode: str,
+                   source: str, parent=None) -> Dict[str, Any]:
+        """依序執行查詢，回傳 {"success", "data"}"""
+        results = []
+        try:
+            with tracer.span("research.batch", parent=parent, notebook_id=notebook_id, mode=mode,
+                             queries=len(queries)):
+                for index, query in enumerate(queries, start=1):
+                    result = notebooklm_service.add_research(query, notebook_id, mode, source,
+                                                             timeout=int(self.timeout))
+                    entry = {"query": query, "success": bool(result.get("success"))}
+                    if not result.get("success"):
+                        entry["error"] = result.get("error")
+                    results.append(entry)
+                    self._scan(notebook_id, task_id,
+                               _reported_source_ids(result.get("data")) if result.get("success") else None)
+                    if task_id:
+                        task_manager.update_progress(task_id, int(index * 100 / len(queries)))
+        finally:
+            with self._lock:
+                state = self._active.pop(task_id, None) if task_id else None
+        sources = _final_sources(state) if state else []
+        data = {"mode": mode, "queries": results, "sources": sources, "source_count": len(sources)}
+        if not any(entry["success"] for entry in results):
+            return {"success": False, "error": results[0].get("error") or "研究失敗", "data": data}
+        return {"success": True, "data": data}
+
+    def _list_source_ids(self, notebook_id: str) -> set:
+        result = notebooklm_service.list_sources(notebook_id, fresh=True)
+        return {_source_id(s) for s in self._sources_of(result)} - {None}
+
+    @staticmethod
+    def _sources_of(result: Dict[str, Any]) -> list:
+        data = result.get("data") if result.get("success") else None
+        return data.get("sources", []) if isinstance(data, dict) else []
+
+    def _scan(self, notebook_id: str, task_id: Optional[str] = None, confirmed: Optional[List[str]] = None):
+        """重新列出筆記本的來源並更新進行中研究任務的來源
+
+        confirmed 為 task_id 剛結束的查詢由 CLI 回報的來源 ID（未回報時為 None）。
+        """
+        sources = self._sources_of(notebooklm_service.list_sources(notebook_id, fresh=True))
+        listed = {_source_id(s): s for s in sources}
+        listed.pop(None, None)
+        updates = []
+        with self._lock:
+            active = {tid: state for tid, state in self._active.items() if state["notebook_id"] == notebook_id}
+            changed = set()
+            if task_id in active and confirmed is not None:
+                state = active[task_id]
+                state["reported"] = True
+                for source_id in confirmed:
+                    state["confirmed"].add(source_id)
+                    state["sources"][source_id] = _summary(source_id, listed.get(source_id))
+                    # 已確定歸屬的來源不再算入其他任務
+                    for other in active.values():
+                        other["known"].add(source_id)
+                changed.add(task_id)
+            if len(active) == 1:
+                (only_id, state), = active.items()
+                for source_id, source in listed.items():
+                    if source_id not in state["known"]:
+                        state["known"].add(source_id)
+                        state["sources"][source_id] = _summary(source_id, source)
+                        changed.add(only_id)
+            for tid in changed:
+                updates.append((tid, {"sources": list(active[tid]["sources"].values())}))
+        for tid, partial in updates:
+            task_manager.update_partial(tid, partial)
+
+    def _ensure_watcher(self):
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch_loop, name="research-watch", daemon=True)
+                self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                notebooks = {state["notebook_id"] for state in self._active.values()}
+                if not notebooks:
+                    self._watcher = None
+                    return
+            for notebook_id in notebooks:
+                try:
+                    self._scan(notebook_id)
+                except Exception as e:
+                    print(f"研究來源輪詢失敗: {e}")
+
+
+# 建立單例
+research_runner = ResearchRunner(
+    fast_concurrency=config_manager.get("research_fast_concurrency", 3),
+    deep_concurrency=config_manager.get("research_deep_concurrency", 1),
+    timeout=config_manager.get("research_timeout", 1800),
+    poll_interval=config_manager.get("research_poll_interval", 10),
+    max_queries=config_manager.get("research_max_queries", 20)
+)
+
+task_manager.register_handler("research.run", research_runner.run)
@@ -0,0 +1,235 @@
+"""批次匯入來源（正規化去重、並行上傳、每個筆記本的限流與重試）"""
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .config_manager import config_manager
+from .notebooklm_service import notebooklm_service
+from .task_manager import task_manager, TaskPriority
+from .upstream_guard import TokenBucket, classify_error
+
+# 不影響內容的追蹤參數
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|si)$", re.IGNORECASE)
+_YOUTUBE_ID = re.compile(r"^[\w-]{11}$")
+
+
+def canonicalize_url(url: str) -> str:
+    """正規化網址：小寫主機、去除預設埠、片段與追蹤參數、排序查詢參數，YouTube 統一為 watch?v= 形式"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80 or scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAMS.match(k)]
+
+    bare_host = host[4:] if host.startswith("www.") else host
+    video_id = None
+    if bare_host == "youtu.be":
+        video_id = parts.path.strip("/")
+    elif bare_host in ("youtube.com", "m.youtube.com") and parts.path == "/watch":
+        video_id = dict(query).get("v")
+    if video_id and _YOUTUBE_ID.match(video_id):
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def canonicalize_path(path: str) -> str:
+    """正規化檔案路徑為絕對路徑"""
+    return os.path.realpath(os.path.expanduser(path.strip()))
+
+
+def parse_entries(entries: List[Any]) -> List[Tuple[str, str]]:
+    """將輸入轉為 (類型, 值) 列表
+
+    每個項目可為字串（http/https 開頭視為網址，其餘視為檔案路徑）或
+    {"type": "url" | "file", "value": ...}；空白與 # 開頭的行會被忽略。
+    """
+    items = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            value = str(entry.get("value", "")).strip()
+            source_type = entry.get("type") or ("url" if re.match(r"https?://", value, re.I) else "file")
+        else:
+            value = str(entry).strip()
+            source_type = "url" if re.match(r"https?://", value, re.I) else "file"
+        if not value or value.startswith("#"):
+            continue
+        items.append((source_type, value))
+    return items
+
+
+def source_keys(source: Dict[str, Any]) -> List[str]:
+    """從 list_sources 的項目取出可比對的去重 key"""
+    keys = []
+    for field in ("url", "source_url", "uri"):
+        value = source.get(field)
+        if isinstance(value, str) and re.match(r"https?://", value, re.I):
+            keys.append("url:" + canonicalize_url(value))
+    title = source.get("title")
+    if isinstance(title, str) and title:
+        keys.append("title:" + title.strip().lower())
+    return keys
+
+
+def entry_keys(source_type: str, value: str) -> Tuple[str, List[str]]:
+    """回傳 (正規化後的值, 用於比對既有來源的 key 列表)"""
+    if source_type == "url":
+        canonical = canonicalize_url(value)
+        return canonical, ["url:" + canonical]
+    canonical = canonicalize_path(value)
+    return canonical, ["file:" + canonical, "title:" + os.path.basename(canonical).lower()]
+
+
+class SourceIngester:
+    """批次匯入來源
+
+    先以筆記本現有來源（list_sources）與本次輸入本身去重，只有新的項目才建立背景任務；
+    任務內以 concurrency 個執行緒並行新增，同一筆記本另受每分鐘 rate_per_minute 次的權杖桶
+    限流，避免單一大量匯入耗盡 upload 類別的全域配額。被限流的錯誤由 notebooklm_service.guard
+    重試；其他暫時性錯誤（上游可能已新增）在退避後先以 list_sources(fresh=True) 確認來源
+    不存在才重送，無法確認時不重送。重複執行相同匯入只需一次（已快取的）list_sources 呼叫，
+    不會重複新增。
+    """
+
+    def __init__(self, concurrency: int = 4, rate_per_minute: float = 30,
+                 max_retries: int = 3, backoff: float = 2.0):
+        self.concurrency = concurrency
+        self.rate_per_minute = rate_per_minute
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._buckets: Dict[str, TokenBucket] = {}
+        # 進行中的匯入（notebook_id -> 正規化值集合），避免並行的重複請求重複新增
+        self._in_flight: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def plan(self, notebook_id: str, entries: List[Any]) -> Dict[str, Any]:
+        """計算需要新增的項目與略過的項目"""
+        existing = set()
+        sources = notebooklm_service.list_sources(notebook_id)
+        if sources.get("success") and isinstance(sources.get("data"), dict):
+            for source in sources["data"].get("sources", []):
+                if isinstance(source, dict):
+                    existing.update(source_keys(source))
+
+        with self._lock:
+            in_flight = set(self._in_flight.get(notebook_id, ()))
+
+        new, skipped, seen = [], [], set()
+        for source_type, value in parse_entries(entries):
+            canonical, keys = entry_keys(source_type, value)
+            if canonical in seen:
+                skipped.append({"value": value, "reason": "duplicate"})
+            elif any(key in existing for key in keys):
+                skipped.append({"value": value, "reason": "exists"})
+            elif canonical in in_flight:
+                skipped.append({"value": value, "reason": "in_progress"})
+            elif source_type == "file" and not os.path.isfile(canonical):
+                skipped.append({"value": value, "reason": "not_found"})
+            else:
+                new.append({"type": source_type, "value": canonical})
+            seen.add(canonical)
+        return {"new": new, "skipped": skipped}
+
+    def submit(self, notebook_id: str, items: List[Dict[str, str]]) -> str:
+        """建立匯入任務，回傳任務 ID"""
+        with self._lock:
+            self._in_flight.setdefault(notebook_id, set()).update(item["value"] for item in items)
+        return task_manager.create_task(
+            name=f"批次匯入來源（{len(items)} 項）",
+            func=self.run,
+            args=(notebook_id, items),
+            priority=TaskPriority.NORMAL,
+            notebook_id=notebook_id
+        )
+
+    def run(self, notebook_id: str, items: List[Dict[str, str]],
+            on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """並行新增來源（於任務中執行）"""
+        task_id = task_manager.current_task_id()
+        if on_progress is None and task_id:
+            on_progress = lambda done, total: task_manager.update_progress(task_id, int(done * 100 / total))
+
+        added, failed = [], []
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ingest") as executor:
+                futures = {executor.submit(self._add, notebook_id, item): item for item in items}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    item = futures[future]
+                    result, attempts = future.result()
+                    entry = {"type": item["type"], "value": item["value"], "attempts": attempts}
+                    if result.get("success"):
+                        entry["data"] = result.get("data")
+                        added.append(entry)
+                    else:
+                        entry["error"] = result.get("error")
+                        failed.append(entry)
+                    if on_progress:
+                        on_progress(done, len(items))
+        finally:
+            with self._lock:
+                pending = self._in_flight.get(notebook_id, set())
+                pending.difference_update(item["value"] for item in items)
+                if not pending:
+                    self._in_flight.pop(notebook_id, None)
+
+        return {
+            "success": not failed,
+            "data": {"added": added, "failed": failed, "total": len(items)},
+            **({"error": f"{len(failed)} 個來源新增失敗"} if failed else {})
+        }
+
+    def _bucket(self, notebook_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(notebook_id)
+            if bucket is None:
+                bucket = self._buckets[notebook_id] = TokenBucket(self.rate_per_minute, burst=5)
+            return bucket
+
+    def _add(self, notebook_id: str, item: Dict[str, str]) -> Tuple[Dict[str, Any], int]:
+        """新增單一來源，暫時性錯誤時確認來源不存在後重試，回傳 (結果, 嘗試次數)"""
+        add = notebooklm_service.add_source_url if item["type"] == "url" else notebooklm_service.add_source_file
+        attempt = 0
+        while True:
+            attempt += 1
+            self._bucket(notebook_id).acquire()
+            try:
+                result = add(item["value"], notebook_id)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "error_kind": classify_error(str(e))}
+            if result.get("success") or attempt > self.max_retries or result.get("error_kind") != "transient":
+                return result, attempt
+            time.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            existing = self._find_existing(notebook_id, item)
+            if existing is None:
+                return result, attempt
+            if existing:
+                # 失敗的呼叫實際上已新增來源
+                return {"success": True, "data": existing}, attempt
+
+    @staticmethod
+    def _find_existing(notebook_id: str, item: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """重新列出來源，回傳符合項目的來源；不存在時回傳 {}，無法列出時回傳 None"""
+        sources = notebooklm_service.list_sources(notebook_id, fresh=True)
+        if not sources.get("success") or not isinstance(sources.get("data"), dict):
+            return None
+        _, keys = entry_keys(item["type"], item["value"])
+        for source in sources["data"].get("sources", []):
+            if isinstance(source, dict) and any(key in keys for key in source_keys(source)):
+                return source
+        return {}
+
+
+# 建立單例
+source_ingester = SourceIngester(
+    concurrency=config_manager.get("ingest_concurrency", 4),
+    rate_per_minute=config_manager.get("ingest_rate_per_minute", 30),
+    max_retries=config_manager.get("ingest_max_retries", 3)
+)
@@ -0,0 +1,372 @@
+"""任務佇列代理（多個行程共用同一個任務佇列）"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+# 工作（job）是可序列化的任務描述：
+# {"id", "handler", "name", "args", "kwargs", "priority", "notebook_id", "group",
+#  "resume", "trace_id", "trace_parent", "created_at"}
+# handler 為 TaskManager.register_handler 註冊的名稱，由取得工作的行程執行。
+
+
+def new_worker_id() -> str:
+    """行程識別碼（主機名稱、PID 與隨機字尾，避免 PID 重複使用時混淆）"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class TaskBroker:
+    """任務佇列代理介面
+
+    工作依 (priority, 送出順序) 排序；claim 時遵守每個筆記本與群組的並行上限，
+    上限計算涵蓋所有行程已取得但尚未 ack 的工作。與 TaskManager 相同，任務函式回傳
+    Future 後（defer）不再佔用筆記本名額，群組名額則持續到 ack。
+    行程以 heartbeat 表示存活；reap 回收逾時未回報行程所取得的工作。
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+
+    def publish(self, job: Dict[str, Any]):
+        """送出工作"""
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, max_per_notebook: int) -> Optional[Dict[str, Any]]:
+        """取得下一個可執行的工作（沒有時回傳 None）"""
+        raise NotImplementedError
+
+    def defer(self, job_id: str):
+        """工作已釋放工作執行緒、等待延後完成"""
+        raise NotImplementedError
+
+    def ack(self, job_id: str):
+        """工作已結束（完成、失敗或於本機取消）"""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> bool:
+        """移除尚未被取得的工作"""
+        raise NotImplementedError
+
+    def cancel_group(self, group: str) -> List[str]:
+        """移除群組中尚未被取得的工作，回傳工作 ID"""
+        raise NotImplementedError
+
+    def set_group_limit(self, group: str, limit: Optional[int], per_notebook: Optional[int]):
+        """設定群組的並行上限"""
+        raise NotImplementedError
+
+    def job_ids(self) -> Set[str]:
+        """排隊中與已被取得的工作 ID"""
+        raise NotImplementedError
+
+    def heartbeat(self, worker_id: str):
+        """回報行程存活"""
+
+    def live_workers(self, stale_after: float) -> Set[str]:
+        """最近 stale_after 秒內回報過的行程"""
+        return set()
+
+    def reap(self, stale_after: float) -> Tuple[Set[str], List[Dict[str, Any]]]:
+        """移除逾時未回報的行程，回傳 (行程 ID, 其已取得而未結束的工作)"""
+        return set(), []
+
+    def stats(self) -> Dict[str, Any]:
+        """排隊與執行中的工作數"""
+        raise NotImplementedError
+
+    def wait(self, timeout: float):
+        """等待新工作或名額釋放（最多 timeout 秒）"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def notify(self):
+        self._wakeup.set()
+
+
+def _pick(candidates: List[Dict[str, Any]], running: Dict[Any, int],
+          limits: Dict[str, tuple], max_per_notebook: int) -> Optional[Dict[str, Any]]:
+    """依序挑出第一個未超過並行上限的工作"""
+    for job in candidates:
+        nb, group = job.get("notebook_id"), job.get("group")
+        if nb and running.get(nb, 0) >= max_per_notebook:
+            continue
+        if group:
+            limit, per_notebook = limits.get(group, (None, None))
+            if limit and running.get(("group", group), 0) >= limit:
+                continue
+            if per_notebook and nb and running.get(("group", group, nb), 0) >= per_notebook:
+                continue
+        return job
+    return None
+
+
+def _running_keys(job: Dict[str, Any], deferred: bool = False) -> list:
+    nb, group = job.get("notebook_id"), job.get("group")
+    keys = [nb] if nb and not deferred else []
+    if group:
+        keys.append(("group", group))
+        if nb:
+            keys.append(("group", group, nb))
+    return keys
+
+
+class LocalBroker(TaskBroker):
+    """單一行程內的任務佇列（預設；其他實作的替身）"""
+
+    def __init__(self):
+        super().__init__()
+        self._queued: Dict[str, tuple] = {}  # job_id -> ((priority, seq), job)
+        self._claimed: Dict[str, Dict[str, Any]] = {}
+        self._deferred: Set[str] = set()
+        self._limits: Dict[str, tuple] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, job: Dict[str, Any]):
+        with self._lock:
+            self._seq += 1
+            self._queued[job["id"]] = ((job.get("priority", 5), self._seq), job)
+        self.notify()
+
+    def claim(self, worker_id: str, max_per_notebook: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            running: Dict[Any, int] = {}
+            for job in self._claimed.values():
+                for key in _running_keys(job, job["id"] in self._deferred):
+                    running[key] = running.get(key, 0) + 1
+            candidates = [job for _, job in sorted(self._queued.values(), key=lambda item: item[0])]
+            job = _pick(candidates, running, self._limits, max_per_notebook)
+            if job is not None:
+                del self._queued[job["id"]]
+                self._claimed[job["id"]] = job
+            return job
+
+    def defer(self, job_id: str):
+        with self._lock:
+            if job_id in self._claimed:
+                self._deferred.add(job_id)
+        self.notify()
+
+    def ack(self, job_id: str):
+        with self._lock:
+            self._deferred.discard(job_id)
+            job = self._claimed.pop(job_id, None)
+            if job and job.get("group"):
+                self._drop_idle_group(job["group"])
+        self.notify()
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            entry = self._queued.pop(job_id, None)
+            if entry and entry[1].get("group"):
+                self._drop_idle_group(entry[1]["group"])
+        return entry is not None
+
+    def cancel_group(self, group: str) -> List[str]:
+        with self._lock:
+            ids = [job_id for job_id, (_, job) in self._queued.items() if job.get("group") == group]
+            for job_id in ids:
+                del self._queued[job_id]
+            self._drop_idle_group(group)
+        return ids
+
+    def _drop_idle_group(self, group: str):
+        """群組已無工作時移除其上限設定（呼叫時須持有鎖）"""
+        if not any(job.get("group") == group for job in self._claimed.values()) and \
+                not any(job.get("group") == group for _, job in self._queued.values()):
+            self._limits.pop(group, None)
+
+    def set_group_limit(self, group: str, limit: Optional[int], per_notebook: Optional[int]):
+        with self._lock:
+            self._limits[group] = (limit, per_notebook)
+        self.notify()
+
+    def job_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._queued) | set(self._claimed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "local", "queued": len(self._queued),
+                    "claimed": len(self._claimed) - len(self._deferred), "deferred": len(self._deferred)}
+
+
+class SQLiteBroker(TaskBroker):
+    """以 SQLite 檔案共用的任務佇列（同一主機的多個行程）
+
+    claim 以 BEGIN IMMEDIATE 取得寫入鎖後挑選並標記工作，同一工作只會被一個行程取得。
+    其他行程送出的工作以輪詢發現（poll_interval 秒），同一行程內送出時立即喚醒。
+    """
+
+    shared = True
+
+    def __init__(self, db_path: str, poll_interval: float = 0.5):
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                seq INTEGER,
+                priority INTEGER,
+                notebook_id TEXT,
+                grp TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                claimed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(state, priority, seq);
+            CREATE TABLE IF NOT EXISTS job_groups (
+                name TEXT PRIMARY KEY,
+                lim INTEGER,
+                per_notebook INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+        """)
+
+    def _transaction(self, func, *args):
+        """在寫入交易中執行 func(conn, *args)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn, *args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def publish(self, job: Dict[str, Any]):
+        def insert(conn):
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, seq, priority, notebook_id, grp, payload, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+                (job["id"], seq, job.get("priority", 5), job.get("notebook_id"), job.get("group"),
+                 json.dumps(job, ensure_ascii=False, default=str)))
+        self._transaction(insert)
+        self.notify()
+
+    def claim(self, worker_id: str, max_per_notebook: int) -> Optional[Dict[str, Any]]:
+        def pick(conn):
+            running: Dict[Any, int] = {}
+            for row in conn.execute("SELECT notebook_id, grp, state FROM jobs WHERE state != 'queued'"):
+                job = {"notebook_id": row["notebook_id"], "group": row["grp"]}
+                for key in _running_keys(job, row["state"] == "deferred"):
+                    running[key] = running.get(key, 0) + 1
+            limits = {row["name"]: (row["lim"], row["per_notebook"])
+                      for row in conn.execute("SELECT * FROM job_groups")}
+            rows = conn.execute(
+                "SELECT payload FROM jobs WHERE state = 'queued' ORDER BY priority, seq LIMIT 500").fetchall()
+            job = _pick([json.loads(row["payload"]) for row in rows], running, limits, max_per_notebook)
+            if job is not None:
+                conn.execute("UPDATE jobs SET state = 'claimed', owner = ?, claimed_at = ? WHERE id = ?",
+                             (worker_id, time.time(), job["id"]))
+            return job
+        return self._transaction(pick)
+
+    def defer(self, job_id: str):
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET state = 'deferred' WHERE id = ? AND state = 'claimed'", (job_id,)))
+
+    def ack(self, job_id: str):
+        def delete(conn):
+            row = conn.execute("SELECT grp FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            if row and row["grp"]:
+                self._drop_idle_group(conn, row["grp"])
+        self._transaction(delete)
+        self.notify()
+
+    def cancel(self, job_id: str) -> bool:
+        def delete(conn):
+            row = conn.execute("SELECT grp FROM jobs WHERE id = ? AND state = 'queued'", (job_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            if row["grp"]:
+                self._drop_idle_group(conn, row["grp"])
+            return True
+        return self._transaction(delete)
+
+    def cancel_group(self, group: str) -> List[str]:
+        def delete(conn):
+            ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE grp = ? AND state = 'queued'", (group,))]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+            self._drop_idle_group(conn, group)
+            return ids
+        return self._transaction(delete)
+
+    @staticmethod
+    def _drop_idle_group(conn: sqlite3.Connection, group: str):
+        conn.execute("DELETE FROM job_groups WHERE name = ? AND NOT EXISTS "
+                     "(SELECT 1 FROM jobs WHERE grp = ?)", (group, group))
+
+    def set_group_limit(self, group: str, limit: Optional[int], per_notebook: Optional[int]):
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO job_groups (name, lim, per_notebook) VALUES (?, ?, ?)",
+            (group, limit, per_notebook)))
+
+    def job_ids(self) -> Set[str]:
+        with self._lock:
+            return {row["id"] for row in self._conn.execute("SELECT id FROM jobs")}
+
+    def heartbeat(self, worker_id: str):
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO workers (id, heartbeat) VALUES (?, ?)", (worker_id, time.time())))
+
+    def live_workers(self, stale_after: float) -> Set[str]:
+        with self._lock:
+            return {row["id"] for row in self._conn.execute(
+                "SELECT id FROM workers WHERE heartbeat >= ?", (time.time() - stale_after,))}
+
+    def reap(self, stale_after: float) -> Tuple[Set[str], List[Dict[str, Any]]]:
+        def collect(conn):
+            cutoff = time.time() - stale_after
+            dead = {row["id"] for row in conn.execute("SELECT id FROM workers WHERE heartbeat < ?", (cutoff,))}
+            if not dead:
+                return set(), []
+            marks = ", ".join("?" * len(dead))
+            rows = conn.execute(f"SELECT id, payload FROM jobs WHERE state != 'queued' AND owner IN ({marks})",
+                                tuple(dead)).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+            conn.execute(f"DELETE FROM workers WHERE id IN ({marks})", tuple(dead))
+            return dead, [json.loads(row["payload"]) for row in rows]
+        return self._transaction(collect)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = self._conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+        return {"backend": "sqlite", "queued": counts.get("queued", 0), "claimed": counts.get("claimed", 0),
+                "deferred": counts.get("deferred", 0), "workers": workers}
+
+    def wait(self, timeout: float):
+        super().wait(min(timeout, self.poll_interval))
+
+
+def create_task_broker(settings: Dict[str, Any]) -> TaskBroker:
+    """依設定建立任務佇列代理"""
+    if settings.get("task_broker") == "sqlite":
+        db_path = settings.get("task_broker_path") or str(Path(__file__).parent.parent / "data" / "task_queue.db")
+        return SQLiteBroker(db_path)
+    return LocalBroker()
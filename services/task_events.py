@@ -0,0 +1,73 @@
+"""任務狀態變更事件"""
+import threading
+import uuid
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+
+class TaskEventBus:
+    """保存最近的任務事件，供 SSE 串流推送與 Last-Event-ID 續傳
+
+    事件序號只在本行程的生命週期內有效：送給用戶端的事件 ID 以 event_id() 加上 boot_id 前綴，
+    重新啟動或重新連線到其他行程時前綴不同，since() 回傳 None 讓串流改送完整狀態。
+    """
+
+    def __init__(self, history: int = 1000, boot_id: Optional[str] = None):
+        self.boot_id = boot_id or uuid.uuid4().hex[:8]
+        self._events: deque = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._last_id = 0
+
+    @property
+    def last_id(self) -> int:
+        """最新事件 ID"""
+        return self._last_id
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        """發布事件，回傳事件 ID"""
+        with self._cond:
+            self._last_id += 1
+            self._events.append({"id": self._last_id, "event": event_type, "data": data})
+            self._cond.notify_all()
+            return self._last_id
+
+    def wake(self):
+        """喚醒等待中的串流（不新增事件），讓串流重新檢查是否該結束"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def event_id(self, seq: int) -> str:
+        """送給用戶端的事件 ID（boot_id-序號）"""
+        return f"{self.boot_id}-{seq}"
+
+    def parse_id(self, event_id: Optional[str]) -> Optional[int]:
+        """取出本行程事件 ID 的序號；格式不符或屬於其他行程生命週期時回傳 None"""
+        boot_id, _, seq = (event_id or "").rpartition("-")
+        if boot_id != self.boot_id or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, event_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """取得用戶端最後收到的事件 ID 之後的事件
+
+        ID 屬於其他行程生命週期（重新啟動或其他 worker）或中間事件已被淘汰時回傳 None。
+        """
+        last_id = self.parse_id(event_id)
+        if last_id is None:
+            return None
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id: int) -> Optional[List[Dict[str, Any]]]:
+        if last_id > self._last_id:
+            return None
+        if self._events and last_id < self._events[0]["id"] - 1:
+            return None
+        return [e for e in self._events if e["id"] > last_id]
+
+    def wait(self, last_id: int, timeout: float = 15.0) -> Optional[List[Dict[str, Any]]]:
+        """等待 last_id 之後的新事件，逾時回傳空列表"""
+        with self._cond:
+            if self._last_id <= last_id:
+                self._cond.wait(timeout)
+            return self._since(last_id)
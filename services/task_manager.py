@@ -1,10 +1,20 @@
 """背景任務管理"""
+import heapq
+import itertools
+import os
 import threading
 import uuid
 import time
-from typing import Dict, Any, Callable, Optional
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional, List
 from datetime import datetime
-from enum import Enum
+from enum import Enum, IntEnum
+from .config_manager import config_manager
+from .task_store import TaskStore, MemoryTaskStore, create_task_store
+from .task_broker import TaskBroker, LocalBroker, create_task_broker, new_worker_id
+from .task_events import TaskEventBus
+from .metrics import metrics
+from .tracing import tracer
 
 class TaskStatus(Enum):
     """任務狀態"""
@@ -12,16 +22,46 @@ class TaskStatus(Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class TaskPriority(IntEnum):
+    """任務優先順序（數值越小越先執行）"""
+    INTERACTIVE = 0   # 提問、心智圖等使用者等待中的操作
+    NORMAL = 5        # 測驗、閃卡、報告等
+    LONG = 10         # Podcast、影片等長時間生成
+
+# 任務列表可投影的欄位；預設不含 result
+TASK_FIELDS = ("id", "name", "status", "result", "has_result", "error", "progress", "partial", "priority",
+               "notebook_id", "group", "queue_position", "queue_depth", "wait_time",
+               "created_at", "started_at", "completed_at", "trace_id")
+DEFAULT_TASK_FIELDS = tuple(f for f in TASK_FIELDS if f != "result")
+
+_wait_seconds = metrics.histogram("task_wait_seconds", "任務排隊等待時間", ("priority",))
+_run_seconds = metrics.histogram("task_run_seconds", "任務執行時間（含延後完成）", ("priority",))
+_finished_total = metrics.counter("tasks_finished_total", "已結束的任務數", ("priority", "status"))
+
+
+def _priority_label(priority: int) -> str:
+    try:
+        return TaskPriority(priority).name.lower()
+    except ValueError:
+        return str(priority)
 
 class Task:
     """任務類別"""
 
-    def __init__(self, task_id: str, name: str, func: Callable, args: tuple = (), kwargs: dict = None):
+    def __init__(self, task_id: str, name: str, func: Callable, args: tuple = (), kwargs: dict = None,
+                 priority: int = TaskPriority.NORMAL, notebook_id: Optional[str] = None,
+                 group: Optional[str] = None):
         self.id = task_id
         self.name = name
         self.func = func
         self.args = args
         self.kwargs = kwargs or {}
+        self.priority = int(priority)
+        self.notebook_id = notebook_id if notebook_id is not None else self.kwargs.get("notebook_id")
+        # 所屬任務群組（例如批次生成），群組可另設並行上限
+        self.group = group
         self.status = TaskStatus.PENDING
         self.result = None
         self.error = None
@@ -29,6 +69,26 @@ class Task:
         self.started_at = None
         self.completed_at = None
         self.progress = 0
+        # 執行中逐步產生的部分結果（例如研究已匯入的來源）
+        self.partial: Optional[Dict[str, Any]] = None
+        self.queue_position = None
+        self.queue_depth = 0
+        # 重新啟動後接續追蹤所需的資訊（例如 {"artifact_id", "notebook_id"}）
+        self.resume: Optional[Dict[str, Any]] = None
+        # 追蹤：建立任務時的 span 為父（沒有時自成一個追蹤）
+        self.trace_id: Optional[str] = None
+        self.trace_parent: Optional[str] = None
+        self.span = None
+        # 執行此任務的行程（TaskManager.worker_id）；由佇列代理取得時保留原始工作
+        self.owner: Optional[str] = None
+        self.job: Optional[Dict[str, Any]] = None
+        # 任務函式已回傳 Future、不再佔用工作執行緒
+        self.deferred = False
+
+    def wait_time(self) -> float:
+        """排隊等待時間（秒）"""
+        end = self.started_at or self.completed_at or datetime.now()
+        return round((end - self.created_at).total_seconds(), 3)
 
     def to_dict(self) -> Dict[str, Any]:
         """轉換為字典"""
@@ -39,96 +99,750 @@ class Task:
             "result": self.result,
             "error": self.error,
             "progress": self.progress,
+            "partial": self.partial,
+            "priority": self.priority,
+            "notebook_id": self.notebook_id,
+            "group": self.group,
+            "queue_position": self.queue_position,
+            "queue_depth": self.queue_depth,
+            "wait_time": self.wait_time(),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "started_at": self.started_at.isoformat() if self.started_at else None,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "trace_id": self.trace_id
         }
 
+    def to_summary(self) -> Dict[str, Any]:
+        """不含結果內容的摘要（供事件推送）"""
+        summary = self.to_dict()
+        summary["has_result"] = summary.pop("result") is not None
+        return summary
+
+    def to_record(self) -> Dict[str, Any]:
+        """轉換為儲存用紀錄"""
+        record = self.to_dict()
+        record["queue_position"] = None
+        record["resume"] = self.resume
+        record["owner"] = self.owner
+        return record
+
+    def release(self):
+        """任務結束後釋放函式與參數參照"""
+        self.func = None
+        self.args = ()
+        self.kwargs = {}
+
 
 class TaskManager:
-    """任務管理器"""
+    """任務管理器
 
-    def __init__(self, max_workers: int = 5):
+    任務進入優先佇列，由最多 max_workers 個工作執行緒依優先順序取出執行；
+    同一筆記本同時執行的任務數不超過 max_per_notebook。
+    任務可指定群組並以 set_group_limit 設定群組的並行上限（整體與每個筆記本）；
+    群組名額從任務開始佔用到任務真正結束（含回傳 Future 的延後完成）。
+    self.tasks 只保留尚未結束的任務，所有任務紀錄（含已結束者）寫入 store。
+
+    以 dispatch 送出的任務改以已註冊的處理函式名稱與可序列化參數交給佇列代理（broker），
+    由有空閒工作執行緒的行程取得後放入本機佇列執行；搭配共用的 store 與 SQLiteBroker 時，
+    多個 API 行程與獨立的任務執行行程（worker.py）看到同一份任務狀態。
+    runner 為 False 的行程只送出工作、不取得工作。
+    """
+
+    def __init__(self, max_workers: int = 5, max_per_notebook: int = 2,
+                 store: Optional[TaskStore] = None, broker: Optional[TaskBroker] = None,
+                 runner: bool = True):
         self.tasks: Dict[str, Task] = {}
+        self.store = store or MemoryTaskStore()
+        self.broker = broker or LocalBroker()
+        self.runner = runner
+        self.worker_id = new_worker_id()
+        # 行程存活回報間隔與判定失聯的秒數
+        self.heartbeat_interval = 5.0
+        self.stale_after = 30.0
+        self._handlers: Dict[str, Callable] = {}
+        self._resume_handler: Optional[str] = None
+        self._consumer: Optional[threading.Thread] = None
+        # 其他行程處理中的任務最近一次狀態（轉為本行程的事件）與 store 版本
+        self._remote: Dict[str, Dict[str, Any]] = {}
+        self._store_version = self.store.version()
+        # 區分不同行程生命週期的版本前綴（事件 ID 重啟後會歸零）
+        self._boot_id = uuid.uuid4().hex[:8]
+        self.events = TaskEventBus(boot_id=self._boot_id)
         self.max_workers = max_workers
+        self.max_per_notebook = max_per_notebook
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # 執行中任務的快照與保存依序進行，避免較舊的快照覆蓋結束狀態
+        self._save_lock = threading.Lock()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._running_per_notebook: Dict[str, int] = {}
+        self._group_limits: Dict[str, tuple] = {}  # group -> (limit, per_notebook)
+        self._running_per_group: Dict[Any, int] = {}  # group 或 (group, notebook_id) -> 數量
+        self._workers: List[threading.Thread] = []
+        self._local = threading.local()
+        # shutdown() 後不再取出新任務
+        self._draining = False
+        # pause() 的原因（例如認證過期）；暫停期間不取出新任務，resume() 後繼續
+        self._paused: Optional[str] = None
 
-    def create_task(self, name: str, func: Callable, args: tuple = (), kwargs: dict = None) -> str:
-        """建立新任務"""
+    def create_task(self, name: str, func: Callable, args: tuple = (), kwargs: dict = None,
+                    priority: int = TaskPriority.NORMAL, notebook_id: Optional[str] = None,
+                    group: Optional[str] = None) -> str:
+        """建立新任務並放入佇列"""
         task_id = str(uuid.uuid4())[:8]
-        task = Task(task_id, name, func, args, kwargs)
+        task = Task(task_id, name, func, args, kwargs, priority, notebook_id, group)
+        self._enqueue(task)
+        return task_id
 
+    @staticmethod
+    def _bind_trace(task: Task):
+        """以目前的 span 為任務追蹤的父 span（沒有時自成一個追蹤）"""
+        if task.trace_id is None:
+            current = tracer.current()
+            if current is not None:
+                # 建立任務的請求即使沒有其他子 span 也保留，任務時間軸才有起點
+                current.keep = True
+                task.trace_id, task.trace_parent = current.context
+            else:
+                task.trace_id = uuid.uuid4().hex
+
+    def _enqueue(self, task: Task, announce: bool = True):
+        """將任務放入佇列（announce 為 False 時不發布 created 事件，供已由 dispatch 發布者使用）"""
+        self._bind_trace(task)
+        task.owner = self.worker_id
+        with self._cond:
+            self.tasks[task.id] = task
+            heapq.heappush(self._queue, (task.priority, next(self._seq), task.id))
+            self._ensure_workers()
+            self._cond.notify()
+        self.store.save(task.to_record())
+        if announce:
+            self.events.publish("created", task.to_summary())
+
+    # ----- 佇列代理 -----
+
+    def register_handler(self, handler: str, func: Callable):
+        """註冊 dispatch 可使用的任務處理函式（各行程匯入模組時註冊）"""
+        self._handlers[handler] = func
+
+    def dispatch(self, handler: str, name: str, args: tuple = (), kwargs: dict = None,
+                 priority: int = TaskPriority.NORMAL, notebook_id: Optional[str] = None,
+                 group: Optional[str] = None) -> str:
+        """經由佇列代理建立任務，回傳任務 ID（args 與 kwargs 須可 JSON 序列化）"""
+        task = Task(str(uuid.uuid4())[:8], name, None, args, kwargs, priority, notebook_id, group)
+        self._bind_trace(task)
+        if not self.broker.shared:
+            # 行程內佇列的工作只會由本行程執行
+            task.owner = self.worker_id
+        self.store.save(task.to_record())
+        self.events.publish("created", task.to_summary())
+        self._publish_job(task, handler, list(args), kwargs or {})
+        return task.id
+
+    def _publish_job(self, task: Task, handler: str, args: list, kwargs: Dict[str, Any],
+                     resume: Optional[Dict[str, Any]] = None):
+        self.broker.publish({
+            "id": task.id,
+            "handler": handler,
+            "name": task.name,
+            "args": args,
+            "kwargs": kwargs,
+            "priority": task.priority,
+            "notebook_id": task.notebook_id,
+            "group": task.group,
+            "resume": resume,
+            "trace_id": task.trace_id,
+            "trace_parent": task.trace_parent,
+            "created_at": task.created_at.isoformat()
+        })
+        self._ensure_consumer()
+
+    def _ensure_consumer(self):
+        """啟動取得工作與回報存活的背景執行緒"""
+        if self._consumer is not None and self._consumer.is_alive():
+            return
         with self._lock:
-            self.tasks[task_id] = task
+            if self._consumer is not None and self._consumer.is_alive():
+                return
+            # 先回報存活，避免其他行程在執行緒啟動前把本行程的任務當成失聯
+            self._heartbeat()
+            self._consumer = threading.Thread(target=self._consumer_loop, name="task-broker", daemon=True)
+            self._consumer.start()
 
-        # 啟動任務執行緒
-        thread = threading.Thread(target=self._run_task, args=(task_id,))
-        thread.daemon = True
-        thread.start()
+    def _consumer_loop(self):
+        last_beat = time.monotonic()
+        while not self._draining:
+            try:
+                if time.monotonic() - last_beat >= self.heartbeat_interval:
+                    last_beat = time.monotonic()
+                    self._heartbeat()
+                    self._reap()
+                if self.broker.shared:
+                    self._sync_remote()
+                job = self.broker.claim(self.worker_id, self.max_per_notebook) \
+                    if self.runner and self._has_capacity() else None
+            except Exception as e:
+                print(f"任務佇列代理錯誤: {e}")
+                job = None
+            if job is None:
+                self.broker.wait(self.heartbeat_interval)
+            else:
+                self._start_job(job)
 
-        return task_id
+    def _has_capacity(self) -> bool:
+        """是否有空閒的工作執行緒（排隊中與佔用執行緒的任務少於 max_workers）"""
+        with self._lock:
+            busy = sum(1 for t in self.tasks.values()
+                       if t.status == TaskStatus.PENDING or (t.status == TaskStatus.RUNNING and not t.deferred))
+            return busy < self.max_workers and not self._draining and not self._paused
 
-    def _run_task(self, task_id: str):
-        """執行任務"""
-        task = self.tasks.get(task_id)
-        if not task:
+    def _start_job(self, job: Dict[str, Any]):
+        """將取得的工作放入本機佇列"""
+        func = self._handlers.get(job["handler"])
+        task = Task(job["id"], job.get("name") or job["handler"], func, tuple(job.get("args") or ()),
+                    job.get("kwargs"), job.get("priority", TaskPriority.NORMAL), job.get("notebook_id"),
+                    job.get("group"))
+        if job.get("created_at"):
+            task.created_at = datetime.fromisoformat(job["created_at"])
+        task.trace_id, task.trace_parent = job.get("trace_id"), job.get("trace_parent")
+        task.resume = job.get("resume")
+        task.job = job
+        if func is None:
+            task.owner = self.worker_id
+            self._set_outcome(task, error=RuntimeError(f"未註冊的任務處理函式: {job['handler']}"))
+            _finished_total.inc(_priority_label(task.priority), task.status.value)
+            self.store.save(task.to_record())
+            self._publish_update(task, "status", "error", "completed_at")
+            self.broker.ack(task.id)
             return
+        self._enqueue(task, announce=False)
 
-        try:
-            task.status = TaskStatus.RUNNING
-            task.started_at = datetime.now()
+    @property
+    def _store_liveness(self) -> bool:
+        """store 由多個行程共用但佇列代理只在行程內時，改以 store 回報與判斷行程存活"""
+        return self.store.shared and not self.broker.shared
+
+    def _heartbeat(self):
+        self.broker.heartbeat(self.worker_id)
+        if self._store_liveness:
+            self.store.heartbeat(self.worker_id)
 
+    def _reap(self):
+        """接手逾時未回報的行程所留下的工作與任務"""
+        dead, jobs = self.broker.reap(self.stale_after)
+        if self._store_liveness:
+            dead = dead | self.store.reap_workers(self.stale_after)
+        handled = set()
+        for job in jobs:
+            record = self.store.get(job["id"])
+            if record and record.get("status") in ("pending", "running"):
+                self._recover(record, job)
+            handled.add(job["id"])
+        if dead:
+            for record in self.store.unfinished():
+                if record.get("owner") in dead and record["id"] not in handled:
+                    self._recover(record)
+
+    def _sync_remote(self):
+        """共用 store 時，將其他行程造成的任務變更轉為本行程的事件（供 SSE 串流）"""
+        version = self.store.version()
+        if version == self._store_version:
+            return
+        self._store_version = version
+        fields = ("status", "progress", "partial", "error", "started_at", "completed_at")
+        seen = {}
+        for record in self.store.unfinished():
+            if record["id"] in self.tasks:
+                continue
+            seen[record["id"]] = record
+            previous = self._remote.get(record["id"])
+            changed = [f for f in fields if previous is None or previous.get(f) != record.get(f)]
+            if changed:
+                self._publish_record(record, changed)
+        for task_id in set(self._remote) - set(seen):
+            record = self.store.get(task_id)
+            if record and record["id"] not in self.tasks:
+                self._publish_record(record, fields + ("has_result",))
+        self._remote = {task_id: {f: r.get(f) for f in fields} for task_id, r in seen.items()}
+
+    def _publish_record(self, record: Dict[str, Any], fields: tuple):
+        delta = {"id": record["id"], "notebook_id": record.get("notebook_id")}
+        for field in fields:
+            delta[field] = record.get("result") is not None if field == "has_result" else record.get(field)
+        self.events.publish("updated", delta)
+
+    def _publish_update(self, task: Task, *fields: str):
+        """發布任務欄位變更（只含變更的欄位）"""
+        self.events.publish("updated", self._update_delta(task, fields))
+
+    @staticmethod
+    def _update_delta(task: Task, fields: tuple) -> Dict[str, Any]:
+        summary = task.to_summary()
+        delta = {"id": task.id, "notebook_id": task.notebook_id}
+        delta.update({field: summary[field] for field in fields})
+        return delta
+
+    def _ensure_workers(self):
+        """依需要啟動工作執行緒（呼叫時須持有鎖）"""
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, name=f"task-worker-{len(self._workers)}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_runnable(self) -> Optional[Task]:
+        """取出下一個可執行的任務（呼叫時須持有鎖）
+
+        已取消的任務直接捨棄；所屬筆記本或群組已達並行上限的任務暫時跳過，保留在佇列中。
+        """
+        if self._draining or self._paused:
+            return None
+        skipped = []
+        task = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            candidate = self.tasks.get(entry[2])
+            if candidate is None or candidate.status != TaskStatus.PENDING:
+                continue
+            nb = candidate.notebook_id
+            if nb and self._running_per_notebook.get(nb, 0) >= self.max_per_notebook:
+                skipped.append(entry)
+                continue
+            if candidate.group and self._group_full(candidate):
+                skipped.append(entry)
+                continue
+            task = candidate
+            break
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return task
+
+    def _group_full(self, task: Task) -> bool:
+        """任務所屬群組是否已達並行上限（呼叫時須持有鎖）"""
+        limit, per_notebook = self._group_limits.get(task.group, (None, None))
+        if limit and self._running_per_group.get(task.group, 0) >= limit:
+            return True
+        return bool(per_notebook and task.notebook_id
+                    and self._running_per_group.get((task.group, task.notebook_id), 0) >= per_notebook)
+
+    def _group_keys(self, task: Task) -> list:
+        keys = [task.group]
+        if task.notebook_id:
+            keys.append((task.group, task.notebook_id))
+        return keys
+
+    def _worker_loop(self):
+        """工作執行緒主迴圈"""
+        while True:
+            with self._cond:
+                task = self._next_runnable()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_runnable()
+                task.status = TaskStatus.RUNNING
+                task.started_at = datetime.now()
+                if task.notebook_id:
+                    self._running_per_notebook[task.notebook_id] = \
+                        self._running_per_notebook.get(task.notebook_id, 0) + 1
+                if task.group:
+                    for key in self._group_keys(task):
+                        self._running_per_group[key] = self._running_per_group.get(key, 0) + 1
+
+            _wait_seconds.observe(task.wait_time(), _priority_label(task.priority))
+            self.store.save(task.to_record())
+            self._publish_update(task, "status", "started_at", "wait_time")
+            deferred = None
+            try:
+                deferred = self._run_task(task)
+            finally:
+                with self._cond:
+                    task.deferred = deferred is not None
+                    if task.notebook_id:
+                        remaining = self._running_per_notebook.get(task.notebook_id, 1) - 1
+                        if remaining > 0:
+                            self._running_per_notebook[task.notebook_id] = remaining
+                        else:
+                            self._running_per_notebook.pop(task.notebook_id, None)
+                    # 同筆記本被跳過的任務可能已可執行
+                    self._cond.notify_all()
+                # 工作執行緒已空出，可再向佇列代理取得工作
+                if deferred is not None and task.job is not None:
+                    self.broker.defer(task.id)
+                self.broker.notify()
+                if deferred is None:
+                    self._finish_task(task)
+                else:
+                    deferred.add_done_callback(lambda future, task=task: self._complete_deferred(task, future))
+
+    def _run_task(self, task: Task) -> Optional[Future]:
+        """執行任務
+
+        任務函式回傳 Future 時（例如等待工件生成），任務維持執行中但釋放工作執行緒，
+        待 Future 完成後才結束；此時回傳該 Future。
+        """
+        self._local.task_id = task.id
+        tracer.record("task.queue", task.created_at.timestamp(), task.started_at.timestamp(),
+                      parent=(task.trace_id, task.trace_parent), task_id=task.id)
+        task.span = tracer.start_span("task.run", parent=(task.trace_id, task.trace_parent),
+                                      task_id=task.id, task_name=task.name, notebook_id=task.notebook_id or "")
+        token = tracer.activate(task.span)
+        try:
             # 執行任務函式
             result = task.func(*task.args, **task.kwargs)
+            if isinstance(result, Future):
+                return result
+            self._set_outcome(task, result)
+        except Exception as e:
+            self._set_outcome(task, error=e)
+        finally:
+            tracer.deactivate(token)
+            self._local.task_id = None
+        return None
 
+    @staticmethod
+    def _set_outcome(task: Task, result: Any = None, error: Optional[BaseException] = None):
+        """記錄任務結果"""
+        if error is None:
             task.result = result
             task.status = TaskStatus.COMPLETED
             task.progress = 100
-        except Exception as e:
-            task.error = str(e)
+        else:
+            task.error = str(error) or type(error).__name__
             task.status = TaskStatus.FAILED
-        finally:
-            task.completed_at = datetime.now()
+        task.completed_at = datetime.now()
+
+    def _complete_deferred(self, task: Task, future: Future):
+        """延後完成的任務結束"""
+        try:
+            self._set_outcome(task, future.result())
+        except BaseException as e:
+            self._set_outcome(task, error=e)
+        self._finish_task(task)
+
+    def _finish_task(self, task: Task):
+        """保存並發布任務結束狀態，移出進行中任務"""
+        if task.span is not None:
+            task.span.set(status=task.status.value)
+            if task.status != TaskStatus.COMPLETED:
+                task.span.fail(task.error)
+            tracer.finish(task.span)
+            task.span = None
+        priority = _priority_label(task.priority)
+        if task.started_at and task.completed_at:
+            _run_seconds.observe((task.completed_at - task.started_at).total_seconds(), priority)
+        _finished_total.inc(priority, task.status.value)
+        with self._save_lock:
+            with self._lock:
+                record = task.to_record()
+            self.store.save(record)
+        self._publish_update(task, "status", "progress", "error", "has_result", "completed_at")
+        if task.job is not None:
+            self.broker.ack(task.id)
+        with self._cond:
+            self.tasks.pop(task.id, None)
+            task.release()
+            # 喚醒等待中的 shutdown()
+            self._cond.notify_all()
+            if task.group:
+                for key in self._group_keys(task):
+                    remaining = self._running_per_group.get(key, 1) - 1
+                    if remaining > 0:
+                        self._running_per_group[key] = remaining
+                    else:
+                        self._running_per_group.pop(key, None)
+                if task.group not in self._running_per_group:
+                    self._drop_idle_group(task.group)
+
+    def current_task_id(self) -> Optional[str]:
+        """目前執行緒正在執行的任務 ID（供任務函式回報進度；僅在任務函式同步執行期間有效）"""
+        return getattr(self._local, "task_id", None)
+
+    def _refresh_queue_positions(self):
+        """更新等待中任務的佇列位置（呼叫時須持有鎖）"""
+        pending = [entry for entry in sorted(self._queue)
+                   if entry[2] in self.tasks and self.tasks[entry[2]].status == TaskStatus.PENDING]
+        depth = len(pending)
+        for task in self.tasks.values():
+            task.queue_position = None
+            task.queue_depth = depth
+        for position, entry in enumerate(pending, start=1):
+            self.tasks[entry[2]].queue_position = position
 
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """取得任務狀態"""
-        task = self.tasks.get(task_id)
-        if task:
-            return task.to_dict()
-        return None
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task:
+                self._refresh_queue_positions()
+                return task.to_dict()
+        return self.store.get(task_id)
+
+    def wait_task(self, task_id: str, timeout: float, interval: float = 1.0) -> Optional[Dict[str, Any]]:
+        """輪詢直到任務結束或逾時，回傳最後的任務狀態（含其他行程執行的任務）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            task = self.get_task(task_id)
+            if task is None or task.get("status") not in ("pending", "running") or time.monotonic() >= deadline:
+                return task
+            time.sleep(interval)
 
     def get_all_tasks(self) -> list:
         """取得所有任務"""
-        return [task.to_dict() for task in self.tasks.values()]
+        with self._lock:
+            self._refresh_queue_positions()
+            active = {task_id: task.to_dict() for task_id, task in self.tasks.items()}
+        records = [active.pop(r["id"], r) for r in self.store.list()]
+        records.extend(active.values())
+        return records
+
+    def get_task_summaries(self, notebook_id: Optional[str] = None, limit: int = 200) -> list:
+        """取得最近任務的摘要（不含結果內容），可依筆記本篩選"""
+        return self.query_tasks(notebook_id=notebook_id, limit=limit)["tasks"]
+
+    def query_tasks(self, statuses: Optional[List[str]] = None, name: Optional[str] = None,
+                    notebook_id: Optional[str] = None, created_after: Optional[str] = None,
+                    created_before: Optional[str] = None, cursor: Optional[tuple] = None,
+                    limit: int = 50, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """分頁查詢任務（由新到舊）
+
+        fields 指定回傳欄位，預設不含 result；回傳 {"tasks", "next_cursor"}，
+        next_cursor 為 (created_at, id) 或 None。
+        """
+        fields = [f for f in (fields or DEFAULT_TASK_FIELDS) if f in TASK_FIELDS]
+        records = self.store.query(statuses, name, notebook_id, created_after, created_before,
+                                   cursor, limit + 1, include_result="result" in fields)
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        with self._lock:
+            if any(r["id"] in self.tasks for r in records):
+                # 尚未結束的任務以即時狀態為準
+                self._refresh_queue_positions()
+                for i, record in enumerate(records):
+                    task = self.tasks.get(record["id"])
+                    if task:
+                        live = task.to_dict()
+                        live["has_result"] = task.result is not None
+                        records[i] = live
+
+        last = records[-1] if records else None
+        return {
+            "tasks": [{f: r.get(f) for f in fields} for r in records],
+            "next_cursor": (last["created_at"], last["id"]) if has_more and last else None
+        }
+
+    def list_version(self) -> str:
+        """任務列表版本（任何任務變更或暫停狀態改變都會改變，含其他行程寫入共用 store），供 ETag 使用"""
+        return f"{self._boot_id}-{self.events.last_id}-{self.store.version()}-{int(self._paused is not None)}"
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """取得佇列統計"""
+        with self._lock:
+            pending = [t for t in self.tasks.values() if t.status == TaskStatus.PENDING]
+            running = [t for t in self.tasks.values() if t.status == TaskStatus.RUNNING]
+            return {
+                "queue_depth": len(pending),
+                "running": len(running),
+                "max_workers": self.max_workers,
+                "max_per_notebook": self.max_per_notebook,
+                "oldest_wait_time": max((t.wait_time() for t in pending), default=0.0),
+                "paused": self._paused is not None,
+                "paused_reason": self._paused,
+                "broker": self.broker.stats()
+            }
 
     def update_progress(self, task_id: str, progress: int):
         """更新任務進度"""
-        task = self.tasks.get(task_id)
-        if task:
-            task.progress = min(100, max(0, progress))
+        self._update_field(task_id, "progress", min(100, max(0, progress)))
+
+    def update_partial(self, task_id: str, partial: Dict[str, Any]):
+        """更新任務的部分結果並推送事件"""
+        self._update_field(task_id, "partial", partial)
+
+    def set_resume(self, task_id: str, resume: Dict[str, Any]):
+        """記錄重新啟動後接續追蹤所需的資訊"""
+        self._update_field(task_id, "resume", resume, publish=False)
+
+    def _update_field(self, task_id: str, field: str, value: Any, publish: bool = True):
+        """在鎖內更新進行中任務的欄位並取得快照，於鎖外保存與發布"""
+        with self._save_lock:
+            with self._lock:
+                task = self.tasks.get(task_id)
+                if task is None or task.status not in (TaskStatus.PENDING, TaskStatus.RUNNING):
+                    return
+                setattr(task, field, value)
+                record = task.to_record()
+                delta = self._update_delta(task, (field,)) if publish else None
+            self.store.save(record)
+        if delta is not None:
+            self.events.publish("updated", delta)
 
     def cancel_task(self, task_id: str) -> bool:
-        """取消任務（僅限尚未開始的任務）"""
-        task = self.tasks.get(task_id)
-        if task and task.status == TaskStatus.PENDING:
-            task.status = TaskStatus.FAILED
-            task.error = "已取消"
-            return True
-        return False
+        """取消任務（僅限尚未開始的任務，含佇列代理中尚未被取得的工作）"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task and task.status == TaskStatus.PENDING:
+                self._mark_cancelled(task)
+            else:
+                task = None
+        if task is None:
+            return self.broker.cancel(task_id) and self._cancel_record(task_id)
+        if task.job is not None:
+            self.broker.ack(task.id)
+        _finished_total.inc(_priority_label(task.priority), task.status.value)
+        self.store.save(task.to_record())
+        self._publish_update(task, "status", "error", "completed_at")
+        return True
+
+    def _cancel_record(self, task_id: str) -> bool:
+        """將已自佇列代理移除的工作紀錄標記為已取消"""
+        record = self.store.get(task_id)
+        if record is None:
+            return False
+        record.update(status=TaskStatus.CANCELLED.value, error="已取消", completed_at=datetime.now().isoformat())
+        _finished_total.inc(_priority_label(record.get("priority", TaskPriority.NORMAL)), record["status"])
+        self.store.save(record)
+        self._publish_record(record, ("status", "error", "completed_at"))
+        return True
+
+    def cancel_group(self, group: str) -> List[str]:
+        """取消群組中所有尚未開始的任務，回傳被取消的任務 ID"""
+        with self._lock:
+            cancelled = [t for t in self.tasks.values() if t.group == group and t.status == TaskStatus.PENDING]
+            for task in cancelled:
+                self._mark_cancelled(task)
+            if group not in self._running_per_group:
+                self._drop_idle_group(group)
+        for task in cancelled:
+            if task.job is not None:
+                self.broker.ack(task.id)
+            _finished_total.inc(_priority_label(task.priority), task.status.value)
+            self.store.save(task.to_record())
+            self._publish_update(task, "status", "error", "completed_at")
+        queued = [task_id for task_id in self.broker.cancel_group(group) if self._cancel_record(task_id)]
+        return [t.id for t in cancelled] + queued
+
+    def _mark_cancelled(self, task: Task):
+        """標記任務為已取消並移出進行中任務（呼叫時須持有鎖）"""
+        task.status = TaskStatus.CANCELLED
+        task.error = "已取消"
+        task.completed_at = datetime.now()
+        del self.tasks[task.id]
+        task.release()
+
+    def set_group_limit(self, group: str, limit: Optional[int] = None, per_notebook: Optional[int] = None):
+        """設定群組的並行上限（整體與每個筆記本；None 表示不限）"""
+        with self._cond:
+            self._group_limits[group] = (limit, per_notebook)
+            self._cond.notify_all()
+        self.broker.set_group_limit(group, limit, per_notebook)
+
+    def _drop_idle_group(self, group: str):
+        """群組已無未結束的任務時移除其上限設定（呼叫時須持有鎖）"""
+        if not any(t.group == group for t in self.tasks.values()):
+            self._group_limits.pop(group, None)
+
+    def recover_unfinished(self, resume_handler: str):
+        """啟動時接續未結束的任務
+
+        仍在佇列代理中、或由其他存活行程執行中的任務不處理；已記錄工件 ID 的生成任務
+        以 resume_handler(**resume) 重新送出繼續等待，其餘無法接續的任務標記為失敗。
+        """
+        self._resume_handler = resume_handler
+        self._ensure_consumer()
+        self._reap()
+        queued = self.broker.job_ids()
+        live = self.broker.live_workers(self.stale_after) | {self.worker_id}
+        if self._store_liveness:
+            live |= self.store.live_workers(self.stale_after)
+        for record in self.store.unfinished():
+            if record["id"] in self.tasks or record["id"] in queued:
+                continue
+            # 共用佇列時，尚未被取得的工作（owner 為空）由其他行程負責；
+            # 共用 store 時，存活行程的任務由該行程負責（失聯後由 _reap 接手）
+            owner = record.get("owner")
+            if self.broker.shared and owner is None:
+                continue
+            if (self.broker.shared or self.store.shared) and owner in live:
+                continue
+            self._recover(record)
+
+    def _recover(self, record: Dict[str, Any], job: Optional[Dict[str, Any]] = None):
+        """接續中斷的任務：尚未開始者重新送出原工作，可接續的生成任務改為等待工件"""
+        resume = record.get("resume") or {}
+        if job is not None and record.get("status") == TaskStatus.PENDING.value:
+            self.broker.publish(job)
+        elif resume.get("artifact_id") and self._resume_handler:
+            task = Task(record["id"], record.get("name") or "等待工件", None,
+                        priority=TaskPriority.LONG, notebook_id=record.get("notebook_id"))
+            if record.get("created_at"):
+                task.created_at = datetime.fromisoformat(record["created_at"])
+            task.resume = resume
+            task.trace_id = record.get("trace_id")
+            self.store.save(task.to_record())
+            self._publish_job(task, self._resume_handler, [], dict(resume), resume)
+        else:
+            record["status"] = TaskStatus.FAILED.value
+            record["error"] = "服務重新啟動，任務已中斷"
+            record["completed_at"] = datetime.now().isoformat()
+            self.store.save(record)
+
+    def pause(self, reason: str):
+        """暫停取出新任務（執行中的任務不受影響），排隊中的任務保留到 resume()"""
+        with self._cond:
+            self._paused = reason
+
+    def resume(self):
+        """恢復取出新任務"""
+        with self._cond:
+            if self._paused is None:
+                return
+            self._paused = None
+            self._cond.notify_all()
+        self.broker.notify()
+
+    def shutdown(self, timeout: float = 30.0) -> Dict[str, int]:
+        """停止取出新任務，等待執行中的任務結束（最多 timeout 秒）
+
+        回傳仍在執行與仍在排隊的任務數。已自佇列代理取得但尚未開始的工作交還佇列代理；
+        尚未結束的任務紀錄保留在 store 中，已記錄工件 ID 的生成任務會由下次啟動
+        （或共用佇列時由其他行程）接續等待。
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+            while True:
+                running = sum(1 for t in self.tasks.values() if t.status == TaskStatus.RUNNING)
+                remaining = deadline - time.monotonic()
+                if running == 0 or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            requeue = [t for t in self.tasks.values() if t.status == TaskStatus.PENDING and t.job is not None]
+            pending = sum(1 for t in self.tasks.values() if t.status == TaskStatus.PENDING) - len(requeue)
+        # 已取得但尚未開始的工作交還佇列代理，由其他行程執行
+        for task in requeue:
+            self.broker.ack(task.id)
+            self.broker.publish(task.job)
+        return {"running": running, "pending": pending}
 
     def clean_old_tasks(self, max_age_hours: int = 24):
         """清理舊任務"""
-        now = datetime.now()
-        with self._lock:
-            to_remove = []
-            for task_id, task in self.tasks.items():
-                if task.completed_at:
-                    age = (now - task.completed_at).total_seconds() / 3600
-                    if age > max_age_hours:
-                        to_remove.append(task_id)
-            for task_id in to_remove:
-                del self.tasks[task_id]
-
-
-# 建立單例
-task_manager = TaskManager()
+        self.store.evict(max_age_hours * 3600)
+
+
+# 建立單例（TASK_RUNNER=0 的行程只送出工作，由其他行程執行）
+task_manager = TaskManager(store=create_task_store(config_manager.get_all()),
+                           broker=create_task_broker(config_manager.get_all()),
+                           runner=os.environ.get("TASK_RUNNER", "1") != "0")
+
+
+def _queue_gauges() -> Dict[tuple, float]:
+    stats = task_manager.get_queue_stats()
+    return {("depth",): stats["queue_depth"], ("running",): stats["running"],
+            ("oldest_wait_seconds",): stats["oldest_wait_time"]}
+
+
+metrics.gauge_callback("task_queue", "任務佇列狀態（排隊數、執行中數、最久等待秒數）", ("stat",), _queue_gauges)
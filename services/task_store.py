@@ -0,0 +1,432 @@
+"""任務狀態儲存後端"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Set
+
+# 尚未結束的任務狀態（不會被淘汰）
+UNFINISHED_STATUSES = ("pending", "running")
+
+
+def _is_finished(record: Dict[str, Any]) -> bool:
+    return record.get("status") not in UNFINISHED_STATUSES
+
+
+def _completed_before(record: Dict[str, Any], cutoff: datetime) -> bool:
+    completed_at = record.get("completed_at")
+    return bool(completed_at) and datetime.fromisoformat(completed_at) < cutoff
+
+
+def _matches(record: Dict[str, Any], statuses: Optional[List[str]], name: Optional[str],
+             notebook_id: Optional[str], created_after: Optional[str], created_before: Optional[str],
+             cursor: Optional[tuple]) -> bool:
+    created_at = record.get("created_at") or ""
+    if statuses and record.get("status") not in statuses:
+        return False
+    if name and name not in (record.get("name") or ""):
+        return False
+    if notebook_id and record.get("notebook_id") != notebook_id:
+        return False
+    if created_after and created_at < created_after:
+        return False
+    if created_before and created_at >= created_before:
+        return False
+    if cursor and (created_at, record["id"]) >= cursor:
+        return False
+    return True
+
+
+class TaskStore:
+    """任務儲存介面
+
+    儲存的是 Task.to_dict() 形式的紀錄（另含 resume 欄位），不含任務函式本身。
+    shared 為 True 的儲存可由多個行程共用，行程以 heartbeat 回報存活，
+    其他行程據此判斷紀錄的 owner 是否仍在執行。
+    另保存由多個子任務組成的父工作（例如批次生成，依 kind 區分），與任務紀錄分開，
+    不會出現在任務列表，也不參與任務的接續與淘汰。
+    """
+
+    shared = False
+
+    def save(self, record: Dict[str, Any]):
+        """新增或更新任務紀錄"""
+        raise NotImplementedError
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """取得任務紀錄"""
+        raise NotImplementedError
+
+    def list(self) -> List[Dict[str, Any]]:
+        """依建立時間列出所有任務紀錄"""
+        raise NotImplementedError
+
+    def delete(self, task_id: str):
+        """刪除任務紀錄"""
+        raise NotImplementedError
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """列出尚未結束的任務紀錄"""
+        return [r for r in self.list() if not _is_finished(r)]
+
+    def query(self, statuses: Optional[List[str]] = None, name: Optional[str] = None,
+              notebook_id: Optional[str] = None, created_after: Optional[str] = None,
+              created_before: Optional[str] = None, cursor: Optional[tuple] = None,
+              limit: int = 50, include_result: bool = False) -> List[Dict[str, Any]]:
+        """依條件查詢任務紀錄，由新到舊排序
+
+        cursor 為上一頁最後一筆的 (created_at, id)；回傳的紀錄皆含 has_result，
+        include_result 為 False 時不含 result。
+        """
+        matched = [r for r in self.list()
+                   if _matches(r, statuses, name, notebook_id, created_after, created_before, cursor)]
+        matched.sort(key=lambda r: (r.get("created_at") or "", r["id"]), reverse=True)
+        page = []
+        for record in matched[:limit]:
+            item = {k: v for k, v in record.items() if include_result or k != "result"}
+            item["has_result"] = record.get("result") is not None
+            page.append(item)
+        return page
+
+    def evict(self, max_age_seconds: Optional[float] = None):
+        """淘汰過舊或超出數量上限的已結束任務"""
+        raise NotImplementedError
+
+    def save_job(self, kind: str, job: Dict[str, Any], keep: int = 200):
+        """新增或更新父工作（job 須含 id 與 created_at），同一 kind 只保留最新的 keep 個"""
+        raise NotImplementedError
+
+    def get_job(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """取得父工作"""
+        raise NotImplementedError
+
+    def list_jobs(self, kind: str) -> List[Dict[str, Any]]:
+        """列出父工作（由新到舊）"""
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """其他行程寫入時會改變的版本（行程內儲存固定為空字串）"""
+        return ""
+
+    def heartbeat(self, worker_id: str):
+        """回報行程存活"""
+
+    def live_workers(self, stale_after: float) -> Set[str]:
+        """最近 stale_after 秒內回報過的行程"""
+        return set()
+
+    def reap_workers(self, stale_after: float) -> Set[str]:
+        """移除並回傳逾時未回報的行程（多個行程同時呼叫時只有一個會取得）"""
+        return set()
+
+
+class MemoryTaskStore(TaskStore):
+    """記憶體任務儲存（LRU + TTL）"""
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._jobs: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._lock = threading.Lock()
+
+    def save(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records[record["id"]] = record
+            self._records.move_to_end(record["id"])
+        if _is_finished(record):
+            self.evict()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(task_id)
+            if record is not None:
+                self._records.move_to_end(task_id)
+            return record
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = list(self._records.values())
+        return sorted(records, key=lambda r: r.get("created_at") or "")
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._records.pop(task_id, None)
+
+    def evict(self, max_age_seconds: Optional[float] = None):
+        cutoff = datetime.now() - timedelta(seconds=max_age_seconds or self.ttl_seconds)
+        with self._lock:
+            for task_id in [k for k, r in self._records.items() if _completed_before(r, cutoff)]:
+                del self._records[task_id]
+            # 超出上限時從最久未使用的已結束任務開始淘汰
+            overflow = len(self._records) - self.max_entries
+            if overflow > 0:
+                for task_id in [k for k, r in self._records.items() if _is_finished(r)][:overflow]:
+                    del self._records[task_id]
+
+    def save_job(self, kind: str, job: Dict[str, Any], keep: int = 200):
+        with self._lock:
+            jobs = self._jobs.setdefault(kind, OrderedDict())
+            # 與 SQLite 儲存相同，保存與取出的都是副本
+            jobs[job["id"]] = json.loads(json.dumps(job, default=str))
+            while len(jobs) > keep:
+                jobs.popitem(last=False)
+
+    def get_job(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(kind, {}).get(job_id)
+            return json.loads(json.dumps(job)) if job is not None else None
+
+    def list_jobs(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.get(kind, {}).values())
+        return [json.loads(json.dumps(job)) for job in reversed(jobs)]
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite 任務儲存
+
+    使用 WAL 日誌，依 status 與 created_at 建立索引；超過 inline_limit 位元組的
+    結果另存為檔案，避免資料表膨脹。可由多個行程共用（workers 表記錄各行程的存活時間）。
+    """
+
+    shared = True
+
+    COLUMNS = ("id", "name", "status", "notebook_id", "priority", "progress", "error",
+               "created_at", "started_at", "completed_at")
+
+    def __init__(self, db_path: str, max_entries: int = 5000, ttl_seconds: float = 7 * 24 * 3600,
+                 inline_limit: int = 64 * 1024, evict_every: int = 50):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.results_dir = self.db_path.parent / "task_results"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.inline_limit = inline_limit
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                status TEXT NOT NULL,
+                notebook_id TEXT,
+                priority INTEGER,
+                progress INTEGER,
+                error TEXT,
+                result TEXT,
+                result_path TEXT,
+                resume TEXT,
+                extra TEXT,
+                created_at TEXT,
+                started_at TEXT,
+                completed_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+            CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at TEXT,
+                PRIMARY KEY (kind, id)
+            );
+        """)
+
+    def _store_result(self, task_id: str, result: Any) -> tuple:
+        """回傳 (inline 結果, 外部檔案路徑)"""
+        if result is None:
+            return None, None
+        encoded = json.dumps(result, ensure_ascii=False, default=str)
+        if len(encoded.encode("utf-8")) <= self.inline_limit:
+            return encoded, None
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        path = self.results_dir / f"{task_id}.json"
+        path.write_text(encoded, encoding="utf-8")
+        return None, str(path)
+
+    def _row_to_record(self, row: sqlite3.Row, load_result: bool = True) -> Dict[str, Any]:
+        record = {col: row[col] for col in self.COLUMNS}
+        if load_result and row["result_path"]:
+            try:
+                record["result"] = json.loads(Path(row["result_path"]).read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                record["result"] = None
+        elif load_result:
+            record["result"] = json.loads(row["result"]) if row["result"] else None
+        record["resume"] = json.loads(row["resume"]) if row["resume"] else None
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    def save(self, record: Dict[str, Any]):
+        result, result_path = self._store_result(record["id"], record.get("result"))
+        extra = {k: v for k, v in record.items()
+                 if k not in self.COLUMNS and k not in ("result", "resume")}
+        values = [record.get(col) for col in self.COLUMNS] + [
+            result, result_path,
+            json.dumps(record["resume"], ensure_ascii=False) if record.get("resume") else None,
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        ]
+        columns = self.COLUMNS + ("result", "result_path", "resume", "extra")
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO tasks ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                values
+            )
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+        if should_evict:
+            self.evict()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM tasks ORDER BY created_at").fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM tasks WHERE status IN (?, ?) ORDER BY created_at", UNFINISHED_STATUSES
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def query(self, statuses: Optional[List[str]] = None, name: Optional[str] = None,
+              notebook_id: Optional[str] = None, created_after: Optional[str] = None,
+              created_before: Optional[str] = None, cursor: Optional[tuple] = None,
+              limit: int = 50, include_result: bool = False) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if name:
+            clauses.append("instr(name, ?) > 0")
+            params.append(name)
+        if notebook_id:
+            clauses.append("notebook_id = ?")
+            params.append(notebook_id)
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if cursor:
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        page = []
+        for row in rows:
+            record = self._row_to_record(row, load_result=include_result)
+            record["has_result"] = bool(row["result"] or row["result_path"])
+            page.append(record)
+        return page
+
+    def version(self) -> str:
+        # data_version 只在其他連線（其他行程）提交變更後增加
+        with self._lock:
+            return str(self._conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def heartbeat(self, worker_id: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO workers (id, heartbeat) VALUES (?, ?)",
+                               (worker_id, time.time()))
+
+    def live_workers(self, stale_after: float) -> Set[str]:
+        with self._lock:
+            return {row["id"] for row in self._conn.execute(
+                "SELECT id FROM workers WHERE heartbeat >= ?", (time.time() - stale_after,))}
+
+    def reap_workers(self, stale_after: float) -> Set[str]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dead = {row["id"] for row in self._conn.execute(
+                    "SELECT id FROM workers WHERE heartbeat < ?", (time.time() - stale_after,))}
+                if dead:
+                    self._conn.execute(f"DELETE FROM workers WHERE id IN ({', '.join('?' * len(dead))})",
+                                       tuple(dead))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return dead
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._delete_rows(self._conn.execute(
+                "SELECT id, result_path FROM tasks WHERE id = ?", (task_id,)).fetchall())
+
+    def _delete_rows(self, rows: list):
+        """刪除紀錄與外部結果檔（呼叫時須持有鎖）"""
+        for row in rows:
+            if row["result_path"]:
+                Path(row["result_path"]).unlink(missing_ok=True)
+        self._conn.executemany("DELETE FROM tasks WHERE id = ?", [(row["id"],) for row in rows])
+
+    def evict(self, max_age_seconds: Optional[float] = None):
+        cutoff = (datetime.now() - timedelta(seconds=max_age_seconds or self.ttl_seconds)).isoformat()
+        with self._lock:
+            expired = self._conn.execute(
+                "SELECT id, result_path FROM tasks WHERE status NOT IN (?, ?) AND completed_at < ?",
+                (*UNFINISHED_STATUSES, cutoff)
+            ).fetchall()
+            self._delete_rows(expired)
+            overflow = self._conn.execute(
+                "SELECT id, result_path FROM tasks WHERE status NOT IN (?, ?) "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (*UNFINISHED_STATUSES, self.max_entries)
+            ).fetchall()
+            self._delete_rows(overflow)
+
+    def save_job(self, kind: str, job: Dict[str, Any], keep: int = 200):
+        data = json.dumps(job, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO jobs (id, kind, data, created_at) VALUES (?, ?, ?, ?)",
+                               (job["id"], kind, data, job.get("created_at")))
+            self._conn.execute(
+                "DELETE FROM jobs WHERE kind = ? AND id IN "
+                "(SELECT id FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (kind, kind, keep))
+
+    def get_job(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE kind = ? AND id = ?", (kind, job_id)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list_jobs(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM jobs WHERE kind = ? ORDER BY created_at DESC",
+                                      (kind,)).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+
+def create_task_store(settings: Dict[str, Any]) -> TaskStore:
+    """依設定建立任務儲存後端"""
+    if settings.get("task_store") == "sqlite":
+        db_path = settings.get("task_store_path") or str(Path(__file__).parent.parent / "data" / "tasks.db")
+        return SQLiteTaskStore(db_path, max_entries=settings.get("task_store_max_entries", 5000))
+    return MemoryTaskStore(max_entries=settings.get("task_store_max_entries", 500))
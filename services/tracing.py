@@ -0,0 +1,287 @@
+"""輕量的請求追蹤（span 以 contextvars 傳遞，匯出至 JSONL 或 OTLP 收集器）"""
+import contextvars
+import json
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from .config_manager import config_manager
+
+# (trace_id, span_id)
+SpanContext = Tuple[str, str]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    """一段計時的操作"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status", "keep")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None, start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start if start is not None else time.time()
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        # 沒有子 span 的根 span 預設不保留在記憶體（例如輪詢請求），keep 為 True 時保留
+        self.keep = False
+
+    @property
+    def context(self) -> SpanContext:
+        return self.trace_id, self.span_id
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def fail(self, error: Any):
+        self.status = "error"
+        self.attributes["error"] = str(error)[:500]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 2) if self.end else None,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class JsonlExporter:
+    """將結束的 span 以 JSON Lines 附加寫入本機檔案"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(json.dumps(span, ensure_ascii=False, default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """以 OTLP/HTTP JSON 格式送往收集器（/v1/traces）
+
+    只實作必要欄位，足以讓 OpenTelemetry Collector 接收；送出失敗時丟棄，不影響服務。
+    """
+
+    def __init__(self, endpoint: str, service_name: str = "notebooklm-skill", timeout: float = 5.0):
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: List[Dict[str, Any]]):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "notebooklm-skill"}, "spans": [
+                {
+                    "traceId": span["trace_id"],
+                    "spanId": span["span_id"],
+                    "parentSpanId": span["parent_id"] or "",
+                    "name": span["name"],
+                    "kind": 1,
+                    "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                    "endTimeUnixNano": str(int((span["end"] or span["start"]) * 1e9)),
+                    "attributes": [_otlp_attribute(k, v) for k, v in span["attributes"].items()],
+                    "status": {"code": 2 if span["status"] == "error" else 1}
+                }
+                for span in spans
+            ]}]
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(body, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception:
+            pass
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Tracer:
+    """追蹤器
+
+    目前 span 存於 contextvars；跨執行緒時以 current_context() 取得 (trace_id, span_id)，
+    在另一個執行緒以 start_span(parent=...) 接續。結束的 span 保存在記憶體中最近
+    max_traces 個追蹤（供任務 API 查詢時間軸），並交由背景執行緒批次匯出，不阻塞請求。
+    """
+
+    def __init__(self, exporter=None, max_traces: int = 1000, max_spans_per_trace: int = 500):
+        self.exporter = exporter
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+
+    # ----- 建立與結束 span -----
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, new_trace: bool = False,
+                   start: Optional[float] = None, **attributes: Any) -> Span:
+        """建立 span（未指定 parent 時以目前的 span 為父；new_trace 為 True 時開始新的追蹤）"""
+        if parent is None and not new_trace:
+            parent = self.current_context()
+        trace_id, parent_id = parent if parent else (uuid.uuid4().hex, None)
+        return Span(name, trace_id, parent_id, attributes, start)
+
+    def finish(self, span: Span, end: Optional[float] = None):
+        """結束 span 並保存、匯出"""
+        if span.end is not None:
+            return
+        span.end = end if end is not None else time.time()
+        record = span.to_dict()
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is not None:
+                self._traces.move_to_end(span.trace_id)
+            elif span.parent_id is not None or span.keep:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if spans is not None and len(spans) < self.max_spans_per_trace:
+                spans.append(record)
+        if self.exporter is not None:
+            self._enqueue(record)
+
+    def record(self, name: str, start: float, end: float, parent: Optional[SpanContext] = None,
+               **attributes: Any) -> Span:
+        """記錄一段已知起訖時間的 span（例如任務排隊時間）"""
+        span = self.start_span(name, parent=parent, start=start, **attributes)
+        self.finish(span, end)
+        return span
+
+    @contextmanager
+    def child_span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """只在已有目前 span 時建立子 span（否則產生 None），避免背景呼叫產生大量零散追蹤"""
+        if _current.get() is None:
+            yield None
+            return
+        with self.span(name, **attributes) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, **attributes: Any) -> Iterator[Span]:
+        """以目前 span 為父建立子 span，區塊內成為目前的 span"""
+        span = self.start_span(name, parent=parent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            _current.reset(token)
+            self.finish(span)
+
+    # ----- 目前的 span -----
+
+    def activate(self, span: Optional[Span]) -> contextvars.Token:
+        """將 span 設為目前的 span，回傳用於 deactivate 的 token"""
+        return _current.set(span)
+
+    def deactivate(self, token: contextvars.Token):
+        _current.reset(token)
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def current_context(self) -> Optional[SpanContext]:
+        span = _current.get()
+        return span.context if span is not None else None
+
+    # ----- W3C traceparent -----
+
+    @staticmethod
+    def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+        match = _TRACEPARENT.match((header or "").strip().lower())
+        return (match.group(1), match.group(2)) if match else None
+
+    @staticmethod
+    def traceparent(span: Span) -> str:
+        return f"00-{span.trace_id}-{span.span_id}-01"
+
+    # ----- 查詢 -----
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """取得追蹤的時間軸（依開始時間排序，offset_ms 為相對於第一個 span 的起點）"""
+        with self._lock:
+            spans = [dict(s) for s in self._traces.get(trace_id, ())]
+        if not spans:
+            return None
+        spans.sort(key=lambda s: s["start"])
+        origin = spans[0]["start"]
+        for span in spans:
+            span["offset_ms"] = round((span["start"] - origin) * 1000, 2)
+        return {"trace_id": trace_id, "spans": spans}
+
+    # ----- 匯出 -----
+
+    def _enqueue(self, record: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 200:
+                    batch.append(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                pass
+
+
+def create_exporter(settings: Dict[str, Any]):
+    """依設定建立匯出器：none（只保留在記憶體）、jsonl 或 otlp"""
+    kind = settings.get("tracing_exporter", "none")
+    if kind == "jsonl":
+        return JsonlExporter(settings.get("tracing_path")
+                             or str(Path(__file__).parent.parent / "data" / "traces.jsonl"))
+    if kind == "otlp":
+        endpoint = settings.get("tracing_otlp_endpoint") or os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+        if endpoint:
+            return OTLPExporter(endpoint)
+    return None
+
+
+# 建立單例
+tracer = Tracer(exporter=create_exporter(config_manager.get_all()))
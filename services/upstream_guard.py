@@ -0,0 +1,260 @@
+"""上游呼叫保護（依操作類別限流、斷路器、錯誤分類與重試）"""
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+# 操作類別：read（列表、狀態、下載）、ask（提問）、generate（生成）、
+# upload（新增來源與其他寫入操作）
+OPERATION_CLASSES = ("read", "ask", "generate", "upload")
+
+# 可安全重試逾時等暫時性錯誤的類別；生成與寫入重送可能造成重複，只在明確被限流時重試
+IDEMPOTENT_CLASSES = {"read", "ask"}
+
+# 錯誤訊息（stderr）分類
+_RATE_LIMITED = re.compile(
+    r"\b429\b|rate.?limit|too many requests|quota|resource.?exhausted|throttl", re.IGNORECASE)
+_AUTH = re.compile(
+    r"\b401\b|\b403\b|unauthori[sz]ed|unauthenticated|forbidden|not logged in|login required|"
+    r"(session|cookie|token|credential)s?\b.*\b(expired|invalid)|notebooklm login|未登入|登入", re.IGNORECASE)
+_TRANSIENT = re.compile(
+    r"\b50[0234]\b|逾時|timed? ?out|timeout|unavailable|temporar|connection (reset|refused|aborted|error)|"
+    r"network|broken pipe|remote end closed|server error|bad gateway|try again", re.IGNORECASE)
+
+
+def operation_class(args: List[str]) -> Optional[str]:
+    """由 CLI 參數判斷操作類別；認證相關指令不受保護（回傳 None）"""
+    if not args:
+        return "read"
+    command = args[0]
+    if command in ("auth", "login"):
+        return None
+    if command == "ask":
+        return "ask"
+    if command == "generate":
+        return "generate"
+    if command == "source":
+        sub = args[1] if len(args) > 1 else ""
+        return "read" if sub == "list" else "upload"
+    if command in ("create", "delete", "rename"):
+        return "upload"
+    return "read"
+
+
+def classify_error(error: Optional[str]) -> str:
+    """將錯誤訊息分類為 rate_limited / auth / transient / permanent"""
+    text = error or ""
+    if _RATE_LIMITED.search(text):
+        return "rate_limited"
+    if _AUTH.search(text):
+        return "auth"
+    if _TRANSIENT.search(text):
+        return "transient"
+    return "permanent"
+
+
+class TokenBucket:
+    """權杖桶限流器"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """取得一個權杖，必要時等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "burst": self.burst,
+                "tokens": round(tokens, 2),
+                "waited_seconds": round(self.waited, 2)
+            }
+
+
+class CircuitBreaker:
+    """斷路器
+
+    連續 failure_threshold 次上游異常（暫時性錯誤或被限流）後開啟，reset_timeout 秒內
+    直接失敗不呼叫上游；之後進入半開狀態，只放行一個試探呼叫，成功則關閉、失敗則再次開啟。
+    上游有正常回應（包含永久性錯誤，例如找不到資源）即重置計數。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """是否允許呼叫上游"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._stats["rejected"] += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self._stats["rejected"] += 1
+                    return False
+                self._probing = True
+            return True
+
+    def retry_after(self) -> float:
+        """距離可再次嘗試的秒數"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self):
+        """試探呼叫的結果不代表上游健康狀態時（例如認證錯誤），釋放試探名額"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._state
+            stats["consecutive_failures"] = self._failures
+        stats["retry_after"] = round(self.retry_after(), 1)
+        return stats
+
+
+class UpstreamGuard:
+    """上游呼叫保護
+
+    每個操作類別各有一個權杖桶與斷路器。呼叫流程：斷路器開啟時立即失敗；
+    否則取得權杖後呼叫上游，依錯誤訊息分類決定是否以指數退避（含隨機抖動）重試：
+    被限流的錯誤一律重試，暫時性錯誤只在冪等類別（read、ask）重試，
+    認證與永久性錯誤不重試。回傳的失敗結果附上 error_kind；認證錯誤另外通知 on_auth_error。
+    """
+
+    def __init__(self, rates: Dict[str, float], burst: int = 5, max_retries: int = 2,
+                 backoff: float = 1.0, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 on_auth_error: Optional[Callable[[str], None]] = None):
+        self.on_auth_error = on_auth_error
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiters = {name: TokenBucket(rates.get(name, 60), burst) for name in OPERATION_CLASSES}
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name in OPERATION_CLASSES}
+        self._lock = threading.Lock()
+        self._counters = {name: {"calls": 0, "failures": 0, "retries": 0, "fast_failed": 0}
+                          for name in OPERATION_CLASSES}
+        self._errors = {"rate_limited": 0, "auth": 0, "transient": 0, "permanent": 0}
+
+    def call(self, op_class: Optional[str], func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """以保護機制呼叫 func（回傳 {"success", "data"/"error"}）"""
+        if op_class not in self.limiters:
+            return func()
+        limiter = self.limiters[op_class]
+        breaker = self.breakers[op_class]
+        counters = self._counters[op_class]
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                with self._lock:
+                    counters["fast_failed"] += 1
+                return {
+                    "success": False,
+                    "error": "上游服務暫時無法使用，請稍後再試",
+                    "error_kind": "circuit_open",
+                    "retry_after": round(breaker.retry_after(), 1)
+                }
+            limiter.acquire()
+            with self._lock:
+                counters["calls"] += 1
+            try:
+                result = func()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+
+            if result.get("success"):
+                breaker.record_success()
+                return result
+
+            kind = classify_error(result.get("error"))
+            with self._lock:
+                counters["failures"] += 1
+                self._errors[kind] += 1
+            if kind in ("rate_limited", "transient"):
+                breaker.record_failure()
+            elif kind == "permanent":
+                breaker.record_success()
+            else:
+                breaker.release_probe()
+                if self.on_auth_error:
+                    self.on_auth_error(result.get("error"))
+
+            retryable = kind == "rate_limited" or (kind == "transient" and op_class in IDEMPOTENT_CLASSES)
+            if not retryable or attempt >= self.max_retries:
+                return dict(result, error_kind=kind)
+            attempt += 1
+            with self._lock:
+                counters["retries"] += 1
+            # 被限流時退避時間加倍
+            base = self.backoff * (2 if kind == "rate_limited" else 1)
+            time.sleep(base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+    def stats(self) -> Dict[str, Any]:
+        """取得各類別的限流器、斷路器與呼叫統計"""
+        with self._lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+            errors = dict(self._errors)
+        return {
+            "classes": {
+                name: {
+                    "limiter": self.limiters[name].stats(),
+                    "breaker": self.breakers[name].stats(),
+                    **counters[name]
+                }
+                for name in OPERATION_CLASSES
+            },
+            "errors": errors
+        }
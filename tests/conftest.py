@@ -0,0 +1,18 @@
+"""測試共用設定"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    return create_app('default')
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,39 @@
+"""提問答案快取與對話脈絡"""
+import pytest
+
+from services.answer_cache import AnswerCache
+from services.notebooklm_service import notebooklm_service
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    """以假的上游取代提問，回傳實際送出的提問紀錄"""
+    calls = []
+
+    def execute(args, timeout=120, op=None, shape=None):
+        calls.append(args)
+        return {"success": True, "data": {"answer": f"第 {len(calls)} 次回答", "conversation_id": "c1"}}
+
+    monkeypatch.setattr(notebooklm_service, "answer_cache", AnswerCache(str(tmp_path / "answers")))
+    monkeypatch.setattr(notebooklm_service, "_conversations", {})
+    monkeypatch.setattr(notebooklm_service, "_execute", execute)
+    monkeypatch.setattr(notebooklm_service, "list_sources",
+                        lambda notebook_id, **kwargs: {"success": True, "data": {"sources": [{"id": "s1"}]}})
+    return calls
+
+
+def test_follow_up_question_is_not_served_from_cache(calls):
+    first = notebooklm_service.ask_question("重點是什麼", "nb1")
+    assert first["cached"] is False
+
+    # 同一段對話中的後續提問依賴脈絡，不可使用第一輪的快取答案
+    follow_up = notebooklm_service.ask_question("重點是什麼", "nb1")
+    assert "cached" not in follow_up
+    assert len(calls) == 2
+
+
+def test_new_conversation_question_uses_cache(calls):
+    notebooklm_service.ask_question("重點是什麼", "nb1")
+    again = notebooklm_service.ask_question("重點是什麼", "nb1", new_conversation=True)
+    assert again["cached"] is True
+    assert len(calls) == 1
@@ -0,0 +1,38 @@
+"""非同步提問 SSE 串流"""
+from services.ask_manager import AskJob, ask_manager
+
+
+def _finished_job(job_id):
+    job = AskJob(job_id, "問題", None)
+    job.emit("status", {"status": "queued"})
+    job.emit("chunk", {"text": "答案"})
+    job.finish("completed", "done", {"success": True, "data": {"answer": "答案"}})
+    ask_manager.jobs[job.id] = job
+    return job
+
+
+def _read(response, limit=50):
+    """讀取串流內容（最多 limit 段，避免無窮串流卡住測試）"""
+    parts = []
+    for part in response.response:
+        parts.append(part.decode() if isinstance(part, bytes) else part)
+        if len(parts) >= limit:
+            break
+    response.close()
+    return parts
+
+
+def test_resume_replays_remaining_events_then_ends(client):
+    _finished_job("resume1")
+    response = client.get("/api/ask/resume1/stream", headers={"Last-Event-ID": "1"})
+    parts = _read(response)
+    body = "".join(parts)
+    assert len(parts) < 50
+    assert "event: chunk" in body and "event: done" in body
+    assert "keepalive" not in body
+
+
+def test_resume_past_last_event_returns_204(client):
+    job = _finished_job("resume2")
+    response = client.get("/api/ask/resume2/stream", headers={"Last-Event-ID": str(len(job.events))})
+    assert response.status_code == 204
@@ -0,0 +1,65 @@
+"""批次步驟的並行執行"""
+import threading
+from collections import Counter
+
+from services.batch_executor import BatchRunner, BatchStep
+
+
+def _steps(count, depends=None):
+    steps = [BatchStep(i, f"step {i}", {"intent": "ask"}, "nb") for i in range(count)]
+    for index, depends_on in (depends or {}).items():
+        steps[index].depends_on = depends_on
+    return steps
+
+
+def test_step_with_simultaneous_predecessors_runs_once():
+    for _ in range(50):
+        # 前四個步驟同時結束，第五個步驟依賴全部
+        steps = _steps(5, {4: [0, 1, 2, 3]})
+        barrier = threading.Barrier(4)
+        calls = Counter()
+        lock = threading.Lock()
+
+        def execute(step):
+            with lock:
+                calls[step.index] += 1
+            if step.index < 4:
+                barrier.wait(5)
+            return {"success": True}
+
+        runner = BatchRunner(steps, execute, max_workers=4)
+        yielded = [step.index for step in runner.run()]
+        assert sorted(yielded) == [0, 1, 2, 3, 4]
+        assert calls == Counter({0: 1, 1: 1, 2: 1, 3: 1, 4: 1})
+        assert yielded[-1] == 4
+
+
+def test_abort_stops_starting_new_steps():
+    steps = _steps(6)
+    started = []
+
+    def execute(step):
+        started.append(step.index)
+        return {"success": step.index != 0}
+
+    runner = BatchRunner(steps, execute, max_workers=1, on_error="abort")
+    results = {step.index: step.status for step in runner.run()}
+    assert started == [0]
+    assert results[0] == "failed"
+    assert all(results[i] == "skipped" for i in range(1, 6))
+    assert runner.summary()["skipped"] == 5
+
+
+def test_deadline_marks_running_and_pending_steps():
+    release = threading.Event()
+    steps = _steps(3, {2: [0, 1]})
+
+    def execute(step):
+        if step.index == 1:
+            release.wait(5)
+        return {"success": True}
+
+    runner = BatchRunner(steps, execute, max_workers=2, deadline=0.3)
+    results = {step.index: step.status for step in runner.run()}
+    release.set()
+    assert results == {0: "completed", 1: "timeout", 2: "skipped"}
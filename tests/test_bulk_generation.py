@@ -0,0 +1,60 @@
+"""批次生成父工作的保存"""
+from datetime import datetime
+
+from services.bulk_generation import BulkGenerator
+from services.task_manager import task_manager
+from services.task_store import MemoryTaskStore, SQLiteTaskStore
+
+
+def _job(job_id, children):
+    return {
+        "id": job_id, "group": f"bulk-{job_id}", "notebook_ids": ["nb1"], "artifact_types": ["audio", "video"],
+        "concurrency": 8, "per_notebook": 2, "download": False, "cancelled": False,
+        "children": children, "created_at": datetime.now().isoformat()
+    }
+
+
+def _child(task_id, status, artifact_type):
+    return {"id": task_id, "name": "生成", "status": status, "notebook_id": "nb1", "progress": 0,
+            "group": "bulk-j1", "created_at": datetime.now().isoformat()}, \
+        {"task_id": task_id, "notebook_id": "nb1", "artifact_type": artifact_type}
+
+
+def test_bulk_job_is_visible_from_another_process(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tasks.db")
+    first = SQLiteTaskStore(db_path)
+    records, children = zip(_child("c1", "completed", "audio"), _child("c2", "running", "video"))
+    for record in records:
+        first.save(record)
+    first.save_job("bulk", _job("j1", list(children)))
+
+    # 另一個 API 行程（或重新啟動後）：只共用 store
+    monkeypatch.setattr(task_manager, "store", SQLiteTaskStore(db_path))
+    job = BulkGenerator().get("j1")
+    assert job["status"] == "running"
+    assert job["counts"] == {"completed": 1, "running": 1}
+    assert [j["id"] for j in BulkGenerator().list()] == ["j1"]
+    # 父工作不是任務紀錄
+    assert task_manager.get_task("j1") is None
+
+
+def test_cancel_is_persisted(monkeypatch):
+    store = MemoryTaskStore()
+    record, child = _child("c3", "cancelled", "audio")
+    store.save(record)
+    store.save_job("bulk", _job("j2", [child]))
+    monkeypatch.setattr(task_manager, "store", store)
+
+    BulkGenerator().cancel("j2")
+    assert store.get_job("bulk", "j2")["cancelled"] is True
+    assert BulkGenerator().get("j2")["status"] == "cancelled"
+
+
+def test_only_latest_jobs_are_kept(tmp_path):
+    for store in (MemoryTaskStore(), SQLiteTaskStore(str(tmp_path / "jobs.db"))):
+        for i in range(5):
+            job = _job(f"j{i}", [])
+            job["created_at"] = f"2026-01-01T00:00:0{i}"
+            store.save_job("bulk", job, keep=3)
+        assert [j["id"] for j in store.list_jobs("bulk")] == ["j4", "j3", "j2"]
+        assert store.get_job("bulk", "j0") is None
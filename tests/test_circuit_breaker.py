@@ -0,0 +1,94 @@
+"""斷路器的狀態轉換"""
+import types
+
+import pytest
+
+from services import upstream_guard
+from services.upstream_guard import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """以可手動推進的時鐘取代 upstream_guard 使用的 time"""
+    now = {"value": 1000.0}
+    fake = types.SimpleNamespace(monotonic=lambda: now["value"], sleep=lambda seconds: None)
+    monkeypatch.setattr(upstream_guard, "time", fake)
+
+    def advance(seconds):
+        now["value"] += seconds
+
+    return advance
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.stats()["state"] == "closed"
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    assert breaker.stats()["opened"] == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.stats()["consecutive_failures"] == 1
+
+
+def test_rejects_until_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    assert not breaker.allow()
+    clock(10)
+    assert not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(20)
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_half_open_allows_single_probe_and_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    clock(30)
+    assert breaker.allow()
+    assert breaker.stats()["state"] == "half_open"
+    # 試探進行中，其他呼叫仍被拒絕
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    clock(30)
+    assert breaker.allow()
+    breaker.record_failure()
+    stats = breaker.stats()
+    assert stats["state"] == "open"
+    assert stats["opened"] == 2
+    assert breaker.retry_after() == pytest.approx(30)
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_next_call_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    clock(30)
+    assert breaker.allow()
+    # 試探遇到認證錯誤：不代表上游狀態，釋放名額但維持半開
+    breaker.release_probe()
+    assert breaker.stats()["state"] == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
@@ -0,0 +1,89 @@
+"""常駐客戶端池的名額管理"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from services.client_pool import NotebookLMClientPool
+
+
+class FakeClient:
+    opened = 0
+
+    @classmethod
+    async def from_storage(cls, path):
+        FakeClient.opened += 1
+        return cls()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def pool(tmp_path):
+    storage = tmp_path / "storage_state.json"
+    storage.write_text("{}")
+    pool = NotebookLMClientPool(storage, size=1)
+    pool._client_cls = FakeClient
+    yield pool
+    pool.close()
+
+
+def _run_concurrently(pool, first, second):
+    """先執行 first（佔用唯一的客戶端），second 在其後排隊"""
+    results = {}
+
+    def call(name, op):
+        try:
+            results[name] = pool.run(op, timeout=3)
+        except BaseException as e:
+            results[name] = e
+
+    threads = [threading.Thread(target=call, args=("first", first))]
+    threads[0].start()
+    time.sleep(0.1)
+    threads.append(threading.Thread(target=call, args=("second", second)))
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+async def _second(client):
+    return "ok"
+
+
+def test_broken_client_wakes_waiter(pool):
+    async def first(client):
+        await asyncio.sleep(0.3)
+        raise OSError("連線中斷")
+
+    started = time.monotonic()
+    results = _run_concurrently(pool, first, _second)
+    assert isinstance(results["first"], OSError)
+    assert results["second"] == "ok"
+    assert time.monotonic() - started < 2
+    assert pool.stats()["created"] == 1
+
+
+def test_storage_change_while_checked_out_wakes_waiter(pool):
+    async def first(client):
+        await asyncio.sleep(0.2)
+        # 重新登入：客戶端借出期間 storage_state.json 變更
+        stat = pool.storage_path.stat()
+        os.utime(pool.storage_path, (stat.st_atime, stat.st_mtime + 10))
+        pool._check_storage()
+        await asyncio.sleep(0.1)
+        return "first"
+
+    started = time.monotonic()
+    results = _run_concurrently(pool, first, _second)
+    assert results == {"first": "first", "second": "ok"}
+    assert time.monotonic() - started < 2
+    stats = pool.stats()
+    assert stats["created"] == 1 and stats["generation"] == 1
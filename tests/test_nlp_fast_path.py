@@ -0,0 +1,45 @@
+"""關鍵字快速路徑"""
+import json
+
+import pytest
+
+from services.nlp_parser import NLPParser, _INTENT_MATCHER
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    parser = NLPParser()
+    monkeypatch.setattr(parser.parse_cache, "get", lambda key: (None, "miss"))
+    monkeypatch.setattr(parser.parse_cache, "put", lambda key, value: None)
+    return parser
+
+
+def _llm(calls):
+    def complete(prompt):
+        calls.append(prompt)
+        return json.dumps({"intent": "ask_question", "confidence": 0.95, "params": {"question": "重點"}})
+    return complete
+
+
+def test_full_phrase_is_confident():
+    assert _INTENT_MATCHER.match("列出筆記本") == ("list_notebooks", 0.95)
+
+
+@pytest.mark.parametrize("text", [
+    "問 這本書的重點是什麼",             # 單字關鍵字
+    "生成Podcast 給「AI 研究」筆記本",    # 同時命中多個意圖
+    "加入網址 https://example.com/a/b",  # 片語只佔一小段
+])
+def test_short_or_ambiguous_commands_reach_llm(parser, text):
+    calls = []
+    result = parser._parse_with_llm(text, "gemini", "test-model", _llm(calls))
+    assert len(calls) == 1
+    assert result["parse_mode"] == "gemini"
+
+
+def test_exact_command_skips_llm(parser):
+    calls = []
+    result = parser._parse_with_llm("列出筆記本", "gemini", "test-model", _llm(calls))
+    assert calls == []
+    assert result["intent"] == "list_notebooks"
+    assert "fast path" in result["parse_mode"]
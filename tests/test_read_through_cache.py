@@ -0,0 +1,47 @@
+"""讀取快取的失效與容量"""
+import threading
+
+from services.cache import ReadThroughCache
+
+
+def test_invalidation_leaves_no_state_behind():
+    cache = ReadThroughCache(max_entries=4)
+    for i in range(100):
+        cache.get_or_load(("sources", i), lambda: i)
+        cache.invalidate(("sources", i))
+        cache.invalidate(("artifacts", i))
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["in_flight"] == 0
+
+
+def test_read_after_invalidate_starts_fresh_load():
+    cache = ReadThroughCache()
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return "新增前"
+
+    thread = threading.Thread(target=lambda: results.setdefault("first", cache.get_or_load("key", slow_loader)))
+    thread.start()
+    assert started.wait(5)
+
+    # 新增來源後失效：之後的讀取不可共用失效前開始的載入
+    cache.invalidate("key")
+    fresh_calls = []
+
+    def fresh_loader():
+        fresh_calls.append(1)
+        return "新增後"
+
+    assert cache.get_or_load("key", fresh_loader) == "新增後"
+    assert fresh_calls == [1]
+
+    release.set()
+    thread.join(5)
+    assert results["first"] == "新增前"
+    # 失效前開始的載入結束後不覆蓋較新的快取值
+    assert cache.get_or_load("key", lambda: "不應呼叫") == "新增後"
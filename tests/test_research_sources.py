@@ -0,0 +1,69 @@
+"""研究任務的來源歸屬"""
+import pytest
+
+from services import research_jobs
+from services.research_jobs import ResearchRunner
+
+
+@pytest.fixture
+def notebook(monkeypatch):
+    """假的筆記本：sources 為目前的來源，partials 記錄推送的部分結果"""
+    state = {"sources": [{"id": "old", "title": "既有來源"}], "partials": []}
+
+    def list_sources(notebook_id, fresh=False):
+        return {"success": True, "data": {"sources": list(state["sources"])}}
+
+    monkeypatch.setattr(research_jobs.notebooklm_service, "list_sources", list_sources)
+    monkeypatch.setattr(research_jobs.task_manager, "update_partial",
+                        lambda task_id, partial: state["partials"].append((task_id, partial)))
+    monkeypatch.setattr(research_jobs.task_manager, "update_progress", lambda task_id, progress: None)
+    return state
+
+
+def _runner():
+    return ResearchRunner(poll_interval=3600)
+
+
+def _start(runner, task_id, notebook_id="nb"):
+    runner._active[task_id] = {"notebook_id": notebook_id, "known": runner._list_source_ids(notebook_id),
+                               "sources": {}, "confirmed": set(), "reported": False}
+
+
+def test_reported_ids_exclude_unrelated_uploads(notebook, monkeypatch):
+    runner = _runner()
+    _start(runner, "t1")
+
+    def add_research(query, notebook_id, mode, source, timeout=300):
+        # 研究期間另有使用者上傳的來源
+        notebook["sources"] += [{"id": "upload", "title": "上傳"}, {"id": "r1", "title": "研究結果"}]
+        return {"success": True, "data": {"query": query, "source_ids": ["r1"]}}
+
+    monkeypatch.setattr(research_jobs.notebooklm_service, "add_research", add_research)
+    result = runner._run_batch("t1", "nb", ["量子"], "fast", "web")
+    assert [s["id"] for s in result["data"]["sources"]] == ["r1"]
+    assert result["data"]["source_count"] == 1
+
+
+def test_concurrent_research_is_not_cross_credited(notebook):
+    runner = _runner()
+    _start(runner, "t1")
+    _start(runner, "t2")
+
+    # 兩個任務同時進行時，輪詢看到的新來源不歸給任何一方
+    notebook["sources"] += [{"id": "a"}, {"id": "b"}]
+    runner._scan("nb")
+    assert notebook["partials"] == []
+
+    # 由各自的研究結果確定歸屬
+    runner._scan("nb", "t1", ["a"])
+    runner._scan("nb", "t2", ["b"])
+    assert list(runner._active["t1"]["sources"]) == ["a"]
+    assert list(runner._active["t2"]["sources"]) == ["b"]
+
+
+def test_single_research_streams_new_sources(notebook):
+    runner = _runner()
+    _start(runner, "t1")
+    notebook["sources"].append({"id": "new", "title": "新來源"})
+    runner._scan("nb")
+    assert notebook["partials"] == [("t1", {"sources": [{"id": "new", "title": "新來源", "url": None}]})]
@@ -0,0 +1,65 @@
+"""批次匯入來源"""
+import pytest
+
+from services.notebooklm_service import notebooklm_service
+from services.source_ingest import SourceIngester
+
+URL = "https://example.com/a"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """假的上游：uploads 記錄新增呼叫，responses 依序為每次新增的回應，sources 為目前的來源"""
+    state = {"uploads": [], "responses": [], "sources": [], "listed": 0}
+
+    def spawn(args, timeout=120):
+        if args[:2] == ["source", "list"]:
+            state["listed"] += 1
+            return {"success": True, "data": {"sources": list(state["sources"])}}
+        state["uploads"].append(args)
+        return state["responses"].pop(0)
+
+    monkeypatch.setattr(notebooklm_service, "get_backend", lambda: "cli")
+    monkeypatch.setattr(notebooklm_service, "_spawn_cli", spawn)
+    return state
+
+
+def _ingester():
+    return SourceIngester(concurrency=2, rate_per_minute=600, max_retries=3, backoff=0)
+
+
+def test_transient_failure_is_retried_after_checking_sources(upstream):
+    upstream["responses"] = [{"success": False, "error": "503 Service Unavailable"},
+                             {"success": True, "data": {"id": "s1"}}]
+    result = _ingester().run("nb1", [{"type": "url", "value": URL}])
+
+    # 上游保護層不重送非冪等的新增；匯入在確認來源不存在後重送一次
+    assert result["success"] is True
+    assert len(upstream["uploads"]) == 2
+    assert upstream["listed"] == 1
+    assert result["data"]["added"][0]["attempts"] == 2
+
+
+def test_transient_failure_that_was_applied_is_not_readded(upstream):
+    upstream["responses"] = [{"success": False, "error": "504 Gateway Timeout"}]
+    # 逾時的呼叫實際上已新增來源
+    upstream["sources"] = [{"id": "s1", "url": URL + "/"}]
+    result = _ingester().run("nb1", [{"type": "url", "value": URL}])
+
+    assert result["success"] is True
+    assert len(upstream["uploads"]) == 1
+    assert result["data"]["added"][0]["data"]["id"] == "s1"
+
+
+def test_permanent_failure_is_not_retried(upstream):
+    upstream["responses"] = [{"success": False, "error": "Invalid URL"}]
+    result = _ingester().run("nb1", [{"type": "url", "value": URL}])
+    assert result["success"] is False
+    assert len(upstream["uploads"]) == 1
+    assert upstream["listed"] == 0
+
+
+def test_rate_limit_is_per_notebook():
+    ingester = _ingester()
+    assert ingester._bucket("nb1") is ingester._bucket("nb1")
+    assert ingester._bucket("nb1") is not ingester._bucket("nb2")
@@ -0,0 +1,34 @@
+"""SSE 串流限制"""
+import routes.streaming as streaming
+from routes.streaming import StreamLimiter
+
+
+def test_stream_limit_and_lifetime(client, monkeypatch):
+    limiter = StreamLimiter(max_streams=1, max_lifetime=0)
+    monkeypatch.setattr(streaming, "stream_limiter", limiter)
+
+    first = client.get("/api/tasks/stream")
+    assert first.status_code == 200
+    assert client.get("/api/tasks/stream").status_code == 503
+
+    # 存活時間為 0：送出 snapshot 後立即結束，關閉後釋放名額
+    parts = list(first.response)
+    first.close()
+    assert len(parts) == 1 and b"event: snapshot" in parts[0]
+    assert limiter.stats()["open"] == 0
+    second = client.get("/api/tasks/stream")
+    assert second.status_code == 200
+    second.close()
+
+
+def test_drain_ends_streams_and_rejects_new_ones(client, monkeypatch):
+    limiter = StreamLimiter(max_streams=4, max_lifetime=300)
+    monkeypatch.setattr(streaming, "stream_limiter", limiter)
+
+    response = client.get("/api/tasks/stream")
+    iterator = iter(response.response)
+    assert b"snapshot" in next(iterator)
+    limiter.drain()
+    assert list(iterator) == []
+    response.close()
+    assert client.get("/api/tasks/stream").status_code == 503
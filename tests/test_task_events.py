@@ -0,0 +1,43 @@
+"""任務事件 ID 與串流續傳"""
+from services.task_events import TaskEventBus
+from services.task_manager import task_manager
+
+
+def test_event_ids_from_another_boot_are_rejected():
+    bus = TaskEventBus(boot_id="aaaa")
+    for i in range(3):
+        bus.publish("updated", {"id": str(i)})
+    assert [e["id"] for e in bus.since(bus.event_id(1))] == [2, 3]
+    # 重新啟動或其他 worker 的 ID：序號看似有效也不可接受
+    restarted = TaskEventBus(boot_id="bbbb")
+    restarted.publish("updated", {"id": "x"})
+    assert restarted.since(bus.event_id(0)) is None
+    assert restarted.since("1") is None
+    assert restarted.since(None) is None
+
+
+def _first_event(response):
+    for part in response.response:
+        text = part.decode() if isinstance(part, bytes) else part
+        if text.startswith("id:"):
+            response.close()
+            return text
+    response.close()
+    return ""
+
+
+def test_stream_sends_snapshot_for_foreign_last_event_id(client):
+    task_manager.events.publish("updated", {"id": "t1", "notebook_id": None})
+    response = client.get("/api/tasks/stream", headers={"Last-Event-ID": "0000dead-1"})
+    first = _first_event(response)
+    assert "event: snapshot" in first
+    assert first.startswith(f"id: {task_manager.events.boot_id}-")
+
+
+def test_stream_resumes_own_last_event_id(client):
+    events = task_manager.events
+    last = events.publish("updated", {"id": "t1", "notebook_id": None})
+    events.publish("updated", {"id": "t2", "notebook_id": None})
+    response = client.get("/api/tasks/stream", headers={"Last-Event-ID": events.event_id(last)})
+    first = _first_event(response)
+    assert first.startswith(f"id: {events.event_id(last + 1)}\nevent: updated")
@@ -0,0 +1,58 @@
+"""共用任務 store 時的啟動接續"""
+import threading
+import time
+
+from services.task_broker import LocalBroker
+from services.task_manager import TaskManager
+from services.task_store import SQLiteTaskStore
+
+
+def _manager(db_path):
+    return TaskManager(store=SQLiteTaskStore(db_path), broker=LocalBroker())
+
+
+def _wait_status(store, task_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if store.get(task_id)["status"] == status:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_shared_store_does_not_fail_live_workers_tasks(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    first = _manager(db_path)
+    release = threading.Event()
+    first.register_handler("slow", lambda: release.wait(10))
+    first.recover_unfinished("resume")
+    task_id = first.dispatch("slow", name="執行中")
+    assert _wait_status(first.store, task_id, "running")
+
+    # 第二個行程啟動：第一個行程仍在回報存活，其任務不可被標記為失敗
+    second = _manager(db_path)
+    second.recover_unfinished("resume")
+    assert second.store.get(task_id)["status"] == "running"
+
+    release.set()
+    first.shutdown(5)
+    second.shutdown(5)
+
+
+def test_shared_store_recovers_tasks_once_owner_goes_stale(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(db_path)
+    store.save({"id": "orphan", "name": "失聯", "status": "running", "owner": "gone-1",
+                "created_at": "2026-01-01T00:00:00"})
+    store.heartbeat("gone-1")
+
+    # 剛停止的行程仍在存活期限內：啟動時不接手
+    manager = _manager(db_path)
+    manager.recover_unfinished("resume")
+    assert manager.store.get("orphan")["status"] == "running"
+
+    # 超過期限後由定期的 _reap 接手
+    manager.stale_after = 0
+    manager._reap()
+    assert manager.store.get("orphan")["status"] == "failed"
+    manager.shutdown(5)
@@ -0,0 +1,41 @@
+"""任務執行中的進度與部分結果更新"""
+import threading
+import time
+
+from services.task_broker import LocalBroker
+from services.task_manager import TaskManager
+from services.task_store import MemoryTaskStore
+
+
+def test_updates_racing_completion_keep_final_state():
+    manager = TaskManager(store=MemoryTaskStore(), broker=LocalBroker())
+    manager.register_handler("job", lambda: {"done": True})
+    stop = threading.Event()
+
+    def reporter(task_id):
+        step = 0
+        while not stop.is_set():
+            step += 1
+            manager.update_progress(task_id, step % 100)
+            manager.update_partial(task_id, {"step": step})
+
+    for _ in range(20):
+        stop.clear()
+        task_id = manager.dispatch("job", name="更新競爭")
+        threads = [threading.Thread(target=reporter, args=(task_id,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        final = manager.wait_task(task_id, timeout=5, interval=0.01)
+        # 結束狀態在移出進行中任務前保存
+        deadline = time.monotonic() + 5
+        while task_id in manager.tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        # 結束後的更新不可覆蓋已保存的結束狀態
+        record = manager.store.get(task_id)
+        assert final["status"] == "completed"
+        assert record["status"] == "completed"
+        assert record["progress"] == 100
+    manager.shutdown(5)
@@ -0,0 +1,46 @@
+"""上傳檔案來源"""
+import io
+
+import pytest
+
+import routes.sources
+import services.notebooklm_service as service_module
+from services.config_manager import config_manager
+from services.content_index import ContentIndex
+from services.notebooklm_service import notebooklm_service
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(config_manager.load(), "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(notebooklm_service, "content_index", ContentIndex(str(tmp_path / "index.json")))
+    return tmp_path / "uploads"
+
+
+def test_multiple_file_parts_are_rejected_and_cleaned_up(client, upload_dir):
+    response = client.post("/api/notebooks/nb1/sources/upload", content_type="multipart/form-data", data={
+        "file": (io.BytesIO(b"first"), "a.txt"),
+        "extra": [(io.BytesIO(b"second"), "b.txt"), (io.BytesIO(b"third"), "c.txt")],
+    })
+    assert response.status_code == 400
+    assert list((upload_dir / "tmp").iterdir()) == []
+
+
+def test_upload_hashes_file_once(client, upload_dir, monkeypatch):
+    calls = []
+
+    def counting_hash(path):
+        calls.append(path)
+        return "0" * 64
+
+    monkeypatch.setattr(routes.sources, "hash_file", counting_hash)
+    monkeypatch.setattr(service_module, "hash_file", counting_hash)
+    monkeypatch.setattr(notebooklm_service, "_execute",
+                        lambda args, op=None: {"success": True, "data": {"source_id": "src1"}})
+
+    response = client.post("/api/notebooks/nb1/sources/upload", content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(b"content"), "報告.pdf")})
+    assert response.get_json()["success"] is True
+    assert len(calls) == 1
+    assert list((upload_dir / "tmp").iterdir()) == []
+    assert (upload_dir / ("0" * 64) / "報告.pdf").read_bytes() == b"content"
@@ -0,0 +1,49 @@
+"""
+亮言~NotebookLM 自動化 Skill
+獨立的任務執行行程
+
+    python worker.py [--threads 5]
+
+搭配 config.json 的 task_broker: "sqlite" 與 task_store: "sqlite" 使用：API 行程
+（可設 TASK_RUNNER=0 只送出工作）以 dispatch 送出的生成等任務由本行程取得並執行，
+可依負載啟動多個。收到 SIGINT / SIGTERM 時停止取得新工作，已取得但尚未開始的工作
+交還佇列，等待執行中的任務結束（最多 SHUTDOWN_TIMEOUT 秒）後離開。
+"""
+import argparse
+import signal
+import threading
+from app import create_app, shutdown_services
+from config import ProductionConfig
+from services.task_manager import task_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="執行佇列中的背景任務")
+    parser.add_argument("--threads", type=int, default=task_manager.max_workers, help="任務工作執行緒數")
+    parser.add_argument("--shutdown-timeout", type=float, default=ProductionConfig.SHUTDOWN_TIMEOUT)
+    args = parser.parse_args()
+
+    # 匯入各服務並註冊任務處理函式、接續中斷的任務
+    task_manager.max_workers = args.threads
+    task_manager.runner = True
+    create_app('production')
+    if not task_manager.broker.shared:
+        print("   警告：task_broker 不是 sqlite，本行程只會執行自己送出的任務")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+
+    print(f"   任務執行行程已啟動: {task_manager.worker_id}（{args.threads} 個執行緒）")
+    while not stopping.wait(1.0):
+        pass
+
+    print("   停止取得新工作，等待執行中的任務結束...")
+    remaining = shutdown_services(args.shutdown_timeout)
+    if remaining["running"]:
+        print(f"   仍有 {remaining['running']} 個執行中的任務未完成，將由其他行程接續")
+    print("   已關閉")
+
+
+if __name__ == '__main__':
+    main()